@@ -0,0 +1,192 @@
+import re
+import sys
+import time
+import argparse
+from collections import Counter, namedtuple
+
+# Barcode symbology detection, check-digit validation and normalization for
+# the scan-ingest path. Everything that can be prepared ahead (regexes, the
+# length dispatch table, the GS1 Application Identifier table) is built at
+# import so validating one scan costs a few microseconds.
+
+EAN_13, EAN_8, UPC_A, GS1_128, CODE_128, UNKNOWN = "EAN-13", "EAN-8", "UPC-A", "GS1-128", "Code 128", "unknown"
+
+# barcode: canonical form; fields: parsed GS1 Application Identifiers (AI -> value)
+Validation = namedtuple("Validation", "barcode symbology valid error fields")
+
+GS = "\x1d"
+# AIM symbology identifier some scanners prefix to every read, e.g. "]E0" or "]C1"
+AIM_PREFIX = re.compile(r"^\][A-Za-z][0-9A-Za-z]")
+PAREN_AI = re.compile(r"\((\d{2,4})\)([^()]*)")
+PRINTABLE_ASCII = re.compile(r"^[\x20-\x7e]+$")
+
+# GS1 Application Identifiers: AI -> (value length, fixed length?)
+GS1_AIS = {
+    "00": (18, True), "01": (14, True), "02": (14, True),
+    "10": (20, False), "11": (6, True), "12": (6, True), "13": (6, True), "15": (6, True),
+    "16": (6, True), "17": (6, True), "20": (2, True), "21": (20, False), "22": (20, False),
+    "240": (30, False), "241": (30, False), "250": (30, False), "251": (30, False),
+    "30": (8, False), "37": (8, False),
+    "400": (30, False), "401": (30, False), "402": (17, True), "403": (30, False),
+    "410": (13, True), "411": (13, True), "412": (13, True), "413": (13, True),
+    "414": (13, True), "415": (13, True), "416": (13, True), "417": (13, True),
+    "420": (20, False), "421": (12, False), "422": (3, True),
+    "8003": (30, False), "8004": (30, False), "8020": (25, False),
+}
+# Trade measures 310n-369n: 4-digit AI (n = decimal places) with a 6-digit value
+for _family in range(310, 370):
+    for _decimals in range(10):
+        GS1_AIS[f"{_family}{_decimals}"] = (6, True)
+# AIs whose value ends in a GS1 mod-10 check digit
+GS1_CHECKED_AIS = {"00", "01", "02", "410", "411", "412", "413", "414", "415", "416", "417"}
+
+
+def gs1_check_digit(digits):
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        total += int(d) * (3 if i % 2 == 0 else 1)
+    return str((10 - total % 10) % 10)
+
+
+def has_valid_check_digit(digits):
+    return digits[-1] == gs1_check_digit(digits[:-1])
+
+
+def _retail(symbology):
+    def check(digits):
+        if has_valid_check_digit(digits):
+            return Validation(digits, symbology, True, None, None)
+        return Validation(digits, symbology, False, "check digit mismatch", None)
+    return check
+
+
+# Digit-only scans dispatched by length
+DIGIT_DISPATCH = {8: _retail(EAN_8), 12: _retail(UPC_A), 13: _retail(EAN_13)}
+# Lengths one short of a retail code: almost always a truncated read
+TRUNCATED_LENGTHS = {7: EAN_8, 11: UPC_A}
+# Two identical-length retail codes read as one
+DOUBLE_SCAN_LENGTHS = {16: 8, 24: 12, 26: 13}
+
+
+# Function to parse a GS1 element string into (AI, value) pairs. Handles both the
+# human-readable "(01)...(10)..." form and the raw form with GS separators.
+def parse_gs1(data):
+    if data.startswith("("):
+        pairs = PAREN_AI.findall(data)
+        if "".join(f"({ai}){value}" for ai, value in pairs) != data:
+            raise ValueError("malformed element string")
+        return pairs
+    pairs = []
+    pos = 0
+    while pos < len(data):
+        if data[pos] == GS:
+            pos += 1
+            continue
+        for size in (2, 3, 4):
+            ai = data[pos:pos + size]
+            if ai in GS1_AIS:
+                break
+        else:
+            raise ValueError("unknown AI")
+        length, fixed = GS1_AIS[ai]
+        start = pos + len(ai)
+        if fixed:
+            end = start + length
+        else:
+            end = data.find(GS, start)
+            end = len(data) if end == -1 else end
+        pairs.append((ai, data[start:end]))
+        pos = end
+    return pairs
+
+
+def validate_gs1(data):
+    try:
+        pairs = parse_gs1(data)
+    except ValueError as e:
+        return Validation(data, GS1_128, False, str(e), None)
+    fields = {}
+    error = None
+    for ai, value in pairs:
+        spec = GS1_AIS.get(ai)
+        if spec is None:
+            error = error or f"unknown AI ({ai})"
+        elif (spec[1] and len(value) != spec[0]) or not value or len(value) > spec[0]:
+            error = error or f"bad length for AI ({ai})"
+        elif ai in GS1_CHECKED_AIS and not (value.isdigit() and has_valid_check_digit(value)):
+            error = error or f"check digit mismatch in AI ({ai})"
+        fields[ai] = value
+    canonical = "".join(f"({ai}){value}" for ai, value in pairs)
+    return Validation(canonical, GS1_128, error is None and bool(pairs), error or (None if pairs else "empty"), fields)
+
+
+def validate_digits(digits):
+    check = DIGIT_DISPATCH.get(len(digits))
+    if check:
+        return check(digits)
+    half = DOUBLE_SCAN_LENGTHS.get(len(digits))
+    if half and has_valid_check_digit(digits[:half]) and has_valid_check_digit(digits[half:]):
+        symbology = DIGIT_DISPATCH[half](digits[:half]).symbology
+        return Validation(digits, symbology, False, "concatenated double scan", None)
+    if len(digits) in TRUNCATED_LENGTHS:
+        return Validation(digits, TRUNCATED_LENGTHS[len(digits)], False, "truncated", None)
+    # Long digit runs starting with a fixed-length AI are GS1-128 read without FNC1
+    if len(digits) > 14 and digits[:2] in ("00", "01", "02"):
+        result = validate_gs1(digits)
+        if result.valid:
+            return result
+    return Validation(digits, CODE_128, True, None, None)
+
+
+# Function to detect, validate and normalize one scan
+def validate(raw):
+    data = raw.strip()
+    hint = None
+    if AIM_PREFIX.match(data):
+        hint, data = data[1:3], data[3:]
+    if not data:
+        return Validation(data, UNKNOWN, False, "empty", None)
+    if hint == "C1" or data.startswith("(") or GS in data:
+        return validate_gs1(data)
+    if data.isascii() and data.isdigit():
+        return validate_digits(data)
+    if PRINTABLE_ASCII.match(data):
+        return Validation(data, CODE_128, True, None, None)
+    return Validation(data, UNKNOWN, False, "unsupported characters", None)
+
+
+# Function to validate every line of an imported file, with throughput
+def validate_file(path):
+    counts = Counter()
+    errors = Counter()
+    invalid = []
+    start = time.perf_counter()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            result = validate(line)
+            counts[result.symbology] += 1
+            if not result.valid:
+                errors[result.error] += 1
+                invalid.append((number, line.strip(), result.error))
+    return counts, errors, invalid, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate a file of barcodes, one per line")
+    parser.add_argument("path")
+    parser.add_argument("--show-invalid", type=int, default=20, help="invalid lines to list")
+    args = parser.parse_args()
+
+    counts, errors, invalid, elapsed = validate_file(args.path)
+    total = sum(counts.values())
+    print(f"{total} barcodes in {elapsed:.3f}s ({total / elapsed if elapsed else 0:,.0f}/s), "
+          f"{len(invalid)} invalid")
+    for symbology, count in counts.most_common():
+        print(f"  {symbology:<10} {count}")
+    for error, count in errors.most_common():
+        print(f"  invalid: {error:<28} {count}")
+    for number, line, error in invalid[:args.show_invalid]:
+        print(f"  line {number}: {line!r} ({error})")
+    sys.exit(1 if invalid else 0)
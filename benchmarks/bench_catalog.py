@@ -0,0 +1,70 @@
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+import tempfile
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from product_catalog import ProductCatalog
+from barcode_validate import gs1_check_digit
+
+# Product lookup cost per scan on a synthetic multi-million SKU catalog:
+# CSV import time, cold lookups (SQLite primary key) and warm lookups (LRU),
+# plus the process RSS after opening the catalog.
+
+
+def ean13(n):
+    body = f"{n:012d}"
+    return body + gs1_check_digit(body)
+
+
+def write_catalog(path, count):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["barcode", "name", "price"])
+        for n in range(count):
+            writer.writerow([ean13(n * 7), f"Product {n}", f"{(n % 5000) / 100:.2f}"])
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Product catalog lookup benchmark")
+    parser.add_argument("--skus", type=int, default=2_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--hot", type=int, default=2000, help="distinct products in the warm workload")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.csv")
+        write_catalog(path, args.skus)
+
+        start = time.perf_counter()
+        rss_before = rss_mb()
+        catalog = ProductCatalog(path)
+        print(f"import {args.skus:,} SKUs: {time.perf_counter() - start:.1f}s, "
+              f"max RSS {rss_before:.0f} -> {rss_mb():.0f} MB")
+
+        cold = [ean13(random.randrange(args.skus * 7)) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        found = sum(catalog.lookup(b) is not None for b in cold)
+        elapsed = time.perf_counter() - start
+        print(f"cold lookups: {elapsed / args.lookups * 1e6:.1f} us each ({found} found)")
+
+        hot_set = [ean13(random.randrange(args.skus) * 7) for _ in range(args.hot)]
+        hot = [random.choice(hot_set) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        for barcode in hot:
+            catalog.lookup(barcode)
+        elapsed = time.perf_counter() - start
+        print(f"warm lookups: {elapsed / args.lookups * 1e6:.1f} us each, {catalog.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
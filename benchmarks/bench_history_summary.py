@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stamp_store import JournalStore, SQLiteStore
+from stamp_summary import HistorySummary
+
+# Cost of the History page's summary panel as the history grows: reading the
+# totals the store keeps up to date against walking every order and mail
+# entry to count them, on both backends. Also times the writes that keep the
+# totals current, and checks the kept totals against a full recount.
+
+
+def stamp_entry(i):
+    return {'id': str(uuid.uuid4()), 'text': f"Stamp {i}", 'design': "Star", 'color': "#0000FF",
+            'value': "Forever", 'image_path': f"stamp_{i}.png", 'date': "2026-01-01 12:00:00"}
+
+
+def order_entry(stamp_id, rng):
+    quantity = rng.randrange(1, 100)
+    return {'order_id': str(uuid.uuid4()), 'stamp_id': stamp_id, 'quantity': quantity,
+            'total_cost': round(quantity * 0.68, 2), 'date': f"2026-{rng.randrange(1, 13):02d}-15 12:00:00"}
+
+
+def mail_entry(stamp_id, rng, recipients):
+    return {'mail_id': str(uuid.uuid4()), 'stamp_id': stamp_id, 'recipient': f"Recipient {rng.randrange(recipients)}",
+            'address': "1 Main Street", 'date': f"2026-{rng.randrange(1, 13):02d}-15 12:00:00"}
+
+
+# What the page did without kept totals: walk both histories and count
+def recount(store):
+    return HistorySummary.rebuild(
+        [('orders', order, stamp) for order, stamp in store.iter_history('orders')] +
+        [('mail_history', mail, None) for mail, _ in store.iter_history('mail_history')]).view()
+
+
+def best_ms(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench(label, store, sizes, stamps, recipients, window):
+    rng = random.Random(7)
+    stamp_ids = []
+    for i in range(stamps):
+        stamp = stamp_entry(i)
+        store.append('stamps', stamp)
+        stamp_ids.append(stamp['id'])
+    written = 0
+    for size in sizes:
+        while written < size - window:
+            store.append('orders', order_entry(rng.choice(stamp_ids), rng))
+            store.append('mail_history', mail_entry(rng.choice(stamp_ids), rng, recipients))
+            written += 1
+        start = time.perf_counter()
+        while written < size:
+            store.append('orders', order_entry(rng.choice(stamp_ids), rng))
+            store.append('mail_history', mail_entry(rng.choice(stamp_ids), rng, recipients))
+            written += 1
+        write_us = (time.perf_counter() - start) / (2 * window) * 1e6
+        assert store.summary() == recount(store)
+        kept = best_ms(store.summary)
+        walked = best_ms(lambda: recount(store), repeat=2)
+        print(f"  {label:<8} {size:>9,} orders + mail  summary {kept:8.3f} ms, "
+              f"recount {walked:9.1f} ms, write {write_us:7.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History summary panel cost")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--stamps", type=int, default=200, help="distinct stamp designs ordered")
+    parser.add_argument("--recipients", type=int, default=1_000_000,
+                        help="distinct recipients mailed (most mail goes to a new one by default)")
+    parser.add_argument("--window", type=int, default=200, help="writes timed at each size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bench("journal", JournalStore(os.path.join(directory, "data.json")), args.sizes, args.stamps, args.recipients, args.window)
+        store = SQLiteStore(os.path.join(directory, "data.db"))
+        bench("sqlite", store, args.sizes, args.stamps, args.recipients, args.window)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
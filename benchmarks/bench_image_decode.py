@@ -0,0 +1,93 @@
+import io
+import os
+import sys
+import time
+import random
+import argparse
+
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from barcode_validate import gs1_check_digit
+from scan_images import DECODERS, decode_batch, new_decode_pool
+
+# Images per second decoded from a synthetic corpus of phone-sized photos
+# (an EAN-13 label at a random size and position on a noisy background,
+# slightly rotated and blurred, saved as JPEG; a few are far away, with thin
+# bars): one process against a process pool, and the downscaled-first
+# pipeline against always decoding at full resolution.
+
+L_CODES = ["0001101", "0011001", "0010011", "0111101", "0100011", "0110001", "0101111", "0111011", "0110111", "0001011"]
+G_CODES = [code[::-1].translate(str.maketrans("01", "10")) for code in L_CODES]
+R_CODES = [code.translate(str.maketrans("01", "10")) for code in L_CODES]
+PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG", "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+
+def ean13_modules(digits):
+    parity = PARITY[int(digits[0])]
+    left = "".join((L_CODES if p == "L" else G_CODES)[int(d)] for p, d in zip(parity, digits[1:7]))
+    right = "".join(R_CODES[int(d)] for d in digits[7:])
+    return "101" + left + "01010" + right + "101"
+
+
+def ean13_label(digits, module_px):
+    modules = ean13_modules(digits)
+    quiet = 11 * module_px
+    label = Image.new('L', (len(modules) * module_px + 2 * quiet, 70 * module_px), 255)
+    draw = ImageDraw.Draw(label)
+    for i, bit in enumerate(modules):
+        if bit == "1":
+            x = quiet + i * module_px
+            draw.rectangle((x, 5 * module_px, x + module_px - 1, 65 * module_px), fill=0)
+    return label
+
+
+def photo(digits, size, rng):
+    background = Image.effect_noise(size, 40).point(lambda v: 140 + v // 3)
+    label = ean13_label(digits, rng.choice((3, 5, 6, 8, 10))).rotate(rng.uniform(-4, 4), expand=True, fillcolor=255)
+    x = rng.randrange(0, max(1, size[0] - label.width))
+    y = rng.randrange(0, max(1, size[1] - label.height))
+    background.paste(label, (x, y))
+    buf = io.BytesIO()
+    background.filter(ImageFilter.GaussianBlur(0.8)).convert('RGB').save(buf, format='JPEG', quality=85)
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image barcode decoding throughput")
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--width", type=int, default=3024)
+    parser.add_argument("--height", type=int, default=2268)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    if not DECODERS:
+        sys.exit("Install pyzbar (with the zbar library), zxing-cpp or opencv-python-headless")
+
+    rng = random.Random(3)
+    expected = {}
+    corpus = []
+    for i in range(args.images):
+        body = f"{rng.randrange(10 ** 12):012d}"
+        digits = body + gs1_check_digit(body)
+        expected[f"img{i:04d}.jpg"] = digits
+        corpus.append((f"img{i:04d}.jpg", photo(digits, (args.width, args.height), rng)))
+    print(f"{args.images} images, {args.width}x{args.height} JPEG, decoder {DECODERS[0]}, {args.workers} workers")
+
+    def run(label, pool, max_side):
+        start = time.perf_counter()
+        results = list(decode_batch(corpus, pool, max_side))
+        elapsed = time.perf_counter() - start
+        correct = sum(1 for name, found, _ in results if expected[name] in (barcode for barcode, _ in found))
+        print(f"  {label:<32} {len(corpus) / elapsed:8.1f} images/s, {correct}/{len(corpus)} decoded")
+
+    run("1 process, full resolution", None, max(args.width, args.height))
+    run("1 process, downscaled first", None, 1280)
+    with new_decode_pool(args.workers) as pool:
+        # Start the workers before timing
+        list(decode_batch(corpus[:args.workers * 2], pool))
+        run(f"{args.workers} workers, downscaled first", pool, 1280)
+
+
+if __name__ == "__main__":
+    main()
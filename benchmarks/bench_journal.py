@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stamp_store import JournalStore, empty_data
+
+# Measures per-action write latency of the journal store as history grows,
+# next to the old behaviour of rewriting the whole data.json on every action.
+
+
+def mail_entry(i):
+    return {
+        'stamp_id': str(uuid.uuid4()),
+        'recipient': f"Recipient {i}",
+        'address': f"{i} Main Street",
+        'date': "2024-06-16 12:00:00"
+    }
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def report(label, size, samples):
+    print(f"{label:<10} {size:>10,} records  "
+          f"p50 {statistics.median(samples) * 1e6:9.1f} us  "
+          f"p99 {percentile(samples, 99) * 1e6:9.1f} us")
+
+
+def bench_journal(directory, checkpoints, window):
+    store = JournalStore(os.path.join(directory, "journal.json"))
+    written = 0
+    for checkpoint in checkpoints:
+        while written < checkpoint - window:
+            store.append('mail_history', mail_entry(written))
+            written += 1
+        samples = []
+        while written < checkpoint:
+            entry = mail_entry(written)
+            start = time.perf_counter()
+            store.append('mail_history', entry)
+            samples.append(time.perf_counter() - start)
+            written += 1
+        report("journal", checkpoint, samples)
+
+
+def bench_rewrite(directory, checkpoints, window):
+    path = os.path.join(directory, "rewrite.json")
+    data = empty_data()
+    for checkpoint in checkpoints:
+        while len(data['mail_history']) < checkpoint - window:
+            data['mail_history'].append(mail_entry(len(data['mail_history'])))
+        samples = []
+        while len(data['mail_history']) < checkpoint:
+            data['mail_history'].append(mail_entry(len(data['mail_history'])))
+            start = time.perf_counter()
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=4)
+            samples.append(time.perf_counter() - start)
+        report("rewrite", checkpoint, samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write latency of data.json storage")
+    parser.add_argument("--max-records", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=200, help="writes timed at each checkpoint")
+    parser.add_argument("--rewrite-max", type=int, default=10_000,
+                        help="largest history size to time with whole-file rewrites")
+    args = parser.parse_args()
+
+    checkpoints = []
+    size = 1000
+    while size <= args.max_records:
+        checkpoints.append(size)
+        size *= 10
+
+    with tempfile.TemporaryDirectory() as directory:
+        bench_journal(directory, checkpoints, args.window)
+        bench_rewrite(directory, [c for c in checkpoints if c <= args.rewrite_max], args.window)
+
+
+if __name__ == "__main__":
+    main()
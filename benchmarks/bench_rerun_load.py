@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from stamp_store import JournalStore, SQLiteStore, migrate_json_to_sqlite
+
+# Cost of the data load at the top of every rerun of us-stamp-app-v1.py with a
+# large data file: the old behaviour (a fresh store parsing everything on each
+# rerun) against the shared store, which serves unchanged data from memory and
+# only re-reads the files when something else changed them. Before timing,
+# the app itself sends one mail through the shared store and checks that the
+# History page lists it once.
+
+
+def build_data(target_mb):
+    stamps = [{'id': str(uuid.uuid4()), 'path': f"stamps/{i:064x}.png", 'design': "Classic",
+               'text': f"Stamp {i}", 'value': 0.55} for i in range(500)]
+    data = {'stamps': stamps, 'mail_history': [], 'orders': []}
+    size = 0
+    i = 0
+    while size < target_mb * 1e6:
+        stamp_id = stamps[i % len(stamps)]['id']
+        data['mail_history'].append({'stamp_id': stamp_id, 'recipient': f"Recipient {i}",
+                                     'address': f"{i} Main Street, Springfield", 'date': "2024-06-16 12:00:00"})
+        data['orders'].append({'order_id': str(uuid.uuid4()), 'stamp_id': stamp_id, 'quantity': 10,
+                               'total_cost': 5.5, 'shipping_address': f"{i} Elm Street, Springfield",
+                               'date': "2024-06-16 12:00:00"})
+        # Rough indent=4 size of the two records
+        size += 545
+        i += 1
+    return data
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+# Sessions load their lists from the shared store, so a session appending to
+# its own copy must not also add the record to the store's tables
+def check_send_mail(tmp):
+    from streamlit.testing.v1 import AppTest
+    cwd = os.getcwd()
+    os.chdir(tmp)
+    os.environ["STAMP_DATA_FILE"] = os.path.join(tmp, "check.json")
+    try:
+        at = AppTest.from_file(os.path.join(ROOT, "us-stamp-app-v1.py"), default_timeout=60).run()
+        at.text_input(key="text_input").input("Check")
+        at.button[0].click().run()
+        # The form's submit button is relabelled for the confirmation
+        at.run()
+        at.button[0].click().run()
+        at.sidebar.selectbox[0].select("Send Virtual Mail").run()
+        at.text_input[0].input("Recipient")
+        at.text_area[0].input("1 Main Street")
+        at.button[0].click().run()
+        at.sidebar.selectbox[0].select("History").run()
+        sent = [text.value for text in at.markdown if text.value.startswith("**Sent to**")]
+        assert not at.exception, at.exception
+        assert len(at.session_state.mail_history) == 1, at.session_state.mail_history
+        assert len(sent) == 1, sent
+    finally:
+        os.environ.pop("STAMP_DATA_FILE")
+        os.chdir(cwd)
+    print("send mail: one mail sent, one History entry")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerun data-load latency with a large data file")
+    parser.add_argument("--mb", type=float, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_send_mail(tmp)
+        path = os.path.join(tmp, "data.json")
+        with open(path, 'w') as f:
+            json.dump(build_data(args.mb), f, indent=4)
+        print(f"data.json: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        shared = JournalStore(path)
+        shared.load()
+        new_mail = {'stamp_id': "x", 'recipient': "r", 'address': "a", 'date': "d"}
+
+        def external_append():
+            # Another process appending to the journal
+            JournalStore(path).append('mail_history', new_mail)
+            shared.load()
+
+        def own_append():
+            shared.append('mail_history', new_mail)
+            shared.load()
+
+        print(f"{'journal: fresh parse per rerun (before)':<48} {timed(lambda: JournalStore(path).load(), args.repeat):9.2f} ms")
+        print(f"{'journal: shared store, unchanged':<48} {timed(shared.load, args.repeat):9.2f} ms")
+        print(f"{'journal: shared store after its own append':<48} {timed(own_append, args.repeat):9.2f} ms")
+        print(f"{'journal: shared store after an outside append':<48} {timed(external_append, args.repeat):9.2f} ms")
+
+        db_path = os.path.join(tmp, "data.db")
+        migrate_json_to_sqlite(path, db_path)
+        db = SQLiteStore(db_path)
+        db.load()
+
+        def db_own_append():
+            db.append('mail_history', new_mail)
+            db.load()
+
+        print(f"{'sqlite: fresh load per rerun (before)':<48} {timed(lambda: SQLiteStore(db_path).load(), args.repeat):9.2f} ms")
+        print(f"{'sqlite: shared store, unchanged':<48} {timed(db.load, args.repeat):9.2f} ms")
+        print(f"{'sqlite: shared store after its own append':<48} {timed(db_own_append, args.repeat):9.2f} ms")
+        print(f"{'rerun of an already loaded session':<48} {0:9.2f} ms (store not called)")
+
+
+if __name__ == "__main__":
+    main()
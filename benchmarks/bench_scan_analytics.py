@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scan_log import ScanLog
+from scan_analytics import ScanAnalytics, TOP_SHOWN
+
+# Cost of the analytics panel per rerun as the history grows: the incremental
+# summary (counters, per-minute ring, Space-Saving top-K) against re-walking
+# the scan log on every rerun, plus the per-scan update cost and how far the
+# top-K counts are from exact ones.
+
+
+def rewalk(scans, now_ns):
+    # What the panel would cost computed from the history each rerun
+    top = Counter(scans.barcode_at(position) for position in range(len(scans))).most_common(TOP_SHOWN)
+    now_minute = now_ns // 60_000_000_000
+    per_minute = Counter(ts // 60_000_000_000 for ts in scans.timestamps if ts // 60_000_000_000 > now_minute - 60)
+    gaps = [b - a for a, b in zip(scans.timestamps, scans.timestamps[1:]) if b - a >= 120_000_000_000]
+    return top, per_minute, gaps
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan analytics cost per rerun")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--distinct", type=int, default=20000, help="distinct barcodes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(7)
+    print(f"{'scans':>9} {'observe us/scan':>16} {'summary ms':>11} {'re-walk ms':>11} {'top-10 exact':>13}")
+    for size in args.sizes:
+        now_ns = time.time_ns()
+        # Skewed popularity, one scan every ~2 s with the occasional long pause
+        entries = []
+        ts = now_ns - size * 2_000_000_000
+        for _ in range(size):
+            ts += random.choice((1, 2, 2, 3, 300 if random.random() < 0.001 else 2)) * 1_000_000_000
+            entries.append((f"{min(int(random.paretovariate(1.2)), args.distinct):013d}", ts))
+
+        scans = ScanLog()
+        for barcode, ts in entries:
+            scans.append(barcode, ts)
+        analytics = ScanAnalytics()
+        start = time.perf_counter()
+        for barcode, ts in entries:
+            analytics.observe("bench", barcode, ts)
+        observe_us = (time.perf_counter() - start) / size * 1e6
+
+        summary_ms = timed(lambda: analytics.summary(now_ns), args.repeat)
+        rewalk_ms = timed(lambda: rewalk(scans, now_ns), max(1, args.repeat // 2))
+        exact = dict(rewalk(scans, now_ns)[0])
+        top = analytics.summary(now_ns)["overall"]["top"]
+        matches = sum(1 for code, count, error in top if exact.get(code) == count and not error)
+        print(f"{size:>9} {observe_us:>16.2f} {summary_ms:>11.3f} {rewalk_ms:>11.1f} {matches:>10}/{len(exact)}")
+
+
+if __name__ == "__main__":
+    main()
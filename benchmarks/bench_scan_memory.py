@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scan_log import ScanLog
+
+# Bytes per scan of the columnar ScanLog against the original list of
+# {"barcode": ..., "timestamp": strftime(...)} dicts.
+
+
+def build_dicts(barcodes):
+    scans = []
+    for barcode in barcodes:
+        scans.append({
+            # Each scan arrives as a fresh string from the input field
+            "barcode": "".join(barcode),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return scans
+
+
+def build_log(barcodes):
+    scans = ScanLog()
+    for barcode in barcodes:
+        scans.append("".join(barcode), time.time_ns())
+    return scans
+
+
+def measure(builder, barcodes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    scans = builder(barcodes)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return scans, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan history memory per scan")
+    parser.add_argument("--scans", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=20_000, help="distinct barcodes in the stream")
+    args = parser.parse_args()
+
+    codes = [f"{random.randrange(10 ** 13):013d}" for _ in range(args.distinct)]
+    barcodes = [random.choice(codes) for _ in range(args.scans)]
+
+    for label, builder in (("list of dicts", build_dicts), ("ScanLog", build_log)):
+        scans, size, elapsed = measure(builder, barcodes)
+        print(f"{label:<14} {args.scans:>10,} scans  {size / 2 ** 20:8.1f} MiB  "
+              f"{size / args.scans:6.1f} bytes/scan  built in {elapsed:.2f}s")
+        del scans
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scan_log import ScanLog
+from scan_view import PAGE_SIZE, page_slice
+
+# Times the per-rerun work of the paged history view (query + visible page)
+# as the scan history grows, unfiltered and with substring/time filters.
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History view cost per rerun")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--distinct", type=int, default=500, help="distinct barcodes in the history")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    codes = [f"{random.randrange(10 ** 12):012d}" for _ in range(args.distinct)]
+    for size in args.sizes:
+        scans = ScanLog()
+        for i in range(size):
+            scans.append(random.choice(codes), i)
+        needle = codes[0][:4]
+        cases = {
+            "all": lambda: page_slice(scans.query(), 1, PAGE_SIZE),
+            "time range": lambda: page_slice(scans.query("", size * 0.25, size * 0.75), 1, PAGE_SIZE),
+            "substring": lambda: page_slice(scans.query(needle), 1, PAGE_SIZE),
+        }
+        results = "  ".join(f"{name} {timed(fn, args.repeat) * 1e6:8.1f} us" for name, fn in cases.items())
+        print(f"{size:>8,} scans  {results}")
+
+
+if __name__ == "__main__":
+    main()
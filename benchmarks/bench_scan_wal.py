@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scan_wal import ScanWAL, DURABILITY_MODES, replay
+
+# Scan log throughput and append latency for each durability mode, with one or
+# more concurrent writers (e.g. several sessions or input paths).
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run(path, mode, writers, scans, interval_ms, batch_size):
+    wal = ScanWAL(path, mode, interval_ms, batch_size)
+    latencies = [[] for _ in range(writers)]
+
+    def write(worker):
+        for i in range(scans):
+            start = time.perf_counter()
+            wal.append(f"{worker:02d}{i:011d}", time.time_ns())
+            latencies[worker].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wal.close()
+    elapsed = time.perf_counter() - start
+
+    samples = [s for worker in latencies for s in worker]
+    recovered = sum(1 for _ in replay(path))
+    print(f"{mode:<9} writers {writers:>2}  {len(samples) / elapsed:10.0f} scans/s  "
+          f"p50 {percentile(samples, 50) * 1e6:8.1f} us  p99 {percentile(samples, 99) * 1e6:9.1f} us  "
+          f"fsyncs {wal.fsyncs:>6}  recovered {recovered}/{len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan write-ahead log benchmark")
+    parser.add_argument("--scans", type=int, default=2000, help="scans per writer")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--interval-ms", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in DURABILITY_MODES:
+            for writers in args.writers:
+                path = os.path.join(directory, f"{mode}-{writers}.log")
+                run(path, mode, writers, args.scans, args.interval_ms, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
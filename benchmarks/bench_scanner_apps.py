@@ -0,0 +1,252 @@
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import statistics
+import tracemalloc
+import multiprocessing
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from barcode_validate import gs1_check_digit
+
+# Headless scan throughput of the three scanner apps, driven through
+# Streamlit's AppTest. Each run starts one app with a scan log of --history
+# earlier scans (recovered on session start, as after a restart), types
+# --scans unique barcodes into its scan field at --rate scans/s (0 = as fast
+# as the app takes them) and reports:
+#   scans/s        scans recorded per second of wall time
+#   service ms     p50/p95/p99 of the reruns a scan takes to be recorded
+#   latency ms     p50/p95/p99 from the scan's scheduled arrival to recorded,
+#                  which includes waiting behind earlier scans at high rates
+#   memory         Python heap retained per 1,000 scans, traced with
+#                  tracemalloc over --memory-scans further scans after the
+#                  timed ones (tracing slows reruns, so it is kept out of the
+#                  timings), and the final RSS
+#   dropped/dup    fed barcodes missing from, or repeated in, the history
+# Every app/history/rate combination runs in a fresh process. Results are
+# written as JSON; --baseline compares them with an earlier file and exits 1
+# on a regression.
+
+APPS = ("usb-scannerv1.py", "usb-scannerv2.py", "usb-scannerv3.py")
+# Reruns allowed for one scan to show up in the history
+MAX_RERUNS_PER_SCAN = 3
+
+
+def ean13(n):
+    body = f"{n:012d}"
+    return body + gs1_check_digit(body)
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {"p50": round(cuts[49] * 1000, 3), "p95": round(cuts[94] * 1000, 3), "p99": round(cuts[98] * 1000, 3)}
+
+
+def scan_field(at):
+    # v1/v3 use "barcode_input"; v2 rotates the key after every scan
+    return next(field for field in at.text_input if field.key and field.key.startswith("barcode_input"))
+
+
+def feed(at, barcode, expected):
+    scan_field(at).input(barcode).run()
+    reruns = 1
+    # A queued scan may need another rerun before it reaches the history
+    while len(at.session_state.scanned_barcodes) < expected and reruns < MAX_RERUNS_PER_SCAN:
+        at.run()
+        reruns += 1
+    return len(at.exception), len(at.session_state.scanned_barcodes) < expected
+
+
+def run_app(app, history, scans, rate, memory_scans, log_dir, timeout):
+    # Point the app at a scan log pre-filled with `history` earlier scans
+    log_path = os.path.join(log_dir, "scans.log")
+    os.environ["SCAN_LOG_FILE"] = log_path
+    os.environ["SCAN_LOG_DURABILITY"] = "interval"
+    os.environ.pop("SCANNER_DEVICE", None)
+    os.environ.pop("SCAN_AGGREGATOR", None)
+    os.environ.pop("PRODUCT_CATALOG", None)
+    from scan_wal import ScanWAL
+    wal = ScanWAL(log_path, "batch")
+    start_ns = time.time_ns() - history * 1_000_000_000
+    for first in range(0, history, 10000):
+        wal.append_many([(ean13(i), start_ns + i * 1_000_000_000)
+                         for i in range(first, min(history, first + 10000))])
+    wal.close()
+
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, app), default_timeout=timeout)
+    started = time.perf_counter()
+    at.run()
+    startup = time.perf_counter() - started
+    recovered = len(at.session_state.scanned_barcodes)
+
+    fed = [ean13(10 ** 11 + i) for i in range(scans + memory_scans)]
+    service, latency = [], []
+    errors = 0
+    slow = 0
+    started = time.perf_counter()
+    for i, barcode in enumerate(fed[:scans]):
+        due = started + i / rate if rate else time.perf_counter()
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        arrived = time.perf_counter()
+        failures, late = feed(at, barcode, recovered + i + 1)
+        done = time.perf_counter()
+        errors += failures
+        slow += late
+        service.append(done - arrived)
+        latency.append(done - min(due, arrived))
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    for i, barcode in enumerate(fed[scans:], start=scans):
+        failures, late = feed(at, barcode, recovered + i + 1)
+        errors += failures
+        slow += late
+    gc.collect()
+    heap_growth = (tracemalloc.get_traced_memory()[0] - heap_before) / 1e6
+    tracemalloc.stop()
+
+    history_log = at.session_state.scanned_barcodes
+    counts = {}
+    for position in range(recovered, len(history_log)):
+        barcode = history_log.barcode_at(position)
+        counts[barcode] = counts.get(barcode, 0) + 1
+    return {
+        "app": app,
+        "history": history,
+        "rate": rate,
+        "scans": scans,
+        "recovered": recovered,
+        "startup_ms": round(startup * 1000, 1),
+        "scans_per_s": round(scans / elapsed, 1) if elapsed else 0.0,
+        "service_ms": percentiles(service),
+        "latency_ms": percentiles(latency),
+        "rss_mb": round(rss_mb(), 1),
+        "heap_growth_mb": round(heap_growth, 3),
+        "heap_growth_mb_per_1k": round(heap_growth * 1000 / memory_scans, 3) if memory_scans else 0.0,
+        "dropped": sum(1 for barcode in fed if barcode not in counts),
+        "duplicated": sum(count - 1 for count in counts.values() if count > 1),
+        "late": slow,
+        "errors": errors,
+    }
+
+
+def child(queue, *args):
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            queue.put(run_app(*args[:5], log_dir, args[5]))
+    except Exception as e:
+        queue.put({"app": args[0], "history": args[1], "rate": args[3], "failed": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(app, history, scans, rate, memory_scans, timeout):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=child, args=(queue, app, history, scans, rate, memory_scans, timeout))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def key(result):
+    return result["app"], result["history"], result["rate"]
+
+
+# Function to list regressions against an earlier results file: lower
+# throughput, higher p99 latency or any scan lost that was not lost before
+def regressions(results, baseline, tolerance):
+    before = {key(r): r for r in baseline["results"] if "failed" not in r}
+    found = []
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        label = f"{result['app']} history={result['history']} rate={result['rate']}"
+        if "failed" in result:
+            found.append(f"{label}: {result['failed']}")
+            continue
+        if result["scans_per_s"] < old["scans_per_s"] * (1 - tolerance):
+            found.append(f"{label}: {old['scans_per_s']} -> {result['scans_per_s']} scans/s")
+        if result["latency_ms"]["p99"] > old["latency_ms"]["p99"] * (1 + tolerance):
+            found.append(f"{label}: p99 {old['latency_ms']['p99']} -> {result['latency_ms']['p99']} ms")
+        for field in ("dropped", "duplicated", "errors"):
+            if result[field] > old[field]:
+                found.append(f"{label}: {field} {old[field]} -> {result[field]}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless scan throughput of the scanner apps")
+    parser.add_argument("--apps", nargs="+", default=list(APPS))
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 10000], help="scans already in the log")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0, 20], help="scans per second (0 = unpaced)")
+    parser.add_argument("--scans", type=int, default=200, help="scans fed per run")
+    parser.add_argument("--memory-scans", type=int, default=100, help="further scans fed with memory tracing")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed per script run")
+    parser.add_argument("--output", default="scanner-bench.json")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'app':<18} {'history':>8} {'rate':>6} {'scans/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'lat p99':>8} {'MB/1k':>7} {'drop':>5} {'dup':>4} {'err':>4}")
+    for app in args.apps:
+        for history in args.history:
+            for rate in args.rates:
+                result = run_isolated(app, history, args.scans, rate, args.memory_scans, args.timeout)
+                results.append(result)
+                if "failed" in result:
+                    print(f"{app:<18} {history:>8} {rate:>6g} failed: {result['failed']}")
+                    continue
+                print(f"{app:<18} {history:>8} {rate:>6g} {result['scans_per_s']:>8} "
+                      f"{result['service_ms']['p50']:>8} {result['service_ms']['p99']:>8} "
+                      f"{result['latency_ms']['p99']:>8} {result['heap_growth_mb_per_1k']:>7} "
+                      f"{result['dropped']:>5} {result['duplicated']:>4} {result['errors']:>4}")
+
+    import streamlit
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "scans": args.scans,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    failed = any("failed" in r or r["dropped"] or r["duplicated"] or r["errors"] for r in results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(found)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
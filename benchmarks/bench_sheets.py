@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stamp_render import render_stamp_png
+from stamp_sheets import SHEET_ROWS, SHEET_COLS, sheet_layout, render_order_sheets
+
+# Reports sheets per second when turning large physical orders into print sheets.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print sheet generation throughput")
+    parser.add_argument("--quantities", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rows", type=int, default=SHEET_ROWS)
+    parser.add_argument("--cols", type=int, default=SHEET_COLS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        stamp_path = os.path.join(directory, "stamp.png")
+        with open(stamp_path, 'wb') as f:
+            f.write(render_stamp_png("Star", "Forever", "#0000FF", 0.55))
+
+        for quantity in args.quantities:
+            sheets = len(sheet_layout(quantity, args.rows * args.cols))
+            for fmt in ("PNG", "PDF"):
+                best = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    render_order_sheets(stamp_path, quantity, args.rows, args.cols, fmt=fmt)
+                    best = min(best, time.perf_counter() - start)
+                print(f"{quantity:>7,} stamps  {sheets:>5} sheets  {fmt:<4} "
+                      f"{best * 1000:9.1f} ms  {sheets / best:10.1f} sheets/s")
+
+
+if __name__ == "__main__":
+    main()
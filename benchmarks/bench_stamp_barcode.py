@@ -0,0 +1,97 @@
+import io
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stamp_render import render_stamp_png
+from stamp_sheets import render_order_sheets
+from stamp_barcode import (PATTERNS, QUIET_ZONE, MODULE_PX, BAR_HEIGHT, code128_values, code128_image,
+                           imprint, record_code, parse_record_code)
+from scan_images import DECODERS, decode_image
+
+# Cost of imprinting record barcodes: drawing a Code 128 from the precomputed
+# symbol rows in one resize against drawing it bar by bar, the imprint per
+# stamp for a batch of distinct mail pieces, and print sheets for large orders
+# with and without the order's barcode. When a decoder that reads Code 128 is
+# installed, every imprint is decoded and resolved back to its record id.
+
+
+def draw_bars(text, module_px=MODULE_PX, height=BAR_HEIGHT):
+    # What the imprint would cost with one rectangle per bar
+    values = code128_values(text)
+    modules = sum(sum(int(width) for width in PATTERNS[value]) for value in values) + 2 * QUIET_ZONE
+    img = Image.new('L', (modules * module_px, height), 255)
+    draw = ImageDraw.Draw(img)
+    x = QUIET_ZONE
+    for value in values:
+        for i, width in enumerate(PATTERNS[value]):
+            if i % 2 == 0:
+                draw.rectangle((x * module_px, 0, (x + int(width)) * module_px - 1, height - 1), fill=0)
+            x += int(width)
+    return img
+
+
+def per_code_us(func, codes):
+    start = time.perf_counter()
+    for code in codes:
+        func(code)
+    return (time.perf_counter() - start) / len(codes) * 1e6
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record barcode imprint cost")
+    parser.add_argument("--pieces", type=int, default=5000, help="distinct mail pieces imprinted")
+    parser.add_argument("--quantities", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--decode", type=int, default=100, help="imprints decoded back (0 to skip)")
+    args = parser.parse_args()
+
+    ids = [str(uuid.uuid4()) for _ in range(args.pieces)]
+    codes = [record_code("mail_history", record_id) for record_id in ids]
+    stamp = Image.open(io.BytesIO(render_stamp_png("Star", "Forever", "#0000FF", 0.55))).convert('RGB')
+
+    assert all(code128_image.__wrapped__(code).tobytes() == draw_bars(code).tobytes() for code in codes[:50])
+    print(f"{args.pieces} distinct codes, {len(code128_values(codes[0]))} symbols each")
+    print(f"  bars, one rectangle per bar      {per_code_us(draw_bars, codes):8.1f} us/code")
+    print(f"  bars, precomputed rows + resize  {per_code_us(code128_image.__wrapped__, codes):8.1f} us/code")
+    stamp_us = per_code_us(lambda code: render_stamp_png.__wrapped__("Star", "Forever", "#0000FF", 0.55), codes[:500])
+    imprint_us = per_code_us(lambda code: imprint(stamp, code), codes)
+    print(f"  stamp render (for scale)         {stamp_us:8.1f} us/stamp")
+    print(f"  imprint on a stamp               {imprint_us:8.1f} us/piece")
+
+    with tempfile.TemporaryDirectory() as directory:
+        stamp_path = os.path.join(directory, "stamp.png")
+        stamp.save(stamp_path)
+        order_code = record_code("orders", ids[0])
+        for quantity in args.quantities:
+            plain = min(timed(lambda: render_order_sheets(stamp_path, quantity)) for _ in range(3))
+            coded = min(timed(lambda: render_order_sheets(stamp_path, quantity, code=order_code)) for _ in range(3))
+            print(f"  {quantity:>7,} stamp sheets (PDF)       {plain * 1000:8.1f} ms plain, {coded * 1000:.1f} ms with barcode")
+
+    if args.decode and DECODERS and DECODERS[0] != "opencv":
+        resolved = 0
+        for record_id, code in zip(ids[:args.decode], codes):
+            buf = io.BytesIO()
+            imprint(stamp, code).save(buf, format='PNG')
+            for barcode, _ in decode_image(buf.getvalue()):
+                parsed = parse_record_code(barcode)
+                resolved += bool(parsed and record_id.startswith(parsed[1]))
+        print(f"  decoded with {DECODERS[0]}: {resolved}/{min(args.decode, len(ids))} imprints resolved to their id")
+    elif args.decode:
+        print("  decoding skipped: install pyzbar or zxing-cpp (OpenCV does not read Code 128)")
+
+
+if __name__ == "__main__":
+    main()
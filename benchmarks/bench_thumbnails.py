@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stamp_render import render_stamp_png
+from stamp_images import ImageStore
+
+# Image cost of one rerun of the My Collection (150 px) and History (100 px)
+# pages: reading every full-size PNG per entry (what st.image(path) did)
+# against thumbnails served from the in-memory cache, plus the bytes each way
+# sends to the browser per page.
+
+
+def page(paths, load):
+    start = time.perf_counter()
+    sent = sum(len(load(path)) for path in paths)
+    return (time.perf_counter() - start) * 1000, sent
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stamp thumbnail benchmark")
+    parser.add_argument("--stamps", type=int, default=300)
+    parser.add_argument("--history", type=int, default=3000, help="mail/order entries on the History page")
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images = ImageStore(os.path.join(tmp, "stamps"))
+        paths = [images.put(render_stamp_png("Classic", f"Stamp {i}", "#0000FF", 0.55)) for i in range(args.stamps)]
+        # History entries reference the same stamps many times over
+        history = [paths[i % len(paths)] for i in range(args.history)]
+
+        for name, entries, width in (("collection", paths, 150), ("history", history, 100)):
+            before = [page(entries, read_file) for _ in range(args.reruns)]
+            images.thumbnails.clear()
+            cold = page(entries, lambda path: images.thumbnail(path, width))
+            warm = [page(entries, lambda path: images.thumbnail(path, width)) for _ in range(args.reruns)]
+            print(f"{name:<10} {len(entries)} images at {width}px")
+            print(f"  full-size files: {min(t for t, _ in before):8.2f} ms/rerun, {before[0][1] / 1e6:6.2f} MB sent")
+            print(f"  first rerun:     {cold[0]:8.2f} ms (thumbnails made)")
+            print(f"  thumbnails:      {min(t for t, _ in warm):8.2f} ms/rerun, {warm[0][1] / 1e6:6.2f} MB sent")
+        cache = images.thumbnails
+        print(f"cache: {len(cache)} thumbnails, {cache.nbytes() / 1e6:.2f} MB, {cache.hits} hits, {cache.misses} misses")
+
+
+if __name__ == "__main__":
+    main()
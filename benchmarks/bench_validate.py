@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from barcode_validate import validate, gs1_check_digit
+
+# Per-scan validation cost for each kind of input seen on the receiving dock.
+
+
+def retail(length):
+    body = "".join(random.choice("0123456789") for _ in range(length - 1))
+    return body + gs1_check_digit(body)
+
+
+def sample_inputs():
+    gtin = retail(14)
+    return {
+        "EAN-13": [retail(13) for _ in range(1000)],
+        "UPC-A": [retail(12) for _ in range(1000)],
+        "EAN-8": [retail(8) for _ in range(1000)],
+        "GS1-128 (parens)": [f"(01){gtin}(17)250101(10)LOT{i}" for i in range(1000)],
+        "GS1-128 (raw)": [f"]C101{gtin}17250101\x1d10LOT{i}" for i in range(1000)],
+        "Code 128": [f"PKG-{i:08d}" for i in range(1000)],
+        "double scan": [retail(13) + retail(13) for _ in range(1000)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barcode validation cost per scan")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for label, inputs in sample_inputs().items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for barcode in inputs:
+                validate(barcode)
+        count = args.repeat * len(inputs)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<18} {elapsed / count * 1e6:7.2f} us/scan  {count / elapsed:12,.0f} scans/s")
+
+
+if __name__ == "__main__":
+    main()
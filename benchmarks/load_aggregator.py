@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scan_aggregator import ScanAggregator, ScanPublisher, ScanSubscriber, serve
+
+# Multi-station load test for the aggregation server, entirely on localhost.
+# Several stations publish concurrently while dashboards subscribe; checks that
+# every scan arrives exactly once, per-station sequences are complete and the
+# merged stream is in time order.
+
+
+def start_server(aggregator):
+    ready = threading.Event()
+    ports = []
+
+    def on_ready(port):
+        ports.append(port)
+        ready.set()
+
+    thread = threading.Thread(target=lambda: asyncio.run(serve("127.0.0.1", 0, aggregator, on_ready)), daemon=True)
+    thread.start()
+    ready.wait(10)
+    return ports[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregation server load test")
+    parser.add_argument("--stations", type=int, default=10)
+    parser.add_argument("--scans", type=int, default=2000, help="scans per station")
+    parser.add_argument("--rate", type=float, default=0, help="scans per second per station (0 = as fast as possible)")
+    parser.add_argument("--subscribers", type=int, default=2)
+    args = parser.parse_args()
+
+    aggregator = ScanAggregator()
+    port = start_server(aggregator)
+
+    received = [[] for _ in range(args.subscribers)]
+    for i in range(args.subscribers):
+        ScanSubscriber(received[i].append, port=port)
+    time.sleep(0.5)
+
+    publishers = [ScanPublisher(f"station-{n:02d}", port=port) for n in range(args.stations)]
+    interval = 1.0 / args.rate if args.rate else 0
+
+    def station(publisher):
+        for i in range(args.scans):
+            publisher.publish(f"{i:012d}", time.time_ns())
+            if interval:
+                time.sleep(interval)
+        publisher.flush(timeout=60)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=station, args=(p,)) for p in publishers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    sent = args.stations * args.scans
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and any(len(r) < sent for r in received):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.stations} stations x {args.scans} scans = {sent} in {elapsed:.2f}s "
+          f"({sent / elapsed:.0f} scans/s end to end)")
+    print(f"server: duplicates {aggregator.duplicates}, gaps {aggregator.gaps}, merged {aggregator.gseq}")
+    failed = False
+    for i, messages in enumerate(received):
+        out_of_order = sum(1 for a, b in zip(messages, messages[1:]) if b["t"] < a["t"])
+        per_station = {}
+        for m in messages:
+            per_station.setdefault(m["station"], []).append(m["seq"])
+        incomplete = sum(1 for seqs in per_station.values() if seqs != list(range(1, args.scans + 1)))
+        print(f"subscriber {i}: received {len(messages)}/{sent}, out of time order {out_of_order}, "
+              f"stations with missing or reordered seqs {incomplete}")
+        failed |= len(messages) != sent or out_of_order > 0 or incomplete > 0
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scan_queue import ScanQueue
+
+# Load generator for the scan ingestion queue: a producer fires bursts of scans
+# while a consumer drains on a UI-like refresh cadence. Verifies that no scan
+# is dropped or reordered and that arrival timestamps never go backwards.
+
+
+def produce(scan_queue, total, burst, rate):
+    interval = 1.0 / rate
+    sent = 0
+    while sent < total:
+        for _ in range(min(burst, total - sent)):
+            scan_queue.put(f"{sent:012d}")
+            sent += 1
+            time.sleep(interval)
+        # Pause between bursts, like an operator moving to the next carton
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst load test for ScanQueue")
+    parser.add_argument("--scans", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=25, help="scans per burst")
+    parser.add_argument("--rate", type=float, default=200.0, help="scans per second inside a burst")
+    parser.add_argument("--refresh", type=float, default=1.0, help="UI drain interval in seconds")
+    parser.add_argument("--maxsize", type=int, default=100, help="queue bound (small to exercise backpressure)")
+    args = parser.parse_args()
+
+    scan_queue = ScanQueue(maxsize=args.maxsize)
+    producer = threading.Thread(target=produce, args=(scan_queue, args.scans, args.burst, args.rate))
+    start = time.perf_counter()
+    producer.start()
+
+    received, batches = [], []
+    while producer.is_alive() or len(scan_queue):
+        batch = scan_queue.get_batch(timeout=args.refresh)
+        received.extend(batch)
+        if batch:
+            batches.append(len(batch))
+        time.sleep(args.refresh)
+    producer.join()
+    elapsed = time.perf_counter() - start
+
+    expected = [f"{i:012d}" for i in range(args.scans)]
+    dropped = args.scans - len(received)
+    reordered = sum(1 for a, b in zip(received, received[1:]) if b.seq <= a.seq)
+    backwards = sum(1 for a, b in zip(received, received[1:]) if b.monotonic_ns < a.monotonic_ns)
+    mismatched = [s.barcode for s in received] != expected
+
+    print(f"scans {len(received)}/{args.scans} in {elapsed:.2f}s ({len(received) / elapsed:.0f}/s), "
+          f"{len(batches)} batches, largest {max(batches, default=0)}")
+    print(f"dropped {dropped}, reordered {reordered}, clock went backwards {backwards}, "
+          f"content mismatch {mismatched}")
+    if dropped or reordered or backwards or mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stamp_store import open_store
+
+# Many sessions writing to one data file at once. Each writer loads the data
+# (as a rerun does) and adds its own stamps, mail and orders, updates one of
+# its orders, and merges its session copy back. A small compaction threshold
+# keeps compactions running underneath. Afterwards every writer's own store,
+# and a freshly opened one, must hold every record exactly once, with the
+# latest version of every updated order and matching summary totals.
+
+
+def writer(path, name, writers, records, compact_threshold, barrier, results):
+    store = open_store(path)
+    if hasattr(store, "compact_threshold"):
+        store.compact_threshold = compact_threshold
+    session = {'stamps': [], 'mail_history': [], 'orders': []}
+    for i in range(records):
+        stamp = {'id': f"{name}-s{i}", 'path': "", 'design': "Classic", 'text': name, 'value': 0.55}
+        mail = {'stamp_id': stamp['id'], 'recipient': name, 'address': f"{i} Main St", 'date': f"{name}-{i}"}
+        order = {'order_id': f"{name}-o{i}", 'stamp_id': stamp['id'], 'quantity': 1, 'total_cost': 0.55,
+                 'shipping_address': "", 'date': f"{name}-{i}"}
+        store.load()
+        store.append('stamps', stamp)
+        store.append('mail_history', mail)
+        store.append('orders', order)
+        session['stamps'].append(stamp)
+        session['mail_history'].append(mail)
+        session['orders'].append(order)
+    # Update the first order, then save the whole session copy
+    session['orders'][0] = dict(session['orders'][0], quantity=2)
+    store.append('orders', session['orders'][0])
+    store.merge(session)
+    if hasattr(store, "wait_for_compaction"):
+        # Let any compaction this writer started finish before the check
+        store.wait_for_compaction()
+    # Once everyone is done, this writer's own view must have caught up
+    barrier.wait()
+    results.put((name, check(store, writers, records)))
+
+
+def check(store, writers, records):
+    data = store.load()
+    problems = []
+    for table in ('stamps', 'mail_history', 'orders'):
+        expected = writers * records
+        if len(data[table]) != expected:
+            problems.append(f"{table}: {len(data[table])} records, expected {expected}")
+    mail_keys = [m['date'] for m in data['mail_history']]
+    if len(set(mail_keys)) != len(mail_keys):
+        problems.append(f"mail_history: {len(mail_keys) - len(set(mail_keys))} duplicated entries")
+    updated = sum(1 for o in data['orders'] if o['order_id'].endswith("-o0") and o['quantity'] == 2)
+    if updated != writers:
+        problems.append(f"orders: {updated} of {writers} updates kept")
+    totals = store.summary(1)
+    for group, table in (('mail', 'mail_history'), ('orders', 'orders')):
+        counted = totals[group][0][2] if totals[group] else 0
+        if counted != len(data[table]):
+            problems.append(f"summary: {counted} {table} counted, {len(data[table])} stored")
+    return problems
+
+
+def run(kind, path, args):
+    names = [f"w{n:02d}" for n in range(args.writers)]
+    if kind == "threads":
+        barrier, results = threading.Barrier(args.writers), queue.Queue()
+        workers = [threading.Thread(target=writer, args=(path, name, args.writers, args.records, args.compact_every,
+                                                         barrier, results)) for name in names]
+    else:
+        context = multiprocessing.get_context("spawn")
+        barrier, results = context.Barrier(args.writers), context.Queue()
+        workers = [context.Process(target=writer, args=(path, name, args.writers, args.records, args.compact_every,
+                                                        barrier, results)) for name in names]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    # Collected before joining: a process exits only once its queue is flushed
+    views = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    writes = args.writers * (args.records * 3 + 2)
+    store = open_store(path)
+    problems = [f"fresh store: {problem}" for problem in check(store, args.writers, args.records)]
+    problems += [f"{name}'s store: {problem}" for name, view in sorted(views) for problem in view]
+    print(f"{kind:<9} {os.path.basename(path):<10} {args.writers} writers, {writes} writes in {elapsed:.2f}s "
+          f"({writes / elapsed:,.0f}/s): {'OK' if not problems else 'FAILED'}")
+    for problem in problems:
+        print(f"  {problem}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent writers against the stamp data store")
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--records", type=int, default=200, help="stamps, mail and orders per writer")
+    parser.add_argument("--compact-every", type=int, default=500, help="journal compaction threshold")
+    args = parser.parse_args()
+
+    ok = True
+    for kind in ("threads", "processes"):
+        for filename in ("data.json", "data.db"):
+            with tempfile.TemporaryDirectory() as tmp:
+                ok &= run(kind, os.path.join(tmp, filename), args)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import io
+import os
+import csv
+import json
+import time
+import argparse
+
+from scan_log import format_timestamp
+from scan_wal import replay
+from barcode_validate import validate
+from stamp_store import open_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Streaming exports of the scan history, mail history and orders. Rows come
+# from generators and are encoded a chunk at a time, so the output side holds
+# one chunk in memory, never the whole export. Scan logs and SQLite stores are
+# read incrementally too; a JSON store (data.json) loads its tables whole
+# before the first row.
+
+# Rows encoded per chunk (and per Parquet row group)
+CHUNK_ROWS = 10000
+
+SCAN_COLUMNS = ("barcode", "timestamp", "timestamp_ns", "symbology", "status", "decision")
+MAIL_COLUMNS = ("mail_id", "date", "recipient", "address", "stamp_id", "stamp_text", "stamp_design", "stamp_value")
+ORDER_COLUMNS = ("order_id", "date", "stamp_id", "quantity", "total_cost", "shipping_address",
+                 "stamp_text", "stamp_design", "stamp_value")
+TABLE_COLUMNS = {"scans": SCAN_COLUMNS, "mail_history": MAIL_COLUMNS, "orders": ORDER_COLUMNS}
+# Parquet column types; anything not listed is a string
+COLUMN_TYPES = {"timestamp_ns": "int64", "quantity": "int64", "total_cost": "float64", "stamp_value": "float64"}
+
+FORMATS = ("csv", "jsonl") + (("parquet",) if pq else ())
+MIME_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+
+# Function to read scans back from a ScanLog, optionally only some positions
+def scan_rows(scans, positions=None):
+    for position in (range(len(scans)) if positions is None else positions):
+        row = scans[position]
+        row["timestamp_ns"] = scans.timestamp_at(position)
+        yield row
+
+
+# Function to read scans from a write-ahead log file, validated the way the
+# scanner apps record them
+def wal_scan_rows(path):
+    for raw, timestamp_ns, _ in replay(path):
+        result = validate(raw)
+        yield {
+            "barcode": result.barcode,
+            "timestamp": format_timestamp(timestamp_ns),
+            "timestamp_ns": timestamp_ns,
+            "symbology": result.symbology,
+            "status": result.error or "",
+            "decision": "",
+        }
+
+
+# Function to flatten mail_history or orders entries with their stamp design
+def history_rows(store, table):
+    for entry, stamp in store.iter_history(table):
+        row = dict(entry)
+        if stamp:
+            row["stamp_text"] = stamp.get("text")
+            row["stamp_design"] = stamp.get("design")
+            row["stamp_value"] = stamp.get("value")
+        yield row
+
+
+def _chunks(rows, chunk_rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_chunks(rows, columns, chunk_rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns, extrasaction='ignore')
+    writer.writeheader()
+    for chunk in _chunks(rows, chunk_rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _jsonl_chunks(rows, columns, chunk_rows):
+    for chunk in _chunks(rows, chunk_rows):
+        yield "".join(json.dumps({c: row.get(c) for c in columns}) + "\n" for row in chunk).encode('utf-8')
+
+
+# File object the Parquet writer writes into; what it collects is handed out
+# after each row group. It keeps counting positions, which the footer needs.
+class _ParquetSink:
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_chunks(rows, columns, chunk_rows):
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = pa.schema([(c, getattr(pa, COLUMN_TYPES.get(c, "string"))()) for c in columns])
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in _chunks(rows, chunk_rows):
+            writer.write_table(pa.Table.from_pylist([{c: row.get(c) for c in columns} for row in chunk], schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+ENCODERS = {"csv": _csv_chunks, "jsonl": _jsonl_chunks, "parquet": _parquet_chunks}
+
+
+# Function to encode rows as a stream of byte chunks in the given format
+def export_chunks(rows, columns, fmt="csv", chunk_rows=CHUNK_ROWS):
+    if fmt not in ENCODERS:
+        raise ValueError(f"unknown export format {fmt!r}, expected one of {tuple(ENCODERS)}")
+    return ENCODERS[fmt](rows, columns, chunk_rows)
+
+
+# Function to export to a file; returns the number of bytes written
+def write_export(rows, columns, path, fmt="csv", chunk_rows=CHUNK_ROWS):
+    written = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        for chunk in export_chunks(rows, columns, fmt, chunk_rows):
+            f.write(chunk)
+            written += len(chunk)
+    os.replace(tmp_path, path)
+    return written
+
+
+# Function to build a whole export in memory, for a browser download
+def export_bytes(rows, columns, fmt="csv"):
+    return b"".join(export_chunks(rows, columns, fmt))
+
+
+def format_from_path(path):
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return {"ndjson": "jsonl", "pq": "parquet"}.get(extension, extension)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export scan, mail or order history")
+    parser.add_argument("table", choices=TABLE_COLUMNS)
+    parser.add_argument("output", help="output file; the format follows the extension (.csv, .jsonl, .parquet)")
+    parser.add_argument("--source", help="scan log (scans) or data file (mail_history, orders)")
+    parser.add_argument("--format", choices=tuple(ENCODERS), help="override the format from the extension")
+    args = parser.parse_args()
+
+    fmt = args.format or format_from_path(args.output)
+    if fmt not in ENCODERS:
+        parser.error(f"cannot tell the format of {args.output}; use --format")
+    if args.table == "scans":
+        rows = wal_scan_rows(args.source or os.environ.get("SCAN_LOG_FILE", "scans.log"))
+    else:
+        rows = history_rows(open_store(args.source or os.environ.get("STAMP_DATA_FILE", "data.json")), args.table)
+
+    counted = {"rows": 0}
+
+    def counting(rows):
+        for row in rows:
+            counted["rows"] += 1
+            yield row
+
+    start = time.perf_counter()
+    size = write_export(counting(rows), TABLE_COLUMNS[args.table], args.output, fmt)
+    print(f"Exported {counted['rows']} {args.table} rows to {args.output} "
+          f"({size / 1e6:.1f} MB, {time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,155 @@
+import os
+import re
+import csv
+import sys
+import time
+import sqlite3
+import threading
+from functools import lru_cache
+from collections import namedtuple
+
+# Product lookup for scanned barcodes. The catalog lives in a SQLite file keyed
+# by GTIN; a CSV catalog is imported into a SQLite index next to it the first
+# time it is opened (and again whenever the CSV is newer). Nothing is loaded
+# up front: each lookup is one primary-key read, and recent lookups are kept
+# in an in-process LRU cache, so busy products cost a dictionary hit.
+
+Product = namedtuple("Product", "barcode name price")
+
+# Recently looked-up barcodes kept in memory (hits and misses)
+CACHE_SIZE = 65536
+# Rows inserted per transaction while importing a CSV
+IMPORT_BATCH = 50000
+
+# Header names accepted for each catalog column
+BARCODE_COLUMNS = ("barcode", "gtin", "ean", "upc", "sku")
+NAME_COLUMNS = ("name", "description", "title")
+PRICE_COLUMNS = ("price", "unit_price")
+
+GS1_GTIN = re.compile(r"^\(01\)(\d{14})")
+
+
+# Function to map a barcode to its catalog key. Retail codes (EAN-8, UPC-A,
+# EAN-13) and GTIN-14 are zero-padded to 14 digits, so a UPC-A scan finds the
+# same product as its EAN-13 form; GS1-128 scans are looked up by their (01) GTIN.
+def catalog_key(barcode):
+    match = GS1_GTIN.match(barcode)
+    if match:
+        return match.group(1)
+    if barcode.isascii() and barcode.isdigit() and len(barcode) <= 14:
+        return barcode.zfill(14)
+    return barcode
+
+
+def _column(header, names):
+    for i, column in enumerate(header):
+        if column.strip().lower() in names:
+            return i
+    raise ValueError(f"catalog has no {names[0]} column (looked for {', '.join(names)})")
+
+
+def _parse_price(value):
+    value = value.strip().lstrip("$")
+    return float(value) if value else None
+
+
+# Function to import a CSV catalog (header with barcode, name and price columns)
+# into a SQLite index. Rows stream through in batches, so memory use does not
+# depend on the catalog size.
+def import_csv(csv_path, db_path):
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        conn.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE products (barcode TEXT PRIMARY KEY, name TEXT, price REAL) WITHOUT ROWID;
+        """)
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            barcode_col = _column(header, BARCODE_COLUMNS)
+            name_col = _column(header, NAME_COLUMNS)
+            price_col = _column(header, PRICE_COLUMNS)
+            batch = []
+            for row in reader:
+                if not row or not row[barcode_col].strip():
+                    continue
+                batch.append((catalog_key(row[barcode_col].strip()), row[name_col].strip(), _parse_price(row[price_col])))
+                if len(batch) >= IMPORT_BATCH:
+                    conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?)", batch)
+                    conn.commit()
+                    count += len(batch)
+                    batch = []
+            conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?)", batch)
+            conn.commit()
+            count += len(batch)
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+# Function to return the SQLite index for a catalog file, importing a CSV when
+# its index is missing or older than the CSV
+def catalog_index(path):
+    if not path.lower().endswith(".csv"):
+        return path
+    db_path = path + ".db"
+    if not os.path.exists(db_path) or os.path.getmtime(db_path) < os.path.getmtime(path):
+        import_csv(path, db_path)
+    return db_path
+
+
+class ProductCatalog:
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        self.path = catalog_index(path)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+        # Streamlit serves sessions from several threads; each gets its own read-only connection
+        self._local = threading.local()
+        self._cached = lru_cache(maxsize=cache_size)(self._fetch)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def _fetch(self, key):
+        row = self._conn().execute("SELECT barcode, name, price FROM products WHERE barcode = ?", (key,)).fetchone()
+        return Product(*row) if row else None
+
+    # Function to look up one scanned barcode; returns a Product or None
+    def lookup(self, barcode):
+        return self._cached(catalog_key(barcode))
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+
+def format_price(price):
+    return "" if price is None else f"${price:,.2f}"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "lookup"):
+        print("Usage: python product_catalog.py build catalog.csv\n"
+              "       python product_catalog.py lookup catalog.(csv|db) BARCODE [BARCODE ...]")
+        sys.exit(1)
+    if sys.argv[1] == "build":
+        start = time.perf_counter()
+        count = import_csv(sys.argv[2], sys.argv[2] + ".db")
+        print(f"Imported {count} products into {sys.argv[2]}.db in {time.perf_counter() - start:.1f}s")
+    else:
+        catalog = ProductCatalog(sys.argv[2])
+        for barcode in sys.argv[3:]:
+            product = catalog.lookup(barcode)
+            print(f"{barcode}: {product.name} {format_price(product.price)}" if product else f"{barcode}: not in catalog")
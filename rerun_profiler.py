@@ -0,0 +1,222 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+import streamlit as st
+
+# Rerun-cost profiling for the Streamlit apps. Every interaction re-executes
+# the whole script, so each rerun is split into laps (setup, state load, page
+# dispatch, render) and the hot helpers it calls are timed as phases. Durations
+# go into fixed-bucket histograms per page and phase, which give p50/p99
+# estimates and can be exported as Prometheus text. Profilers live at module
+# level, so they survive reruns and are shared by every session of the process.
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Set RERUN_PROFILER=1 to show the profile panel in the sidebar
+RERUN_PROFILER = os.environ.get("RERUN_PROFILER", "") not in ("", "0")
+# Set RERUN_METRICS_FILE to keep a Prometheus text file up to date (for a
+# node_exporter textfile collector), rewritten at most every RERUN_METRICS_SECONDS
+RERUN_METRICS_FILE = os.environ.get("RERUN_METRICS_FILE")
+RERUN_METRICS_SECONDS = 15
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    # Estimate a quantile by linear interpolation inside its bucket, the way
+    # Prometheus' histogram_quantile does
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Rerun:
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.page = ""
+        self.started = time.perf_counter()
+        self._lap_started = self.started
+        self._timings = []
+        self.finished = False
+
+    # Record the time since the previous lap under `phase`
+    def lap(self, phase):
+        now = time.perf_counter()
+        self._timings.append((phase, now - self._lap_started))
+        self._lap_started = now
+
+    def add(self, phase, seconds):
+        self._timings.append((phase, seconds))
+
+    # Close the rerun: the time since the last lap counts as "render"
+    def finish(self):
+        if self.finished:
+            return
+        self.lap("render")
+        self.finished = True
+        self._timings.append(("rerun", self._lap_started - self.started))
+        self.profiler.record(self.page, self._timings)
+
+
+class RerunProfiler:
+    def __init__(self, app):
+        self.app = app
+        # (page, phase) -> Histogram
+        self.histograms = {}
+        self._lock = threading.Lock()
+        # Streamlit runs each session's script on its own thread
+        self._local = threading.local()
+        self._metrics_written = 0.0
+
+    # Start timing a rerun. A rerun cut short by st.rerun() or st.stop() never
+    # reaches finish(); it is closed when the next one starts on the thread.
+    def start(self):
+        previous = getattr(self._local, "rerun", None)
+        if previous is not None and not previous.finished:
+            previous.finished = True
+            self.record(previous.page, previous._timings)
+        self._local.rerun = Rerun(self)
+        return self._local.rerun
+
+    def current(self):
+        rerun = getattr(self._local, "rerun", None)
+        return rerun if rerun is not None and not rerun.finished else None
+
+    # Time a block as a phase of the current rerun
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            rerun = self.current()
+            if rerun is not None:
+                rerun.add(name, time.perf_counter() - started)
+
+    # Decorator form of phase()
+    def timed(self, name):
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, page, timings):
+        with self._lock:
+            for phase, seconds in timings:
+                histogram = self.histograms.get((page, phase))
+                if histogram is None:
+                    histogram = self.histograms[(page, phase)] = Histogram()
+                histogram.observe(seconds)
+        if RERUN_METRICS_FILE and time.monotonic() - self._metrics_written >= RERUN_METRICS_SECONDS:
+            self._metrics_written = time.monotonic()
+            write_prometheus(RERUN_METRICS_FILE)
+
+    # Rows of (page, phase, count, mean, p50, p99) in seconds, slowest p99 first
+    def summary(self):
+        with self._lock:
+            rows = [(page, phase, h.count, h.sum / h.count, h.quantile(0.5), h.quantile(0.99))
+                    for (page, phase), h in self.histograms.items()]
+        return sorted(rows, key=lambda row: row[5], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+# One profiler per app, kept across reruns
+_profilers = {}
+_profilers_guard = threading.Lock()
+
+
+def get_profiler(app):
+    with _profilers_guard:
+        if app not in _profilers:
+            _profilers[app] = RerunProfiler(app)
+        return _profilers[app]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+# Function to render every profiler's histograms in the Prometheus text format
+def prometheus_text():
+    lines = [
+        "# HELP streamlit_rerun_seconds Time spent per rerun phase of the Streamlit apps.",
+        "# TYPE streamlit_rerun_seconds histogram",
+    ]
+    with _profilers_guard:
+        profilers = list(_profilers.values())
+    for profiler in profilers:
+        with profiler._lock:
+            histograms = sorted(profiler.histograms.items())
+            for (page, phase), h in histograms:
+                labels = _labels(app=profiler.app, page=page, phase=phase)
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'streamlit_rerun_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'streamlit_rerun_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"streamlit_rerun_seconds_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"streamlit_rerun_seconds_count{{{labels}}} {h.count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+# Debug panel: p50/p99 per page and phase, with the Prometheus export
+def render_profiler_panel(profiler):
+    if not RERUN_PROFILER:
+        return
+    with st.sidebar.expander("Rerun profile"):
+        rows = profiler.summary()
+        if not rows:
+            st.caption("No completed reruns yet.")
+            return
+        st.table([
+            {"page": page or "-", "phase": phase, "reruns": count,
+             "mean ms": f"{mean * 1000:.1f}", "p50 ms": f"{p50 * 1000:.1f}", "p99 ms": f"{p99 * 1000:.1f}"}
+            for page, phase, count, mean, p50, p99 in rows
+        ])
+        col1, col2 = st.columns(2)
+        col1.download_button("Prometheus", data=prometheus_text(), file_name="rerun-metrics.prom",
+                             mime="text/plain", key="rerun_profile_export")
+        if col2.button("Reset", key="rerun_profile_reset"):
+            profiler.reset()
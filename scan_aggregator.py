@@ -0,0 +1,294 @@
+import sys
+import json
+import time
+import uuid
+import heapq
+import queue
+import socket
+import asyncio
+import argparse
+import threading
+from collections import deque
+
+# Local aggregation service for several scanning stations. Stations publish
+# their scans over TCP (JSON Lines); the server merges them into one
+# time-ordered stream and fans it out to subscriber dashboards.
+#
+# Protocol, one JSON object per line:
+#   client -> server  {"type": "hello", "role": "publisher", "station": "dock-1", "session": "<uuid>"}
+#                     {"type": "hello", "role": "subscriber", "replay": 100}
+#   publisher         {"type": "scan", "seq": 1, "barcode": "...", "t": <epoch ns>}
+#   server -> pub     {"type": "ack", "seq": <highest seq received>}
+#   server -> sub     {"type": "hello", "epoch": "<uuid>"}, then
+#                     {"type": "scan", "gseq": 1, "station": "dock-1", "seq": 1, "barcode": "...", "t": <epoch ns>}
+# gseq numbers the merged stream from 1 for each server epoch; a restarted
+# server has a new epoch and starts again at 1.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Scans are held this long so late arrivals from other stations can be merged in time order
+REORDER_WINDOW_MS = 250
+# Merged scans kept for subscribers that ask for a replay on connect
+HISTORY_SIZE = 10000
+# Scans a subscriber may fall behind before it is disconnected
+SUBSCRIBER_BUFFER = 10000
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + "\n").encode()
+
+
+class ScanAggregator:
+    def __init__(self, reorder_window_ms=REORDER_WINDOW_MS, history_size=HISTORY_SIZE):
+        self.reorder_window_ns = reorder_window_ms * 1_000_000
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self.gseq = 0
+        # Identifies this run of the server, so subscribers notice a restart
+        self.epoch = str(uuid.uuid4())
+        # Highest seq seen per (station, session); lower or equal seqs are resends
+        self.last_seq = {}
+        self.duplicates = 0
+        self.gaps = 0
+        self._pending = []
+
+    # Accept one scan from a station; returns False for a duplicate
+    def publish(self, station, session, seq, barcode, timestamp_ns):
+        key = (station, session)
+        last = self.last_seq.get(key, 0)
+        if seq <= last:
+            self.duplicates += 1
+            return False
+        if seq > last + 1:
+            self.gaps += seq - last - 1
+        self.last_seq[key] = seq
+        heapq.heappush(self._pending, (timestamp_ns, station, seq, barcode))
+        return True
+
+    # Emit every held scan older than the reorder window, in time order
+    def release(self, now_ns=None, everything=False):
+        watermark = (now_ns or time.time_ns()) - self.reorder_window_ns
+        released = []
+        while self._pending and (everything or self._pending[0][0] <= watermark):
+            timestamp_ns, station, seq, barcode = heapq.heappop(self._pending)
+            self.gseq += 1
+            message = {"type": "scan", "gseq": self.gseq, "station": station, "seq": seq,
+                       "barcode": barcode, "t": timestamp_ns}
+            self.history.append(message)
+            released.append(message)
+        if released:
+            data = b"".join(encode(m) for m in released)
+            for outbox in list(self.subscribers):
+                try:
+                    outbox.put_nowait(data)
+                except asyncio.QueueFull:
+                    # A stalled dashboard must not hold up the stations: drop
+                    # its backlog and disconnect it (it can reconnect and replay)
+                    self.subscribers.discard(outbox)
+                    while not outbox.empty():
+                        outbox.get_nowait()
+                    outbox.put_nowait(None)
+        return released
+
+    async def handle_client(self, reader, writer):
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            if hello.get("role") == "publisher":
+                await self._serve_publisher(hello, reader, writer)
+            elif hello.get("role") == "subscriber":
+                await self._serve_subscriber(hello, reader, writer)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_publisher(self, hello, reader, writer):
+        station = hello.get("station", "unknown")
+        session = hello.get("session", "")
+        received = b""
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            # Everything that arrived together is published, then acknowledged once
+            *lines, received = (received + data).split(b"\n")
+            for line in lines:
+                message = json.loads(line)
+                if message.get("type") == "scan":
+                    self.publish(station, session, message["seq"], message["barcode"], message["t"])
+            writer.write(encode({"type": "ack", "seq": self.last_seq.get((station, session), 0)}))
+            await writer.drain()
+
+    async def _serve_subscriber(self, hello, reader, writer):
+        outbox = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        replay = list(self.history)[-int(hello.get("replay", 0)):] if hello.get("replay") else []
+        writer.write(encode({"type": "hello", "epoch": self.epoch}) + b"".join(encode(m) for m in replay))
+        self.subscribers.add(outbox)
+        try:
+            while True:
+                data = await outbox.get()
+                if data is None:
+                    return
+                writer.write(data)
+                await writer.drain()
+        finally:
+            self.subscribers.discard(outbox)
+
+    async def run_releaser(self, tick_ms=20):
+        while True:
+            await asyncio.sleep(tick_ms / 1000)
+            self.release()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, aggregator=None, ready=None):
+    aggregator = aggregator or ScanAggregator()
+    server = await asyncio.start_server(aggregator.handle_client, host, port)
+    releaser = asyncio.create_task(aggregator.run_releaser())
+    if ready:
+        ready(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        releaser.cancel()
+
+
+# Publishing client for a scanning station. publish() never blocks the UI:
+# scans go onto a local queue and a background thread sends them, keeping
+# unacknowledged scans to resend after a reconnect.
+class ScanPublisher:
+    def __init__(self, station, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.station = station
+        self.host = host
+        self.port = port
+        self.session = str(uuid.uuid4())
+        self.connected = False
+        self._seq = 0
+        self._acked_seq = 0
+        self._outbox = queue.Queue()
+        self._unacked = deque()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"publisher:{station}", daemon=True)
+        self._thread.start()
+
+    def publish(self, barcode, timestamp_ns):
+        with self._lock:
+            self._seq += 1
+            self._outbox.put((self._seq, encode({"type": "scan", "seq": self._seq, "barcode": barcode, "t": timestamp_ns})))
+            return self._seq
+
+    # Wait until every published scan has been acknowledged by the server
+    def flush(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._acked_seq >= self._seq:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _run(self):
+        backoff = 0.1
+        while True:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=5) as sock:
+                    sock.sendall(encode({"type": "hello", "role": "publisher",
+                                         "station": self.station, "session": self.session}))
+                    if self._unacked:
+                        sock.sendall(b"".join(line for _, line in self._unacked))
+                    self.connected = True
+                    backoff = 0.1
+                    self._pump(sock)
+            except OSError:
+                pass
+            self.connected = False
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 5)
+
+    def _pump(self, sock):
+        sock.settimeout(0.05)
+        received = b""
+        while True:
+            batch = []
+            try:
+                batch.append(self._outbox.get(timeout=0.05))
+                while len(batch) < 500:
+                    batch.append(self._outbox.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._unacked.extend(batch)
+                sock.sendall(b"".join(line for _, line in batch))
+            try:
+                data = sock.recv(65536)
+                if not data:
+                    return
+                received += data
+            except socket.timeout:
+                continue
+            *lines, received = received.split(b"\n")
+            for line in lines:
+                acked = json.loads(line).get("seq", 0)
+                self._acked_seq = max(self._acked_seq, acked)
+                while self._unacked and self._unacked[0][0] <= acked:
+                    self._unacked.popleft()
+
+
+# Subscribing client for dashboards: a background thread reads the merged
+# stream and hands each scan message to on_scan.
+class ScanSubscriber:
+    def __init__(self, on_scan, host=DEFAULT_HOST, port=DEFAULT_PORT, replay=0):
+        self.on_scan = on_scan
+        self.host = host
+        self.port = port
+        self.replay = replay
+        self.connected = False
+        self.epoch = None
+        self.last_gseq = 0
+        self._thread = threading.Thread(target=self._run, name="subscriber", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=5) as sock:
+                    sock.settimeout(None)
+                    sock.sendall(encode({"type": "hello", "role": "subscriber", "replay": self.replay}))
+                    self.connected = True
+                    for line in sock.makefile('rb'):
+                        message = json.loads(line)
+                        if message.get("type") == "hello":
+                            # A restarted server numbers its stream from 1 again
+                            if message.get("epoch") != self.epoch:
+                                self.epoch = message.get("epoch")
+                                self.last_gseq = 0
+                            continue
+                        # Replayed history can overlap what was already seen before a reconnect
+                        if message["gseq"] > self.last_gseq:
+                            self.last_gseq = message["gseq"]
+                            self.on_scan(message)
+            except (OSError, ValueError):
+                pass
+            self.connected = False
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-station scan aggregation server")
+    parser.add_argument("command", choices=["serve", "tail"])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        print(f"Aggregating scans on {args.host}:{args.port}")
+        try:
+            asyncio.run(serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        ScanSubscriber(lambda m: print(f"{m['gseq']:>8} {m['station']:<12} {m['barcode']}"),
+                       args.host, args.port, replay=20)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            sys.exit(0)
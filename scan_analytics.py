@@ -0,0 +1,271 @@
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime
+
+import streamlit as st
+
+# Scan analytics kept up to date as scans arrive: scans per minute, the most
+# scanned codes and idle gaps, per station and overall. Every structure is
+# updated in O(1) per scan and has a fixed size, so rendering the panel costs
+# the same whether the history holds a hundred scans or ten million.
+
+# Minutes of per-minute counts kept
+WINDOW_MINUTES = 60
+# Codes tracked by the heavy-hitters summary (its error shrinks as this grows)
+TOP_K = 100
+# Codes shown in the panel
+TOP_SHOWN = 10
+# A pause of at least SCAN_IDLE_GAP_SECONDS between two scans is an idle gap
+IDLE_GAP_SECONDS = float(os.environ.get("SCAN_IDLE_GAP_SECONDS", 120))
+# Idle gaps kept per station
+RECENT_GAPS = 20
+
+
+class _Bucket:
+    __slots__ = ("count", "items", "prev", "next")
+
+    def __init__(self, count, prev=None, next=None):
+        self.count = count
+        # Codes at this count, oldest first
+        self.items = {}
+        self.prev = prev
+        self.next = next
+
+
+# Space-Saving heavy hitters: at most k codes are counted. A code that is not
+# tracked replaces one with the lowest count and inherits that count as its
+# possible overestimate, so any code seen more than total/k times is always in
+# the summary. Codes are kept in a linked list of count buckets (the "stream
+# summary"), which makes every update O(1).
+class TopK:
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self._bucket_of = {}
+        self._error = {}
+        # Bucket with the lowest count
+        self._min = None
+
+    def add(self, item):
+        bucket = self._bucket_of.get(item)
+        if bucket is None:
+            if len(self._bucket_of) < self.k:
+                # New codes start in a zero bucket and are moved up like any other
+                self._min = bucket = _Bucket(0, next=self._min)
+                if bucket.next is not None:
+                    bucket.next.prev = bucket
+                self._error[item] = 0
+            else:
+                # Evict the oldest code with the lowest count
+                bucket = self._min
+                victim = next(iter(bucket.items))
+                del bucket.items[victim], self._bucket_of[victim], self._error[victim]
+                self._error[item] = bucket.count
+            bucket.items[item] = None
+            self._bucket_of[item] = bucket
+        self._increment(item, bucket)
+
+    def _increment(self, item, bucket):
+        target = bucket.next
+        if target is None or target.count != bucket.count + 1:
+            target = _Bucket(bucket.count + 1, prev=bucket, next=bucket.next)
+            if bucket.next is not None:
+                bucket.next.prev = target
+            bucket.next = target
+        del bucket.items[item]
+        target.items[item] = None
+        self._bucket_of[item] = target
+        if not bucket.items:
+            self._unlink(bucket)
+
+    def _unlink(self, bucket):
+        if bucket.prev is not None:
+            bucket.prev.next = bucket.next
+        else:
+            self._min = bucket.next
+        if bucket.next is not None:
+            bucket.next.prev = bucket.prev
+
+    # The n most scanned codes as (code, count, error): the true count lies
+    # between count - error and count
+    def top(self, n=TOP_SHOWN):
+        ranked = sorted(self._bucket_of.items(), key=lambda entry: entry[1].count, reverse=True)
+        return [(item, bucket.count, self._error[item]) for item, bucket in ranked[:n]]
+
+    def __len__(self):
+        return len(self._bucket_of)
+
+
+class StationStats:
+    def __init__(self, top_k=TOP_K, window_minutes=WINDOW_MINUTES, idle_gap_seconds=IDLE_GAP_SECONDS):
+        self.total = 0
+        self.first_ns = None
+        self.last_ns = None
+        # Ring of per-minute counts: slot -> (minute number, count)
+        self.window_minutes = window_minutes
+        self._minutes = [-1] * window_minutes
+        self._counts = [0] * window_minutes
+        self.top_codes = TopK(top_k)
+        self.idle_gap_ns = int(idle_gap_seconds * 1e9)
+        self.gaps = deque(maxlen=RECENT_GAPS)
+        self.idle_periods = 0
+        self.longest_gap_ns = 0
+
+    def observe(self, barcode, timestamp_ns):
+        self.total += 1
+        self.top_codes.add(barcode)
+        minute = timestamp_ns // 60_000_000_000
+        slot = minute % self.window_minutes
+        if self._minutes[slot] < minute:
+            self._minutes[slot] = minute
+            self._counts[slot] = 0
+        # A scan older than the window (a late import) only counts in the totals
+        if self._minutes[slot] == minute:
+            self._counts[slot] += 1
+        if self.first_ns is None or timestamp_ns < self.first_ns:
+            self.first_ns = timestamp_ns
+        if self.last_ns is None:
+            self.last_ns = timestamp_ns
+        elif timestamp_ns > self.last_ns:
+            gap = timestamp_ns - self.last_ns
+            if gap >= self.idle_gap_ns:
+                self.gaps.append((self.last_ns, timestamp_ns))
+                self.idle_periods += 1
+            self.longest_gap_ns = max(self.longest_gap_ns, gap)
+            self.last_ns = timestamp_ns
+
+    # Counts for the `minutes` minutes up to and including now, oldest first
+    def per_minute(self, now_ns, minutes=None):
+        minutes = min(minutes or self.window_minutes, self.window_minutes)
+        now_minute = now_ns // 60_000_000_000
+        counts = []
+        for minute in range(now_minute - minutes + 1, now_minute + 1):
+            slot = minute % self.window_minutes
+            counts.append(self._counts[slot] if self._minutes[slot] == minute else 0)
+        return counts
+
+    # Average scans per minute over the last `minutes` minutes
+    def rate(self, now_ns, minutes=1):
+        return sum(self.per_minute(now_ns, minutes)) / minutes
+
+    def idle_ns(self, now_ns):
+        return 0 if self.last_ns is None else max(0, now_ns - self.last_ns)
+
+
+# Analytics for every station plus the combined stream. Scans may be observed
+# from another thread (the supervisor's subscription) while a rerun reads them.
+class ScanAnalytics:
+    def __init__(self, top_k=TOP_K, window_minutes=WINDOW_MINUTES, idle_gap_seconds=IDLE_GAP_SECONDS):
+        self._settings = (top_k, window_minutes, idle_gap_seconds)
+        self.overall = StationStats(*self._settings)
+        self.stations = {}
+        self._lock = threading.Lock()
+
+    def observe(self, station, barcode, timestamp_ns=None):
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        with self._lock:
+            stats = self.stations.get(station)
+            if stats is None:
+                stats = self.stations[station] = StationStats(*self._settings)
+            stats.observe(barcode, timestamp_ns)
+            self.overall.observe(barcode, timestamp_ns)
+
+    def reset(self):
+        with self._lock:
+            self.overall = StationStats(*self._settings)
+            self.stations = {}
+
+    # Everything the panel shows, copied under the lock
+    def summary(self, now_ns=None):
+        if now_ns is None:
+            now_ns = time.time_ns()
+
+        def describe(stats):
+            return {
+                "total": stats.total,
+                "per_minute": stats.per_minute(now_ns),
+                "last_minute": stats.rate(now_ns, 1),
+                "last_15_minutes": stats.rate(now_ns, 15),
+                "idle_seconds": stats.idle_ns(now_ns) / 1e9,
+                "idle_periods": stats.idle_periods,
+                "longest_gap_seconds": stats.longest_gap_ns / 1e9,
+                "gaps": list(stats.gaps),
+                "top": stats.top_codes.top(),
+            }
+
+        with self._lock:
+            return {
+                "now_ns": now_ns,
+                "idle_gap_seconds": self.overall.idle_gap_ns / 1e9,
+                "overall": describe(self.overall),
+                "stations": {name: describe(stats) for name, stats in sorted(self.stations.items())},
+            }
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds // 60 % 60:02d}m"
+
+
+# Dashboard panel: rates, per-minute chart, top codes and idle gaps. Its cost
+# depends on the window and TOP_SHOWN, not on how many scans were observed.
+def render_analytics_panel(analytics, now_ns=None):
+    summary = analytics.summary(now_ns)
+    overall = summary["overall"]
+    if not overall["total"]:
+        st.caption("No scans yet.")
+        return
+    idle_gap = summary["idle_gap_seconds"]
+
+    rate, average, idle = st.columns(3)
+    rate.metric("Scans in the last minute", f"{overall['last_minute']:.0f}")
+    average.metric("Scans/min (15 min)", f"{overall['last_15_minutes']:.1f}")
+    idle.metric("Idle for", format_duration(overall["idle_seconds"]),
+                "idle" if overall["idle_seconds"] >= idle_gap else None, delta_color="off")
+
+    minutes = overall["per_minute"]
+    now_minute = summary["now_ns"] // 60_000_000_000
+    st.bar_chart({
+        "scans": {
+            datetime.fromtimestamp((now_minute - len(minutes) + 1 + i) * 60).strftime("%H:%M"): count
+            for i, count in enumerate(minutes)
+        }
+    })
+
+    if len(summary["stations"]) > 1:
+        st.subheader("Stations")
+        st.table([
+            {"station": name, "scans": stats["total"], "last minute": f"{stats['last_minute']:.0f}",
+             "per min (15 min)": f"{stats['last_15_minutes']:.1f}", "idle for": format_duration(stats["idle_seconds"]),
+             "idle periods": stats["idle_periods"], "longest gap": format_duration(stats["longest_gap_seconds"])}
+            for name, stats in summary["stations"].items()
+        ])
+
+    top, gaps = st.columns(2)
+    with top:
+        st.subheader("Most scanned")
+        # Counts are upper bounds once more codes were seen than are tracked;
+        # "overcount" is how far off each can be (0 for an exact count)
+        st.table([
+            {"barcode": code, "scans": count, "overcount": error}
+            for code, count, error in overall["top"]
+        ])
+    with gaps:
+        st.subheader(f"Idle gaps (≥ {format_duration(idle_gap)})")
+        recent = [(name, start, end) for name, stats in summary["stations"].items() for start, end in stats["gaps"]]
+        if not recent:
+            st.caption("None so far.")
+        else:
+            recent.sort(key=lambda gap: gap[2], reverse=True)
+            st.table([
+                {"station": name, "from": datetime.fromtimestamp(start / 1e9).strftime("%H:%M:%S"),
+                 "to": datetime.fromtimestamp(end / 1e9).strftime("%H:%M:%S"),
+                 "length": format_duration((end - start) / 1e9)}
+                for name, start, end in recent[:RECENT_GAPS]
+            ])
@@ -0,0 +1,85 @@
+from collections import Counter, deque
+
+# Bounce and duplicate detection for incoming scans. A trigger that bounces
+# sends the same code from the same station a few milliseconds apart; those
+# reads are caught by a time-windowed hash index that only holds the last
+# window's worth of (station, barcode) keys. Repeats across the whole session
+# are looked up in the scan log's barcode index, so neither check scans a list.
+
+NEW, REPEAT, BOUNCE = "new", "repeat", "bounce"
+# "suppress" drops the scan, "flag" records it tagged with the decision, "off" disables the check
+POLICIES = ("suppress", "flag", "off")
+
+
+class BounceWindow:
+    def __init__(self, window_ms):
+        self.window_ns = int(window_ms * 1_000_000)
+        # key -> timestamp of its latest read, and the reads in arrival order for expiry
+        self._last = {}
+        self._order = deque()
+
+    def __len__(self):
+        return len(self._last)
+
+    # Record a read and report whether the same key was read within the window
+    def seen(self, key, timestamp_ns):
+        horizon = timestamp_ns - self.window_ns
+        while self._order and self._order[0][0] < horizon:
+            expired_ns, expired = self._order.popleft()
+            if self._last.get(expired) == expired_ns:
+                del self._last[expired]
+        last = self._last.get(key)
+        self._last[key] = timestamp_ns
+        self._order.append((timestamp_ns, key))
+        return last is not None and abs(timestamp_ns - last) <= self.window_ns
+
+    def clear(self):
+        self._last.clear()
+        self._order.clear()
+
+
+class ScanDeduper:
+    def __init__(self, bounce_ms=150, bounce_policy="suppress", repeat_ms=0, repeat_policy="flag"):
+        for policy in (bounce_policy, repeat_policy):
+            if policy not in POLICIES:
+                raise ValueError(f"unknown duplicate policy {policy!r}, expected one of {POLICIES}")
+        self.bounces = BounceWindow(bounce_ms)
+        self.bounce_policy = bounce_policy
+        # 0 means a repeat anywhere in the session
+        self.repeat_ns = int(repeat_ms * 1_000_000)
+        self.repeat_policy = repeat_policy
+        self.decisions = Counter()
+        self.suppressed = 0
+        self.last_decision = None
+
+    # Function to classify one scan against the station's recent reads and the
+    # session log. Returns (decision, suppressed).
+    def decide(self, scans, barcode, station, timestamp_ns):
+        decision = NEW
+        policy = "off"
+        bounced = self.bounces.seen((station, barcode), timestamp_ns)
+        if bounced and self.bounce_policy != "off":
+            decision, policy = BOUNCE, self.bounce_policy
+        elif self.repeat_policy != "off":
+            last = scans.last_seen(barcode)
+            if last is not None and (not self.repeat_ns or timestamp_ns - last <= self.repeat_ns):
+                decision, policy = REPEAT, self.repeat_policy
+        suppressed = policy == "suppress"
+        self.decisions[decision] += 1
+        self.suppressed += suppressed
+        self.last_decision = decision
+        return decision, suppressed
+
+    @property
+    def total(self):
+        return sum(self.decisions.values())
+
+    @property
+    def suppression_rate(self):
+        return self.suppressed / self.total if self.total else 0.0
+
+    def reset(self):
+        self.bounces.clear()
+        self.decisions.clear()
+        self.suppressed = 0
+        self.last_decision = None
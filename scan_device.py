@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import struct
+import argparse
+import threading
+from scan_queue import ScanQueue
+
+# Reads a USB scanner straight from a Linux input device (/dev/input/event*),
+# so scans never depend on a focused browser text field.
+
+# struct input_event { struct timeval time; __u16 type; __u16 code; __s32 value; }
+EVENT_FORMAT = "llHHi"
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+
+EV_KEY = 0x01
+KEY_RELEASE, KEY_PRESS, KEY_REPEAT = 0, 1, 2
+
+# EVIOCGRAB: take the device exclusively so keystrokes stop reaching other windows
+EVIOCGRAB = 0x40044590
+
+KEY_LEFTSHIFT, KEY_RIGHTSHIFT = 42, 54
+SHIFT_KEYS = {KEY_LEFTSHIFT, KEY_RIGHTSHIFT}
+# Enter, keypad Enter and Tab end a barcode
+TERMINATOR_KEYS = {28, 96, 15}
+
+# Linux keycode -> (unshifted, shifted) character for a US keyboard layout
+KEYMAP = {
+    2: ('1', '!'), 3: ('2', '@'), 4: ('3', '#'), 5: ('4', '$'), 6: ('5', '%'),
+    7: ('6', '^'), 8: ('7', '&'), 9: ('8', '*'), 10: ('9', '('), 11: ('0', ')'),
+    12: ('-', '_'), 13: ('=', '+'),
+    16: ('q', 'Q'), 17: ('w', 'W'), 18: ('e', 'E'), 19: ('r', 'R'), 20: ('t', 'T'),
+    21: ('y', 'Y'), 22: ('u', 'U'), 23: ('i', 'I'), 24: ('o', 'O'), 25: ('p', 'P'),
+    26: ('[', '{'), 27: (']', '}'),
+    30: ('a', 'A'), 31: ('s', 'S'), 32: ('d', 'D'), 33: ('f', 'F'), 34: ('g', 'G'),
+    35: ('h', 'H'), 36: ('j', 'J'), 37: ('k', 'K'), 38: ('l', 'L'),
+    39: (';', ':'), 40: ("'", '"'), 41: ('`', '~'), 43: ('\\', '|'),
+    44: ('z', 'Z'), 45: ('x', 'X'), 46: ('c', 'C'), 47: ('v', 'V'), 48: ('b', 'B'),
+    49: ('n', 'N'), 50: ('m', 'M'), 51: (',', '<'), 52: ('.', '>'), 53: ('/', '?'),
+    55: ('*', '*'), 57: (' ', ' '),
+    71: ('7', '7'), 72: ('8', '8'), 73: ('9', '9'), 74: ('-', '-'),
+    75: ('4', '4'), 76: ('5', '5'), 77: ('6', '6'), 78: ('+', '+'),
+    79: ('1', '1'), 80: ('2', '2'), 81: ('3', '3'), 82: ('0', '0'), 83: ('.', '.'),
+    98: ('/', '/'),
+}
+
+# Reverse map used to turn a barcode back into key events for replay files
+_CHAR_TO_KEY = {}
+for _code, (_plain, _shifted) in sorted(KEYMAP.items(), reverse=True):
+    _CHAR_TO_KEY[_plain] = (_code, False)
+    if _shifted != _plain:
+        _CHAR_TO_KEY[_shifted] = (_code, True)
+
+
+# Turns key events into barcodes: characters accumulate until a terminator key
+class BarcodeAssembler:
+    def __init__(self):
+        self.buffer = []
+        self.shift = False
+
+    # Feed one event; returns the finished barcode on a terminator, else None
+    def feed(self, ev_type, code, value):
+        if ev_type != EV_KEY:
+            return None
+        if code in SHIFT_KEYS:
+            self.shift = value != KEY_RELEASE
+            return None
+        if value != KEY_PRESS:
+            return None
+        if code in TERMINATOR_KEYS:
+            barcode = "".join(self.buffer).strip()
+            self.buffer = []
+            return barcode or None
+        chars = KEYMAP.get(code)
+        if chars:
+            self.buffer.append(chars[1] if self.shift else chars[0])
+        return None
+
+
+# Function to iterate over (seconds, type, code, value) events in a device or replay file
+def read_events(f):
+    while True:
+        data = f.read(EVENT_SIZE)
+        if len(data) < EVENT_SIZE:
+            return
+        sec, usec, ev_type, code, value = struct.unpack(EVENT_FORMAT, data)
+        yield sec + usec / 1e6, ev_type, code, value
+
+
+# Function to encode a barcode as the key events a scanner would send, ending with Enter
+def encode_barcode_events(barcode, start=0.0, key_interval=0.001):
+    events = []
+    t = start
+    for char in barcode:
+        code, shifted = _CHAR_TO_KEY[char]
+        if shifted:
+            events.append((t, EV_KEY, KEY_LEFTSHIFT, KEY_PRESS))
+        events.append((t, EV_KEY, code, KEY_PRESS))
+        events.append((t, EV_KEY, code, KEY_RELEASE))
+        if shifted:
+            events.append((t, EV_KEY, KEY_LEFTSHIFT, KEY_RELEASE))
+        t += key_interval
+    events.append((t, EV_KEY, 28, KEY_PRESS))
+    events.append((t, EV_KEY, 28, KEY_RELEASE))
+    return events
+
+
+# Function to write events in the kernel's binary format, e.g. to build a replay file
+def write_events(f, events):
+    for t, ev_type, code, value in events:
+        sec = int(t)
+        f.write(struct.pack(EVENT_FORMAT, sec, int(round((t - sec) * 1e6)), ev_type, code, value))
+
+
+# Background reader: assembles barcodes from a device (or replay file) and
+# hands each one to on_scan. By default scans are timestamped and queued on
+# self.scans for the UI to drain.
+class ScannerDaemon:
+    def __init__(self, path, on_scan=None, grab=False, realtime=False):
+        self.path = path
+        self.scans = ScanQueue()
+        self.on_scan = on_scan or self.scans.put
+        self.grab = grab
+        # When replaying a file, wait out the recorded gaps between events
+        self.realtime = realtime
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=f"scanner:{self.path}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def run(self):
+        assembler = BarcodeAssembler()
+        try:
+            with open(self.path, 'rb', buffering=0) as f:
+                if self.grab:
+                    import fcntl
+                    fcntl.ioctl(f, EVIOCGRAB, 1)
+                first_event = None
+                started = time.monotonic()
+                for t, ev_type, code, value in read_events(f):
+                    if self._stop.is_set():
+                        break
+                    if self.realtime:
+                        first_event = t if first_event is None else first_event
+                        delay = (t - first_event) - (time.monotonic() - started)
+                        if delay > 0:
+                            time.sleep(delay)
+                    barcode = assembler.feed(ev_type, code, value)
+                    if barcode:
+                        self.on_scan(barcode)
+        except OSError as e:
+            self.error = e
+
+
+# Function to list input devices that look like keyboards or scanners
+def list_input_devices():
+    devices = []
+    by_id = "/dev/input/by-id"
+    if os.path.isdir(by_id):
+        for name in sorted(os.listdir(by_id)):
+            if name.endswith("-event-kbd"):
+                devices.append(os.path.join(by_id, name))
+    return devices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print barcodes read from a Linux input device")
+    parser.add_argument("path", nargs="?", help="/dev/input/event* device or recorded event file")
+    parser.add_argument("--grab", action="store_true", help="take the device exclusively")
+    parser.add_argument("--realtime", action="store_true", help="replay recorded gaps between events")
+    args = parser.parse_args()
+
+    if not args.path:
+        print("\n".join(list_input_devices()) or "No keyboard-like input devices found")
+        sys.exit(0)
+    daemon = ScannerDaemon(args.path, on_scan=print, grab=args.grab, realtime=args.realtime).start()
+    try:
+        daemon.join()
+    except KeyboardInterrupt:
+        daemon.stop()
+    if daemon.error:
+        print(f"Error reading {args.path}: {daemon.error}", file=sys.stderr)
+        sys.exit(1)
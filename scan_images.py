@@ -0,0 +1,223 @@
+import io
+import os
+import math
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+try:
+    from pyzbar import pyzbar
+    pyzbar.decode(Image.new('L', (8, 8)))
+except (ImportError, OSError):
+    # pyzbar is missing, or installed without the zbar shared library
+    pyzbar = None
+
+try:
+    import zxingcpp
+except ImportError:
+    zxingcpp = None
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = np = None
+
+# Barcode decoding from photos, for stations without a working USB scanner.
+# Images are decoded with pyzbar (1D codes and QR) or zxing-cpp (the same,
+# without a system library) when one is installed, or else with OpenCV's
+# barcode and QR detectors, which read EAN/UPC and QR but not Code 128.
+# Each image is converted to grayscale and downscaled before detection. The
+# full resolution is only tried when that finds nothing, or a code too few
+# pixels wide to trust (thin bars blur into misreads whose check digit can
+# still pass), which catches small or distant codes in large photos.
+# Batches are spread over a process pool, since decoding is CPU-bound.
+
+# Longest side, in pixels, that detection runs at
+DECODE_MAX_SIDE = 1280
+# Narrowest 1D code, in pixels, accepted from a downscaled view: about two
+# pixels per module of an EAN-13 (95 modules)
+MIN_BARCODE_PX = 190
+# Images per task handed to a pool worker
+DECODE_CHUNK = 4
+IMAGE_TYPES = ("png", "jpg", "jpeg", "bmp", "gif", "tif", "tiff", "webp")
+
+DECODERS = (("pyzbar",) if pyzbar else ()) + (("zxing-cpp",) if zxingcpp else ()) + (("opencv",) if cv2 else ())
+
+
+# Decoders return (barcode, type, width in pixels) for every code found
+
+def _pyzbar_decode(gray):
+    return [(symbol.data.decode('utf-8', errors='replace'), symbol.type, max(symbol.rect.width, symbol.rect.height))
+            for symbol in pyzbar.decode(gray)]
+
+
+def _zxing_decode(gray):
+    found = []
+    for result in zxingcpp.read_barcodes(gray):
+        corners = result.position
+        top = math.dist((corners.top_left.x, corners.top_left.y), (corners.top_right.x, corners.top_right.y))
+        side = math.dist((corners.top_right.x, corners.top_right.y), (corners.bottom_right.x, corners.bottom_right.y))
+        kind = "QRCODE" if result.format == zxingcpp.BarcodeFormat.QRCode else str(result.format)
+        found.append((result.text, kind, max(top, side)))
+    return found
+
+
+def _quad_width(quad):
+    # Longer side of the (possibly rotated) code rectangle
+    return float(max(np.linalg.norm(quad[1] - quad[0]), np.linalg.norm(quad[2] - quad[1])))
+
+
+_detectors = {}
+
+
+def _opencv_decode(gray):
+    if not _detectors:
+        _detectors["barcode"] = cv2.barcode.BarcodeDetector()
+        _detectors["qr"] = cv2.QRCodeDetector()
+    pixels = np.asarray(gray)
+    found = []
+    ok, infos, types, quads = _detectors["barcode"].detectAndDecodeWithType(pixels)
+    if ok:
+        found += [(info, kind, _quad_width(quad)) for info, kind, quad in zip(infos, types, quads) if info]
+    ok, infos, quads, _ = _detectors["qr"].detectAndDecodeMulti(pixels)
+    if ok:
+        found += [(info, "QRCODE", _quad_width(quad)) for info, quad in zip(infos, quads) if info]
+    return found
+
+
+# Function to decode with the best installed decoder
+def decode_gray(gray):
+    if pyzbar:
+        return _pyzbar_decode(gray)
+    if zxingcpp:
+        return _zxing_decode(gray)
+    if cv2:
+        return _opencv_decode(gray)
+    raise RuntimeError("Image decoding needs pyzbar (with the zbar library), zxing-cpp or opencv-python-headless")
+
+
+def _fit(img, max_side):
+    if max(img.size) <= max_side:
+        return img
+    img = img.copy()
+    img.thumbnail((max_side, max_side), Image.BILINEAR)
+    return img
+
+
+# Function to list the views of an image that detection is tried on, cheapest
+# first, as (view, downscaled): the image downscaled, then at full resolution
+def views(img, max_side=DECODE_MAX_SIDE):
+    if max(img.size) <= max_side:
+        yield img, False
+    else:
+        yield _fit(img, max_side), True
+        yield img, False
+
+
+# Function to decode every barcode in one image (a path or bytes). Returns a
+# list of (barcode, decoder type), in the order found, without repeats.
+def decode_image(source, max_side=DECODE_MAX_SIDE):
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+        # Photos from phones are often stored sideways with an EXIF rotation
+        gray = ImageOps.exif_transpose(img).convert('L')
+    found = []
+    for view, downscaled in views(gray, max_side):
+        # A thin code from the downscaled view is kept if full resolution finds nothing
+        found = decode_gray(view) or found
+        if found and not (downscaled and any(kind != "QRCODE" and width < MIN_BARCODE_PX
+                                             for _, kind, width in found)):
+            break
+    return list(dict.fromkeys((barcode, kind) for barcode, kind, _ in found))
+
+
+# Pool task: decode a few images, catching errors per image
+def _decode_chunk(chunk, max_side):
+    results = []
+    for name, source in chunk:
+        try:
+            results.append((name, decode_image(source, max_side), None))
+        except Exception as e:
+            results.append((name, [], f"{type(e).__name__}: {e}"))
+    return results
+
+
+def new_decode_pool(workers=None):
+    # Spawned workers: forking a process that runs Streamlit's threads is unsafe
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+# Function to decode a batch of (name, path-or-bytes) images, in order, as
+# (name, [(barcode, type), ...], error) results. With a pool the images are
+# decoded in parallel a chunk at a time; without one they are decoded here.
+def decode_batch(images, pool=None, max_side=DECODE_MAX_SIDE, chunk_size=DECODE_CHUNK):
+    images = list(images)
+    chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]
+    if pool is None or len(images) < 2:
+        for chunk in chunks:
+            yield from _decode_chunk(chunk, max_side)
+        return
+    for results in pool.map(_decode_chunk, chunks, [max_side] * len(chunks)):
+        yield from results
+
+
+# Function to list the images in a folder, sorted by name
+def folder_images(path):
+    return [(name, os.path.join(path, name)) for name in sorted(os.listdir(path))
+            if name.rsplit(".", 1)[-1].lower() in IMAGE_TYPES]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode barcodes from a folder of images into the scan log")
+    parser.add_argument("paths", nargs="+", help="image files or folders")
+    parser.add_argument("--log", default=os.environ.get("SCAN_LOG_FILE", "scans.log"),
+                        help="scan log the scanner apps recover from (empty to only print)")
+    parser.add_argument("--aggregator", help="host[:port] of an aggregation server to publish to")
+    parser.add_argument("--station", default="images")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if not DECODERS:
+        sys.exit("Image decoding needs pyzbar (with the zbar library), zxing-cpp or opencv-python-headless")
+    images = []
+    for path in args.paths:
+        images += folder_images(path) if os.path.isdir(path) else [(os.path.basename(path), path)]
+
+    from scan_wal import ScanWAL
+    wal = ScanWAL(args.log, "batch") if args.log else None
+    publisher = None
+    if args.aggregator:
+        from scan_aggregator import ScanPublisher, DEFAULT_PORT
+        host, _, port = args.aggregator.partition(":")
+        publisher = ScanPublisher(args.station, host, int(port or DEFAULT_PORT))
+
+    decoded = failed = 0
+    start = time.perf_counter()
+    with new_decode_pool(args.workers) as pool:
+        for name, found, error in decode_batch(images, pool if args.workers > 1 else None):
+            now = time.time_ns()
+            entries = [(barcode, now + i) for i, (barcode, _) in enumerate(found)]
+            if error or not found:
+                failed += 1
+                print(f"{name}: {error or 'no barcode found'}")
+                continue
+            decoded += 1
+            print(f"{name}: {', '.join(f'{barcode} ({kind})' for barcode, kind in found)}")
+            if wal:
+                wal.append_many(entries, "image")
+            if publisher:
+                for barcode, timestamp_ns in entries:
+                    publisher.publish(barcode, timestamp_ns)
+    if wal:
+        wal.close()
+    if publisher:
+        publisher.flush(timeout=60)
+    elapsed = time.perf_counter() - start
+    print(f"Decoded {decoded} of {len(images)} images in {elapsed:.2f}s "
+          f"({len(images) / elapsed if elapsed else 0:,.1f} images/s, {DECODERS[0]})")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,158 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+from scan_log import TIMESTAMP_FORMAT
+from scan_wal import ScanWAL
+from barcode_validate import validate
+
+# Bulk import of barcode files, such as the batches handheld scanners collect
+# offline. A file is read in batches of (barcode, timestamp_ns) entries that
+# the scanner apps record through the same path as live scans. Accepted lines:
+#   0012345678905                      one barcode per line
+#   0012345678905,2025-01-31 08:15:02  CSV: barcode, then an optional timestamp
+#   {"barcode": "...", "timestamp": ...}
+# Timestamps may be "YYYY-MM-DD HH:MM:SS", ISO 8601 or epoch s/ms/us/ns.
+
+IMPORT_BATCH = 1000
+HEADER_NAMES = ("barcode", "code", "gtin", "upc", "ean")
+
+
+# Function to turn an imported timestamp into epoch nanoseconds (None if absent)
+def parse_timestamp(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or value.replace(".", "", 1).isdigit():
+        number = float(value)
+        # Pick the unit from the magnitude: seconds, ms, us or ns since 1970
+        for scale in (1e9, 1e6, 1e3, 1):
+            if number * scale < 1e19 and number * scale > 1e17:
+                return int(number * scale)
+        raise ValueError(f"unrecognized epoch timestamp {value!r}")
+    try:
+        return int(datetime.strptime(value, TIMESTAMP_FORMAT).timestamp() * 1e9)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp() * 1e9)
+
+
+def parse_line(line):
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        entry = json.loads(line)
+        return str(entry["barcode"]).strip(), parse_timestamp(entry.get("timestamp"))
+    barcode, _, timestamp = line.partition(",")
+    barcode = barcode.strip().strip('"')
+    if barcode.lower() in HEADER_NAMES:
+        return None
+    return barcode, parse_timestamp(timestamp.split(",")[0].strip().strip('"'))
+
+
+# Function to read a barcode file as batches of (barcode, timestamp_ns) entries.
+# Unreadable lines are counted in `errors` (line number -> message) and skipped.
+def read_scan_batches(lines, batch_size=IMPORT_BATCH, errors=None):
+    batch = []
+    for number, line in enumerate(lines, start=1):
+        try:
+            entry = parse_line(line)
+        except (ValueError, KeyError) as e:
+            if errors is not None:
+                errors[number] = str(e)
+            continue
+        if entry and entry[0]:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+# Function to open an uploaded or on-disk barcode file as text lines
+def open_scan_file(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'r', encoding='utf-8', errors='replace')
+    return io.TextIOWrapper(source, encoding='utf-8', errors='replace')
+
+
+# Function to yield entries at the pace they were originally scanned, for load
+# tests. `speed` > 1 replays faster. Entries without a timestamp follow the
+# previous one immediately.
+def timed_replay(entries, speed=1.0, stop=None):
+    first_ts = None
+    started = time.monotonic()
+    for barcode, timestamp_ns in entries:
+        if stop is not None and stop.is_set():
+            return
+        if timestamp_ns is not None:
+            if first_ts is None:
+                first_ts = timestamp_ns
+            due = started + (timestamp_ns - first_ts) / 1e9 / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                if stop is not None:
+                    if stop.wait(delay):
+                        return
+                else:
+                    time.sleep(delay)
+        yield barcode, timestamp_ns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a barcode file into the scan log or an aggregation server")
+    parser.add_argument("path")
+    parser.add_argument("--log", default=os.environ.get("SCAN_LOG_FILE", "scans.log"),
+                        help="scan log the scanner apps recover from (empty to skip)")
+    parser.add_argument("--aggregator", help="host[:port] of an aggregation server to publish to")
+    parser.add_argument("--station", default="import")
+    parser.add_argument("--replay", action="store_true", help="reproduce the original gaps between scans")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up factor")
+    args = parser.parse_args()
+
+    wal = ScanWAL(args.log, "batch", batch_size=IMPORT_BATCH) if args.log else None
+    publisher = None
+    if args.aggregator:
+        from scan_aggregator import ScanPublisher, DEFAULT_PORT
+        host, _, port = args.aggregator.partition(":")
+        publisher = ScanPublisher(args.station, host, int(port or DEFAULT_PORT))
+
+    errors = {}
+    counts = {"imported": 0, "invalid": 0}
+
+    def record(batch):
+        if wal:
+            wal.append_many(batch, "import")
+        for barcode, timestamp_ns in batch:
+            counts["invalid"] += not validate(barcode).valid
+            if publisher:
+                publisher.publish(barcode, timestamp_ns)
+        counts["imported"] += len(batch)
+
+    start = time.perf_counter()
+    with open_scan_file(args.path) as f:
+        batches = read_scan_batches(f, errors=errors)
+        if args.replay:
+            entries = (entry for batch in batches for entry in batch)
+            for barcode, _ in timed_replay(entries, args.speed):
+                record([(barcode, time.time_ns())])
+        else:
+            for batch in batches:
+                # Scans are stamped as they are ingested, like live ones
+                now = time.time_ns()
+                record([(barcode, now + i) for i, (barcode, _) in enumerate(batch)])
+    if wal:
+        wal.close()
+    if publisher:
+        publisher.flush(timeout=60)
+    elapsed = time.perf_counter() - start
+    imported = counts["imported"]
+    print(f"Imported {imported} scans in {elapsed:.2f}s ({imported / elapsed if elapsed else 0:,.0f}/s), "
+          f"{counts['invalid']} failed validation, {len(errors)} unreadable lines")
+    for number, message in list(errors.items())[:20]:
+        print(f"  line {number}: {message}")
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,118 @@
+import time
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+# Compact columnar scan log. Instead of a dict and two strings per scan it keeps
+# an epoch-nanosecond timestamp column and an integer barcode-code column, with
+# each distinct barcode string stored once. Timestamps are only formatted when
+# a scan is read back.
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Short labels kept per scan as interned integer codes ("" when not set)
+TAG_COLUMNS = ("symbology", "status", "decision")
+
+
+def format_timestamp(timestamp_ns):
+    return datetime.fromtimestamp(timestamp_ns / 1e9).strftime(TIMESTAMP_FORMAT)
+
+
+class ScanLog:
+    def __init__(self):
+        # Scan times, kept non-decreasing for the time-range bisect in query().
+        # Scans drained from different queues (the session queue and the device
+        # reader stamp against their own clocks) can arrive a moment out of
+        # order; those are clamped to the time before them, and their real
+        # timestamp is kept in _raw_timestamps for timestamp_at() and display.
+        self.timestamps = array('q')
+        self._raw_timestamps = {}
+        self.codes = array('L')
+        # Interned barcode table: code -> barcode, barcode -> code
+        self.barcodes = []
+        self._code_of = {}
+        # Code -> ascending positions of its scans, for filtered queries
+        self._positions = []
+        # Tag name -> code column, code -> label, label -> code
+        self.tags = {name: array('H') for name in TAG_COLUMNS}
+        self.tag_labels = {name: [""] for name in TAG_COLUMNS}
+        self._tag_codes = {name: {"": 0} for name in TAG_COLUMNS}
+
+    def append(self, barcode, timestamp_ns=None, **tags):
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        code = self._code_of.get(barcode)
+        if code is None:
+            code = len(self.barcodes)
+            self._code_of[barcode] = code
+            self.barcodes.append(barcode)
+            self._positions.append(array('L'))
+        position = len(self.timestamps)
+        if self.timestamps and timestamp_ns < self.timestamps[-1]:
+            self._raw_timestamps[position] = timestamp_ns
+            timestamp_ns = self.timestamps[-1]
+        self.timestamps.append(timestamp_ns)
+        self.codes.append(code)
+        self._positions[code].append(position)
+        for name in TAG_COLUMNS:
+            label = tags.get(name, "")
+            tag_code = self._tag_codes[name].get(label)
+            if tag_code is None:
+                tag_code = len(self.tag_labels[name])
+                self._tag_codes[name][label] = tag_code
+                self.tag_labels[name].append(label)
+            self.tags[name].append(tag_code)
+        return position
+
+    def tag_at(self, name, position):
+        return self.tag_labels[name][self.tags[name][position]]
+
+    def barcode_at(self, position):
+        return self.barcodes[self.codes[position]]
+
+    # The time a scan was actually taken (timestamps holds the clamped index)
+    def timestamp_at(self, position):
+        return self._raw_timestamps.get(position, self.timestamps[position])
+
+    # Scans read back in the shape the UI has always used
+    def __getitem__(self, position):
+        data = {
+            "barcode": self.barcodes[self.codes[position]],
+            "timestamp": format_timestamp(self.timestamp_at(position)),
+        }
+        for name in TAG_COLUMNS:
+            data[name] = self.tag_labels[name][self.tags[name][position]]
+        return data
+
+    def __iter__(self):
+        for position in range(len(self.timestamps)):
+            yield self[position]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def count(self, barcode):
+        code = self._code_of.get(barcode)
+        return 0 if code is None else len(self._positions[code])
+
+    # Timestamp of the latest scan of `barcode`, or None if it was never scanned
+    def last_seen(self, barcode):
+        code = self._code_of.get(barcode)
+        return None if code is None else self.timestamp_at(self._positions[code][-1])
+
+    # Positions of scans whose barcode contains `substring` and whose time falls
+    # in [start_ns, end_ns]. Without a substring this is a range, never a list;
+    # with one the cost is the number of distinct barcodes plus the matches.
+    # The range is bisected on the clamped, always sorted timestamp column.
+    def query(self, substring="", start_ns=None, end_ns=None):
+        lo = bisect_left(self.timestamps, start_ns) if start_ns is not None else 0
+        hi = bisect_right(self.timestamps, end_ns) if end_ns is not None else len(self.timestamps)
+        if not substring:
+            return range(lo, max(lo, hi))
+        runs = []
+        for code, barcode in enumerate(self.barcodes):
+            if substring in barcode:
+                positions = self._positions[code]
+                runs.append(positions[bisect_left(positions, lo):bisect_left(positions, hi)])
+        return list(heapq.merge(*runs))
@@ -0,0 +1,61 @@
+import time
+import queue
+import threading
+from collections import deque, namedtuple
+
+# Bounded hand-off between scan capture and the UI. Producers timestamp each
+# scan on arrival; the UI drains whatever has arrived in batches on its own
+# refresh cadence instead of rerunning once per scan.
+
+# Scans waiting for the UI before producers are made to wait
+DEFAULT_MAXSIZE = 10000
+
+# seq is the arrival order; wall_ns is derived from the monotonic clock so
+# timestamps never go backwards even if the system clock is adjusted
+Scan = namedtuple("Scan", "seq barcode monotonic_ns wall_ns")
+
+
+class ScanQueue:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._anchor_wall_ns = time.time_ns()
+        self._anchor_mono_ns = time.monotonic_ns()
+
+    # Add a scan. When the queue is full the producer waits rather than dropping
+    # the scan; queue.Full is raised only if a timeout is given and runs out.
+    def put(self, barcode, timeout=None):
+        mono_ns = time.monotonic_ns()
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout):
+                raise queue.Full
+            self._seq += 1
+            scan = Scan(self._seq, barcode, mono_ns, self._anchor_wall_ns + mono_ns - self._anchor_mono_ns)
+            self._items.append(scan)
+            self._cond.notify_all()
+        return scan
+
+    # Remove and return up to max_items scans in arrival order without waiting
+    def drain(self, max_items=None):
+        with self._cond:
+            count = len(self._items) if max_items is None else min(max_items, len(self._items))
+            batch = [self._items.popleft() for _ in range(count)]
+            if batch:
+                self._cond.notify_all()
+        return batch
+
+    # Wait up to timeout seconds for at least one scan, then drain a batch
+    def get_batch(self, timeout=None, max_items=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self._items, timeout)
+        return self.drain(max_items)
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,570 @@
+import os
+import time
+import uuid
+import atexit
+import socket
+import threading
+from datetime import datetime
+import streamlit as st
+from scan_device import ScannerDaemon
+from scan_queue import ScanQueue
+from scan_log import ScanLog, TIMESTAMP_FORMAT
+from scan_wal import ScanWAL, DEFAULT_INTERVAL_MS, DEFAULT_BATCH_SIZE, replay
+from scan_view import PAGE_SIZE, page_count, page_slice
+from scan_aggregator import ScanPublisher, DEFAULT_PORT
+from barcode_validate import validate
+from scan_dedupe import ScanDeduper
+from scan_analytics import ScanAnalytics, render_analytics_panel
+from product_catalog import ProductCatalog, format_price
+from stamp_barcode import parse_record_code
+from stamp_store import open_store
+from history_export import FORMATS, MIME_TYPES, SCAN_COLUMNS, scan_rows, export_bytes
+from scan_import import open_scan_file, read_scan_batches, timed_replay
+from scan_images import DECODERS, IMAGE_TYPES, decode_batch, new_decode_pool
+from rerun_profiler import get_profiler
+
+# Shared scan recording for the scanner apps. Every input path (the text field
+# or a directly-read input device) records scans through record_scan(), either
+# directly or via a ScanQueue that the page drains in batches.
+
+# Set SCANNER_DEVICE=/dev/input/by-id/<scanner>-event-kbd to read the scanner directly
+SCANNER_DEVICE = os.environ.get("SCANNER_DEVICE")
+# How often the page checks the device reader for new scans
+DEVICE_POLL_SECONDS = 0.5
+# How often pages that queue their scans drain the queue and refresh the history
+UI_REFRESH_SECONDS = 1.0
+
+# Scans are written ahead to this log and replayed on startup (empty to disable).
+# SCAN_LOG_DURABILITY is "always", "interval" (every SCAN_LOG_INTERVAL_MS) or
+# "batch" (every SCAN_LOG_BATCH scans).
+SCAN_LOG_FILE = os.environ.get("SCAN_LOG_FILE", "scans.log")
+SCAN_LOG_DURABILITY = os.environ.get("SCAN_LOG_DURABILITY", "interval")
+SCAN_LOG_INTERVAL_MS = int(os.environ.get("SCAN_LOG_INTERVAL_MS", DEFAULT_INTERVAL_MS))
+SCAN_LOG_BATCH = int(os.environ.get("SCAN_LOG_BATCH", DEFAULT_BATCH_SIZE))
+
+
+# SCAN_VALIDATION: "flag" (default) records invalid scans tagged with the reason,
+# "reject" leaves them out of the history, "off" skips validation
+SCAN_VALIDATION = os.environ.get("SCAN_VALIDATION", "flag")
+
+# The same code read again from the same input within SCAN_BOUNCE_MS is a trigger
+# bounce; a code already in the history (within SCAN_REPEAT_MS, 0 = the whole
+# session) is a repeat. Each policy is "suppress", "flag" or "off".
+SCAN_BOUNCE_MS = float(os.environ.get("SCAN_BOUNCE_MS", 150))
+SCAN_BOUNCE_POLICY = os.environ.get("SCAN_BOUNCE_POLICY", "suppress")
+SCAN_REPEAT_MS = float(os.environ.get("SCAN_REPEAT_MS", 0))
+SCAN_REPEAT_POLICY = os.environ.get("SCAN_REPEAT_POLICY", "flag")
+
+# Set SCAN_AGGREGATOR=host[:port] to publish every scan to the multi-station
+# aggregation server under this station's name
+SCAN_AGGREGATOR = os.environ.get("SCAN_AGGREGATOR")
+SCAN_STATION = os.environ.get("SCAN_STATION", socket.gethostname())
+
+# Set PRODUCT_CATALOG to a CSV (barcode,name,price) or SQLite catalog to show
+# the product name and price next to each scan
+PRODUCT_CATALOG = os.environ.get("PRODUCT_CATALOG")
+
+# Scanned stamp, order and mail piece barcodes (stamp_barcode.py) are looked up
+# in the stamp app's data file
+STAMP_DATA_FILE = os.environ.get("STAMP_DATA_FILE", "data.json")
+
+
+# Photos are decoded across SCAN_DECODE_WORKERS processes (default: one per CPU)
+SCAN_DECODE_WORKERS = int(os.environ.get("SCAN_DECODE_WORKERS", 0)) or os.cpu_count()
+
+
+# Rerun profile shared by the scanner apps; each app starts and finishes its
+# reruns, and the helpers below time their phases
+profiler = get_profiler("usb-scanner")
+
+
+# One publisher per process, shared by every session
+@st.cache_resource
+def get_scan_publisher(address, station):
+    host, _, port = address.partition(":")
+    return ScanPublisher(station, host, int(port or DEFAULT_PORT))
+
+
+# One write-ahead log per process, shared by every session. A clean shutdown
+# writes out the scans still waiting for their group commit.
+@st.cache_resource
+def get_scan_wal(path):
+    wal = ScanWAL(path, SCAN_LOG_DURABILITY, SCAN_LOG_INTERVAL_MS, SCAN_LOG_BATCH)
+    atexit.register(wal.close)
+    return wal
+
+
+# One catalog per process, shared by every session. A CSV catalog is indexed
+# into SQLite on first use.
+@st.cache_resource
+def get_product_catalog(path):
+    return ProductCatalog(path)
+
+
+# One stamp data store per process, shared by every session
+@st.cache_resource
+def get_record_store(path):
+    return open_store(path)
+
+
+# Function to find the stamp, order or mail piece a scanned record barcode was
+# printed for. Returns (table, record), or None for any other barcode.
+def resolve_record(barcode):
+    parsed = parse_record_code(barcode)
+    if parsed is None or not STAMP_DATA_FILE or not os.path.exists(STAMP_DATA_FILE):
+        return None
+    table, prefix = parsed
+    record = get_record_store(STAMP_DATA_FILE).find_record(table, prefix)
+    return (table, record) if record else None
+
+
+# Function to add the product name and price to a scan read back from the log,
+# or the record it belongs to for a stamp, order or mail piece barcode
+def enrich(data):
+    resolved = resolve_record(data["barcode"])
+    if resolved:
+        table, record = resolved
+        if table == "stamps":
+            data["product"] = f"Stamp: {record['text']}"
+            data["price"] = record['value']
+        elif table == "orders":
+            data["product"] = f"Order {record['order_id'][:8]}: {record['quantity']} stamps ({record['date']})"
+            data["price"] = record['total_cost']
+        else:
+            data["product"] = f"Mail to {record['recipient']} ({record['date']})"
+        return data
+    if PRODUCT_CATALOG:
+        product = get_product_catalog(PRODUCT_CATALOG).lookup(data["barcode"])
+        if product:
+            data["product"] = product.name
+            data["price"] = product.price
+    return data
+
+
+# Function to validate and normalize a raw scan. Returns the barcode to record
+# and its tags, or None when the scan is rejected.
+def ingest(raw):
+    if SCAN_VALIDATION == "off":
+        return raw.strip(), {}
+    result = validate(raw)
+    if not result.valid and SCAN_VALIDATION == "reject":
+        return None
+    return result.barcode, {"symbology": result.symbology, "status": result.error or ""}
+
+
+def new_deduper():
+    return ScanDeduper(SCAN_BOUNCE_MS, SCAN_BOUNCE_POLICY, SCAN_REPEAT_MS, SCAN_REPEAT_POLICY)
+
+
+# Function to decide whether a scan is kept. Returns (decision, suppressed).
+def dedupe(scans, barcode, source, timestamp_ns):
+    return st.session_state.scan_dedupe.decide(scans, barcode, source, timestamp_ns)
+
+
+# Function to get this browser tab's scan session id. It is kept in the page
+# URL, so the tab gets the same id back after a refresh.
+def scan_session_id():
+    if "scan_session" not in st.query_params:
+        st.query_params["scan_session"] = uuid.uuid4().hex[:12]
+    return st.query_params["scan_session"]
+
+
+# Function to rebuild the scan history from the write-ahead log. The log holds
+# raw scans with the input each came from, so they go through the same ingest
+# and dedupe steps as live ones. Suppressed scans never reach the log, so the
+# decisions come out the same. Scans logged before sources were recorded
+# replay as one "log" input.
+# The replay starts after the session's last Clear, if it cleared its history.
+def recover_scans(session=None):
+    scans = ScanLog()
+    deduper = new_deduper()
+    analytics = ScanAnalytics()
+    if SCAN_LOG_FILE:
+        # Other sessions' scans may still be waiting for their group commit
+        get_scan_wal(SCAN_LOG_FILE).sync()
+        for raw, timestamp_ns, source in replay(SCAN_LOG_FILE, session, default_source="log"):
+            accepted = ingest(raw)
+            if accepted:
+                barcode, tags = accepted
+                decision, suppressed = deduper.decide(scans, barcode, source, timestamp_ns)
+                if not suppressed:
+                    scans.append(barcode, timestamp_ns, decision=decision, **tags)
+                    analytics.observe(SCAN_STATION, barcode, timestamp_ns)
+    return scans, deduper, analytics
+
+
+# Function to initialize the scan history in session state
+@profiler.timed("state load")
+def init_scan_state():
+    if "scanned_barcodes" not in st.session_state:
+        (st.session_state.scanned_barcodes, st.session_state.scan_dedupe,
+         st.session_state.scan_analytics) = recover_scans(scan_session_id())
+    elif isinstance(st.session_state.scanned_barcodes, list):
+        # Sessions started before the columnar log keep their scans
+        scans = ScanLog()
+        for data in st.session_state.scanned_barcodes:
+            scanned_at = datetime.strptime(data["timestamp"], TIMESTAMP_FORMAT)
+            scans.append(data["barcode"], int(scanned_at.timestamp() * 1e9))
+        st.session_state.scanned_barcodes = scans
+    if "scan_dedupe" not in st.session_state:
+        st.session_state.scan_dedupe = new_deduper()
+    if "scan_queue" not in st.session_state:
+        st.session_state.scan_queue = ScanQueue()
+    if "scan_analytics" not in st.session_state:
+        # Sessions started before the analytics: count their history once
+        analytics = ScanAnalytics()
+        scans = st.session_state.scanned_barcodes
+        for position in range(len(scans)):
+            analytics.observe(SCAN_STATION, scans.barcode_at(position), scans.timestamp_at(position))
+        st.session_state.scan_analytics = analytics
+
+
+# Function to record a scanned barcode with its timestamp (epoch nanoseconds)
+# and the input it came from. Returns the recorded scan, or None if validation
+# rejected it or it was suppressed as a bounce or repeat.
+def record_scan(barcode, timestamp_ns=None, source="input"):
+    return record_scans([(barcode, timestamp_ns)], source)[0]
+
+
+# Function to record a batch of (barcode, timestamp_ns) scans. The batch goes to
+# the scan log in one append before any of it is shown or published. Returns
+# the recorded scans, with None for each rejected or suppressed one.
+@profiler.timed("record")
+def record_scans(entries, source="input"):
+    scans = st.session_state.scanned_barcodes
+    analytics = st.session_state.scan_analytics
+    logged = []
+    positions = []
+    for raw, timestamp_ns in entries:
+        raw = raw.strip()
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        accepted = ingest(raw)
+        if accepted is not None:
+            barcode, tags = accepted
+            decision, suppressed = dedupe(scans, barcode, source, timestamp_ns)
+            if suppressed:
+                positions.append(None)
+                continue
+        logged.append((raw, timestamp_ns))
+        if accepted is None:
+            positions.append(None)
+            continue
+        positions.append(scans.append(barcode, timestamp_ns, decision=decision, **tags))
+        analytics.observe(SCAN_STATION, barcode, timestamp_ns)
+    if SCAN_LOG_FILE and logged:
+        get_scan_wal(SCAN_LOG_FILE).append_many(logged, source)
+    recorded = [None if position is None else enrich(scans[position]) for position in positions]
+    if SCAN_AGGREGATOR:
+        publisher = get_scan_publisher(SCAN_AGGREGATOR, SCAN_STATION)
+        for position in positions:
+            if position is not None:
+                publisher.publish(scans.barcode_at(position), scans.timestamp_at(position))
+    return recorded
+
+
+# Function to clear this session's scan history and anything still queued. The
+# write-ahead log is shared by every session, so it only gets a marker: this
+# session recovers from the marker on, and other sessions (and exports) keep
+# the scans.
+def clear_scans():
+    st.session_state.scanned_barcodes = ScanLog()
+    st.session_state.scan_dedupe.reset()
+    st.session_state.scan_analytics.reset()
+    st.session_state.scan_queue.clear()
+    if SCAN_LOG_FILE:
+        get_scan_wal(SCAN_LOG_FILE).mark_cleared(scan_session_id())
+
+
+# Function to queue a scan for the next UI refresh, timestamped on arrival
+def capture_scan(barcode):
+    return st.session_state.scan_queue.put(barcode)
+
+
+# Function to record a batch of queued scans in arrival order
+def record_queued_scans(scan_queue, source="input"):
+    recorded = (record_scan(scan.barcode, scan.wall_ns, source) for scan in scan_queue.drain())
+    return [data for data in recorded if data]
+
+
+# Function to move queued scans into the session history
+def drain_scans():
+    return record_queued_scans(st.session_state.scan_queue)
+
+
+# One device reader per process, shared by every session
+@st.cache_resource
+def get_scanner_daemon(path):
+    return ScannerDaemon(path, grab=True).start()
+
+
+# Function to move scans captured by the device reader into the session history
+def drain_device_scans():
+    if not SCANNER_DEVICE:
+        return []
+    return record_queued_scans(get_scanner_daemon(SCANNER_DEVICE).scans, SCANNER_DEVICE)
+
+
+# Poll the device reader on a timer; the whole page only reruns when scans arrived
+@st.fragment(run_every=DEVICE_POLL_SECONDS if SCANNER_DEVICE else None)
+def poll_device_scans():
+    if not SCANNER_DEVICE:
+        return
+    daemon = get_scanner_daemon(SCANNER_DEVICE)
+    if daemon.error:
+        st.error(f"Scanner device error: {daemon.error}")
+    elif drain_device_scans():
+        st.rerun()
+
+
+# Function to format one history line, with the product, symbology, any
+# validation problem and whether it repeats an earlier scan
+def format_scan_line(number, data):
+    line = f"**{number}. Barcode:** {data['barcode']} (Scanned at: {data['timestamp']})"
+    if data.get("product"):
+        line += f" · {data['product']} {format_price(data.get('price'))}".rstrip()
+    if data.get("symbology"):
+        line += f" · {data['symbology']}"
+    if data.get("status"):
+        line += f" · :orange[{data['status']}]"
+    if data.get("decision") not in ("", "new", None):
+        line += f" · :blue[{data['decision']}]"
+    return line
+
+
+# Function to show the outcome of a scan just entered by the operator
+def show_scan_result(barcode, data):
+    if data is None:
+        error = validate(barcode).error if SCAN_VALIDATION != "off" else None
+        if error:
+            st.error(f"Rejected scan: {barcode} ({error})")
+        else:
+            st.info(f"Ignored scan: {barcode} ({st.session_state.scan_dedupe.last_decision})")
+    elif data.get("status"):
+        st.warning(f"Scanned barcode: {data['barcode']} ({data['status']})")
+    elif data.get("decision") == "repeat":
+        st.info(f"Scanned barcode: {data['barcode']} (already scanned)")
+    elif data.get("product"):
+        st.success(f"Scanned barcode: {data['barcode']} · {data['product']} {format_price(data.get('price'))}")
+    else:
+        st.success(f"Scanned barcode: {data['barcode']}")
+
+
+# Callback for a scan text field: records the value once, when it changes, and
+# empties the field so a rerun cannot submit the same scan again
+def submit_scan_input(key):
+    barcode = st.session_state[key]
+    if barcode.strip():
+        st.session_state.last_scan_result = (barcode, record_scan(barcode))
+    st.session_state[key] = ""
+
+
+# Function to show the scan counts and how many reads were suppressed
+def render_scan_metrics():
+    deduper = st.session_state.scan_dedupe
+    if not deduper.total:
+        return
+    received, repeats, suppressed = st.columns(3)
+    received.metric("Scans read", deduper.total)
+    repeats.metric("Repeats", deduper.decisions["repeat"])
+    suppressed.metric("Suppressed", deduper.suppressed, f"{deduper.suppression_rate:.1%}", delta_color="off")
+
+
+# Function to render one page of the scan history with substring and time filters.
+# Only the visible page is sent to the browser, so the cost per rerun does not
+# grow with the number of scans.
+@profiler.timed("history render")
+def render_scan_history(page_size=PAGE_SIZE):
+    scans = st.session_state.scanned_barcodes
+    if not scans:
+        return
+
+    st.subheader("Scanned Barcodes")
+    render_scan_metrics()
+    substring = st.text_input("Filter by barcode", key="history_filter").strip()
+    start = end = None
+    first, last = scans.timestamps[0] / 1e9, scans.timestamps[-1] / 1e9
+    if last > first:
+        start_at, end_at = st.slider(
+            "Scanned between",
+            min_value=datetime.fromtimestamp(first),
+            max_value=datetime.fromtimestamp(last),
+            value=(datetime.fromtimestamp(first), datetime.fromtimestamp(last)),
+            format="YYYY-MM-DD HH:mm:ss",
+            key="history_range",
+        )
+        # Only filter when the range was narrowed, so new scans keep showing up
+        if start_at.timestamp() > first + 1:
+            start = int(start_at.timestamp() * 1e9)
+        if end_at.timestamp() < last - 1:
+            end = int(end_at.timestamp() * 1e9)
+
+    positions = scans.query(substring, start, end)
+    pages = page_count(len(positions), page_size)
+    if st.session_state.get("history_page", 1) > pages:
+        st.session_state.history_page = pages
+    page = st.number_input("Page (newest first)", min_value=1, max_value=pages, value=1, step=1, key="history_page")
+    visible, pages = page_slice(positions, page, page_size)
+
+    st.caption(f"Showing {len(visible)} of {len(positions)} matching scans ({len(scans)} total), page {page} of {pages}")
+    st.markdown("\n\n".join(
+        format_scan_line(i + 1, data) for i, data in ((i, enrich(scans[i])) for i in visible)
+    ))
+    render_scan_export(positions)
+
+
+# Function to show scans per minute, the most scanned codes and idle gaps. They
+# are kept up to date as scans are recorded, so this never walks the history.
+@profiler.timed("analytics render")
+def render_scan_analytics():
+    if not st.session_state.scanned_barcodes:
+        return
+    with st.expander("Scan analytics"):
+        render_analytics_panel(st.session_state.scan_analytics)
+
+
+# Function to offer the scans matching the current filters as a download. The
+# file is only built when asked for, then kept until the next export.
+def render_scan_export(positions):
+    with st.expander("Export scans"):
+        fmt = st.selectbox("Format", FORMATS, key="scan_export_format")
+        if st.button(f"Export {len(positions)} matching scans", key="scan_export"):
+            scans = st.session_state.scanned_barcodes
+            st.session_state.scan_export_file = (fmt, export_bytes(scan_rows(scans, positions), SCAN_COLUMNS, fmt))
+        export = st.session_state.get("scan_export_file")
+        if export:
+            st.download_button(
+                f"Download scans ({export[0].upper()})",
+                data=export[1],
+                file_name=f"scans.{export[0]}",
+                mime=MIME_TYPES[export[0]],
+                key="scan_download",
+            )
+
+
+# Function to import a barcode file in batches through the same recording path
+# as live scans; each entry is stamped as it is ingested
+def import_scan_file(uploaded):
+    errors = {}
+    imported = recorded = 0
+    lines = open_scan_file(uploaded)
+    try:
+        for batch in read_scan_batches(lines, errors=errors):
+            now = time.time_ns()
+            results = record_scans([(barcode, now + i) for i, (barcode, _) in enumerate(batch)], "import")
+            imported += len(batch)
+            recorded += sum(1 for data in results if data)
+    finally:
+        lines.detach()
+    return imported, recorded, errors
+
+
+# Function to replay a barcode file into the scan queue on a background thread,
+# keeping the original gaps between scans (divided by `speed`)
+def start_scan_replay(uploaded, speed):
+    lines = open_scan_file(uploaded)
+    try:
+        entries = [entry for batch in read_scan_batches(lines) for entry in batch]
+    finally:
+        lines.detach()
+    scan_queue = st.session_state.scan_queue
+    stop = threading.Event()
+    progress = {"sent": 0, "total": len(entries)}
+
+    def run():
+        for barcode, _ in timed_replay(entries, speed, stop):
+            scan_queue.put(barcode)
+            progress["sent"] += 1
+
+    thread = threading.Thread(target=run, name="scan-replay", daemon=True)
+    thread.start()
+    st.session_state.scan_replay = {"thread": thread, "stop": stop, "progress": progress}
+
+
+# While a replay runs, record what it queued and show how far it got
+@st.fragment(run_every=UI_REFRESH_SECONDS)
+def scan_replay_progress():
+    replay = st.session_state.get("scan_replay")
+    if not replay:
+        return
+    progress = replay["progress"]
+    st.progress(progress["sent"] / max(progress["total"], 1),
+                text=f"Replaying scans: {progress['sent']} of {progress['total']}")
+    if st.button("Stop replay", key="scan_replay_stop"):
+        replay["stop"].set()
+    finished = not replay["thread"].is_alive()
+    if finished:
+        del st.session_state.scan_replay
+    if drain_scans() or finished:
+        st.rerun()
+
+
+# One decoding pool per process, shared by every session; its workers start on
+# the first batch
+@st.cache_resource
+def get_decode_pool(workers):
+    return new_decode_pool(workers)
+
+
+# Function to decode barcodes from uploaded photos and record them like
+# keyboard scans. Returns (images, recorded, list of (image, problem)).
+@profiler.timed("image decode")
+def decode_scan_images(uploads):
+    images = [(upload.name, upload.getvalue()) for upload in uploads]
+    pool = get_decode_pool(SCAN_DECODE_WORKERS) if len(images) > 1 and SCAN_DECODE_WORKERS > 1 else None
+    recorded = 0
+    problems = []
+    for name, found, error in decode_batch(images, pool):
+        if error or not found:
+            problems.append((name, error or "no barcode found"))
+            continue
+        now = time.time_ns()
+        results = record_scans([(barcode, now + i) for i, (barcode, _) in enumerate(found)], "image")
+        recorded += sum(1 for data in results if data)
+    return len(images), recorded, problems
+
+
+# Callback for the camera: decodes each new photo once
+def submit_scan_photo(key):
+    photo = st.session_state.get(key)
+    if photo is not None:
+        st.session_state.scan_image_result = decode_scan_images([photo])
+
+
+# Function to offer barcode input from photos: a camera snapshot, or a batch of
+# uploaded images for receiving
+def render_scan_images():
+    with st.sidebar.expander("Scan from photos"):
+        if not DECODERS:
+            st.caption("Install pyzbar (with the zbar library), zxing-cpp or opencv-python-headless to decode photos.")
+            return
+        st.camera_input("Take a photo of a barcode", key="scan_camera",
+                        on_change=submit_scan_photo, args=("scan_camera",))
+        uploads = st.file_uploader("Barcode images", type=list(IMAGE_TYPES), accept_multiple_files=True,
+                                   key="scan_image_files")
+        if uploads and st.button(f"Decode {len(uploads)} images", key="scan_image_decode"):
+            st.session_state.scan_image_result = decode_scan_images(uploads)
+        result = st.session_state.get("scan_image_result")
+        if result:
+            images, recorded, problems = result
+            st.success(f"{images - len(problems)} of {images} images decoded, {recorded} scans recorded")
+            for name, problem in problems[:10]:
+                st.warning(f"{name}: {problem}")
+
+
+# Function to offer bulk import of a barcode file (one barcode per line, CSV
+# with an optional timestamp, or JSON Lines), or a timed replay of it
+def render_scan_import():
+    with st.sidebar.expander("Import scans"):
+        uploaded = st.file_uploader("Barcode file", type=["txt", "csv", "jsonl"], key="scan_import_file")
+        replay = st.checkbox("Replay with the original timing", key="scan_import_replay")
+        speed = st.number_input("Replay speed", min_value=0.1, max_value=100.0, value=1.0, key="scan_import_speed") if replay else 1.0
+        if uploaded and not st.session_state.get("scan_replay") and st.button("Replay" if replay else "Import", key="scan_import_start"):
+            if replay:
+                start_scan_replay(uploaded, speed)
+            else:
+                imported, recorded, errors = import_scan_file(uploaded)
+                st.success(f"Imported {imported} scans ({recorded} recorded)")
+                if errors:
+                    st.warning(f"{len(errors)} unreadable lines skipped, first at line {min(errors)}")
+    scan_replay_progress()
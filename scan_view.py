@@ -0,0 +1,20 @@
+# Paging for the scan history view. Filtering is served by ScanLog.query, so
+# a rerun only ever touches the scans on the visible page.
+
+# Scans shown per page of the history view
+PAGE_SIZE = 50
+
+
+# Function to count the pages needed for `total` scans
+def page_count(total, page_size=PAGE_SIZE):
+    return max(1, -(-total // page_size))
+
+
+# Function to pick one page of positions, newest scans first
+def page_slice(positions, page, page_size=PAGE_SIZE):
+    total = len(positions)
+    pages = page_count(total, page_size)
+    page = min(max(page, 1), pages)
+    end = total - (page - 1) * page_size
+    start = max(0, end - page_size)
+    return [positions[i] for i in range(end - 1, start - 1, -1)], pages
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import itertools
+import threading
+
+# Write-ahead log for scans. Every scan is appended to a JSON Lines file before
+# it is shown, and the app replays the file on startup, so a browser refresh
+# or server restart no longer loses the shift.
+#
+# Durability modes:
+#   "always"    a scan is on disk before append() returns. Concurrent appends
+#               share one fsync (group commit).
+#   "interval"  a background thread fsyncs every interval_ms
+#   "batch"     fsync once batch_size scans are pending
+DURABILITY_MODES = ("always", "interval", "batch")
+DEFAULT_INTERVAL_MS = 50
+DEFAULT_BATCH_SIZE = 100
+
+
+class ScanWAL:
+    def __init__(self, path, mode="interval", interval_ms=DEFAULT_INTERVAL_MS, batch_size=DEFAULT_BATCH_SIZE):
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.interval_ms = interval_ms
+        self.batch_size = batch_size
+        self.fsyncs = 0
+        self._cond = threading.Condition()
+        self._pending = []
+        self._appended_lsn = 0
+        self._durable_lsn = 0
+        self._flushing = False
+        self._closed = False
+        # Set after a write that failed part way, so the next write starts on a
+        # fresh line and the torn fragment is skipped on replay
+        self._torn = False
+        # Unbuffered: a failed write leaves nothing behind to be written twice
+        self._file = open(path, 'ab', buffering=0)
+        self._flusher = None
+        if mode == "interval":
+            self._flusher = threading.Thread(target=self._flush_periodically, name="scan-wal", daemon=True)
+            self._flusher.start()
+
+    # Append one scan, with the input it came from; returns its log sequence number
+    def append(self, barcode, timestamp_ns, source=None):
+        line = _scan_line(barcode, timestamp_ns, source)
+        with self._cond:
+            if self._closed:
+                raise ValueError("Scan log is closed")
+            self._pending.append(line)
+            self._appended_lsn += 1
+            lsn = self._appended_lsn
+            pending = len(self._pending)
+        if self.mode == "always" or (self.mode == "batch" and pending >= self.batch_size):
+            self.sync(lsn)
+        return lsn
+
+    # Append a batch of (barcode, timestamp_ns) scans from one input with one
+    # lock round trip and at most one fsync; returns the last log sequence number
+    def append_many(self, scans, source=None):
+        lines = [_scan_line(barcode, timestamp_ns, source) for barcode, timestamp_ns in scans]
+        with self._cond:
+            if self._closed:
+                raise ValueError("Scan log is closed")
+            self._pending.extend(lines)
+            self._appended_lsn += len(lines)
+            lsn = self._appended_lsn
+            pending = len(self._pending)
+        if self.mode == "always" or (self.mode == "batch" and pending >= self.batch_size):
+            self.sync(lsn)
+        return lsn
+
+    # Make everything up to `lsn` (default: all appended scans) durable. One
+    # caller becomes the leader and fsyncs the whole pending group; the others
+    # wait for it instead of issuing their own fsync. If the write or fsync
+    # fails, the leader raises and nothing is marked durable: a group that was
+    # not fully written goes back to the front of the queue, one that was
+    # written but not fsynced stays written, and the next leader (a waiting
+    # follower, or the next sync) tries again.
+    def sync(self, lsn=None):
+        with self._cond:
+            target = self._appended_lsn if lsn is None else lsn
+            while self._durable_lsn < target:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                self._flushing = True
+                batch, self._pending = self._pending, []
+                batch_lsn = self._appended_lsn
+                data = (b"\n" if self._torn and batch else b"") + b"".join(batch)
+                written = 0
+                synced = False
+                self._cond.release()
+                try:
+                    while written < len(data):
+                        written += self._file.write(data[written:])
+                    os.fsync(self._file.fileno())
+                    synced = True
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                    if synced:
+                        self.fsyncs += 1
+                        self._durable_lsn = batch_lsn
+                        self._torn = False
+                    elif written < len(data):
+                        self._pending[:0] = batch
+                        self._torn = self._torn or written > 0
+                    self._cond.notify_all()
+
+    # Record that a session cleared its scan history. Replaying the log for
+    # that session starts after the marker; the scans stay in the log for
+    # every other session and for exports.
+    def mark_cleared(self, session, timestamp_ns=None):
+        line = json.dumps({"t": timestamp_ns or time.time_ns(), "clear": session}, separators=(',', ':')) + "\n"
+        with self._cond:
+            if self._closed:
+                raise ValueError("Scan log is closed")
+            self._pending.append(line.encode())
+            self._appended_lsn += 1
+            lsn = self._appended_lsn
+        self.sync(lsn)
+        return lsn
+
+    # Start a fresh log; the old one is kept next to it as an archive
+    def rotate(self):
+        self.sync()
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._file.close()
+            if os.path.exists(self.path) and os.path.getsize(self.path):
+                archive = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+                suffix = 1
+                while os.path.exists(archive):
+                    archive = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+                    suffix += 1
+                os.replace(self.path, archive)
+            self._file = open(self.path, 'ab', buffering=0)
+            self._torn = False
+
+    def close(self):
+        self.sync()
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._closed = True
+            self._cond.notify_all()
+            self._file.close()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.interval_ms / 1000)
+            with self._cond:
+                if self._closed:
+                    return
+                idle = self._durable_lsn >= self._appended_lsn
+            if not idle:
+                try:
+                    self.sync()
+                except OSError:
+                    # The scans stay pending and are retried next interval
+                    continue
+
+
+# One scan as a log line. The input it came from is kept so a replay can make
+# the same bounce decisions as the live scan ("s" is left out when unknown).
+def _scan_line(barcode, timestamp_ns, source=None):
+    entry = {"t": timestamp_ns, "b": barcode}
+    if source is not None:
+        entry["s"] = source
+    return (json.dumps(entry, separators=(',', ':')) + "\n").encode()
+
+
+def _clear_marker(line):
+    try:
+        return json.loads(line).get("clear")
+    except ValueError:
+        return None
+
+
+# Function to replay a scan log as (barcode, timestamp_ns, source) entries, with
+# `default_source` for scans logged without one. A torn final line left by a
+# crash mid-write is skipped. For a session, the replay starts after the last
+# time that session cleared its history.
+def replay(path, session=None, default_source=None):
+    if not os.path.exists(path):
+        return
+    start = 0
+    if session is not None:
+        # Only marker lines are parsed to find where the session's replay starts
+        marker = json.dumps(session)[1:-1].encode()
+        with open(path, 'rb') as f:
+            for number, line in enumerate(f):
+                if b'"clear"' in line and marker in line and _clear_marker(line) == session:
+                    start = number + 1
+    with open(path, 'rb') as f:
+        for line in itertools.islice(f, start, None):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "b" in entry:
+                yield entry["b"], entry["t"], entry.get("s", default_source)
@@ -0,0 +1,178 @@
+import io
+import re
+import sys
+import uuid
+from functools import lru_cache
+from PIL import Image, ImageDraw
+
+from stamp_render import get_font
+from stamp_store import RECORD_IDS
+
+# Machine-readable imprints for stamps, orders and mail pieces. Each record is
+# identified by a record code: a kind letter (as in an Intelligent Mail
+# barcode, which starts with the service it belongs to) followed by 16 digits
+# holding the first 48 bits of the record's uuid. The code is printed as a
+# Code 128 barcode, which any USB scanner reads; the scanner apps look the
+# record up again by that id prefix.
+#
+# Everything per symbol is precomputed: the bar/space widths of the 107 Code
+# 128 symbols and each symbol's row of module pixels at import, and the glyph
+# of each character of the printed code the first time it is used. Drawing a
+# barcode joins the rows of its symbols into one line of pixels and stretches
+# that line to size in a single resize, with no per-bar drawing calls, and the
+# code under it is pasted from the glyphs rather than rendered with the font.
+
+# Bar/space widths of Code 128 symbol values 0-106 (106 is the stop pattern)
+PATTERNS = (
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232", "2331112",
+)
+START_B, START_C, CODE_B, CODE_C, STOP = 104, 105, 100, 99, 106
+
+# Modules of light space required on each side of the bars
+QUIET_ZONE = 10
+# Module width and bar height, in pixels. One module per stamp pixel keeps the
+# imprint within a 200px stamp, and is 0.35 mm wide on the 72 dpi print sheets
+# (scanners want 0.25 mm or more).
+MODULE_PX = 1
+BAR_HEIGHT = 40
+# Height of the printed code under the bars
+TEXT_HEIGHT = 18
+# Number of rendered barcodes and labels kept in memory per process
+BARCODE_CACHE_SIZE = 1024
+
+
+# Function to turn a bar/space width pattern into one row of module pixels
+# (0 for a bar, 255 for a space)
+def _module_row(pattern):
+    row = bytearray()
+    for i, width in enumerate(pattern):
+        row += (b"\x00" if i % 2 == 0 else b"\xff") * int(width)
+    return bytes(row)
+
+
+SYMBOL_ROWS = tuple(_module_row(pattern) for pattern in PATTERNS)
+QUIET_ROW = b"\xff" * QUIET_ZONE
+
+# Record kinds: letter -> table
+RECORD_KINDS = {"S": "stamps", "O": "orders", "M": "mail_history"}
+KIND_LETTERS = {table: letter for letter, table in RECORD_KINDS.items()}
+RECORD_CODE = re.compile(r"^([SOM])(\d{16})$")
+ID_BITS = 48
+
+
+# Function to split text into Code 128 symbol values, using Code Set C (two
+# digits per symbol) for runs of four or more digits and Code Set B elsewhere
+def code128_values(text):
+    if not text or not all(32 <= ord(char) < 127 for char in text):
+        raise ValueError("Code 128 imprints take printable ASCII text")
+    runs = re.findall(r"\d{4,}|\D+|\d{1,3}", text)
+    values = []
+    code_set = None
+    for run in runs:
+        if run.isdigit() and len(run) >= 4:
+            if len(run) % 2:
+                # An odd digit run starts with one digit in Code Set B
+                if code_set != "B":
+                    values.append(START_B if code_set is None else CODE_B)
+                    code_set = "B"
+                values.append(ord(run[0]) - 32)
+                run = run[1:]
+            if code_set != "C":
+                values.append(START_C if code_set is None else CODE_C)
+                code_set = "C"
+            values += [int(run[i:i + 2]) for i in range(0, len(run), 2)]
+        else:
+            if code_set != "B":
+                values.append(START_B if code_set is None else CODE_B)
+                code_set = "B"
+            values += [ord(char) - 32 for char in run]
+    checksum = (values[0] + sum(i * value for i, value in enumerate(values[1:], start=1))) % 103
+    return values + [checksum, STOP]
+
+
+# Function to render a Code 128 barcode (with its quiet zones) as a grayscale
+# image. Cached images are shared, so callers paste them rather than draw on them.
+@lru_cache(maxsize=BARCODE_CACHE_SIZE)
+def code128_image(text, module_px=MODULE_PX, height=BAR_HEIGHT):
+    row = QUIET_ROW + b"".join(SYMBOL_ROWS[value] for value in code128_values(text)) + QUIET_ROW
+    line = Image.frombytes('L', (len(row), 1), row)
+    return line.resize((len(row) * module_px, height), Image.NEAREST)
+
+
+# Function to build the record code for a stamp, order or mail piece id
+def record_code(table, record_id):
+    prefix = uuid.UUID(record_id).hex[:ID_BITS // 4]
+    return f"{KIND_LETTERS[table]}{int(prefix, 16):016d}"
+
+
+# Function to read a scanned record code back as (table, id prefix), or None
+# when the barcode is not one. The prefix matches the start of the record's id.
+def parse_record_code(barcode):
+    match = RECORD_CODE.match(barcode)
+    if not match:
+        return None
+    number = int(match.group(2))
+    if number >= 1 << ID_BITS:
+        return None
+    digits = f"{number:0{ID_BITS // 4}x}"
+    return RECORD_KINDS[match.group(1)], f"{digits[:8]}-{digits[8:]}"
+
+
+# Function to render one character of a printed code, once per process
+@lru_cache(maxsize=None)
+def _glyph(char):
+    font = get_font(14)
+    glyph = Image.new('L', (max(1, round(font.getlength(char))), TEXT_HEIGHT), 255)
+    ImageDraw.Draw(glyph).text((0, 0), char, fill=0, font=font)
+    return glyph
+
+
+# Function to lay out the printed form of a code from the cached glyphs
+def code_text_image(code):
+    glyphs = [_glyph(char) for char in code]
+    line = Image.new('L', (sum(glyph.width for glyph in glyphs), TEXT_HEIGHT), 255)
+    x = 0
+    for glyph in glyphs:
+        line.paste(glyph, (x, 0))
+        x += glyph.width
+    return line
+
+
+# Function to add a barcode band (bars and the code in text) below an image
+def imprint(img, code, module_px=MODULE_PX, height=BAR_HEIGHT):
+    bars = code128_image(code, module_px, height)
+    text = code_text_image(code)
+    width = max(img.width, bars.width, text.width)
+    label = Image.new('RGB', (width, img.height + height + TEXT_HEIGHT + 6), 'white')
+    label.paste(img, ((width - img.width) // 2, 0))
+    label.paste(bars, ((width - bars.width) // 2, img.height + 4))
+    label.paste(text, ((width - text.width) // 2, img.height + height + 5))
+    return label
+
+
+# Function to get an image file imprinted with a record code, as PNG bytes,
+# cached for repeated displays and downloads
+@lru_cache(maxsize=BARCODE_CACHE_SIZE)
+def imprinted_png(path, code):
+    with Image.open(path) as img:
+        label = imprint(img.convert('RGB'), code)
+    buf = io.BytesIO()
+    label.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in RECORD_IDS:
+        print("Usage: python stamp_barcode.py stamps|orders|mail_history RECORD_ID")
+        sys.exit(1)
+    print(record_code(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,206 @@
+import io
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from PIL import Image
+
+# Reference counts for every image in the stamp directory
+INDEX_FILE = "index.json"
+
+# Number of encoded thumbnails kept in memory per stamp directory
+THUMBNAIL_CACHE_SIZE = 512
+# Palette size of thumbnails
+THUMBNAIL_COLORS = 32
+
+# One lock per stamp directory, shared by every store in the process
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    path = os.path.abspath(path)
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = threading.RLock()
+        return _locks[path]
+
+
+# Downscaled PNGs of stamp images, made on first request and kept in a bounded
+# LRU of encoded bytes, so a page of stamps costs dictionary hits instead of
+# reading and sending every full-size file on each rerun.
+class ThumbnailCache:
+    def __init__(self, max_entries=THUMBNAIL_CACHE_SIZE):
+        self.max_entries = max_entries
+        # (absolute path, width) -> PNG bytes, least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns None when the image file is missing or unreadable (a legacy path,
+    # or a file removed by gc or by hand); nothing is cached for it then
+    def get(self, path, width):
+        key = (os.path.abspath(path), width)
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+            self.misses += 1
+        # Encode outside the lock; two sessions racing on one thumbnail both get a valid copy
+        try:
+            png = make_thumbnail(path, width)
+        except OSError:
+            return None
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return png
+
+    # Drop every width of one image
+    def invalidate(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(len(png) for png in self._entries.values())
+
+
+# Function to downscale an image file to `width` pixels wide, as PNG bytes.
+# Stamps are flat-colour drawings, so a small palette keeps them sharp at a
+# fraction of the RGB size. Images already that narrow are returned as they are.
+def make_thumbnail(path, width):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as img:
+        if img.width <= width:
+            return data
+        height = max(1, round(img.height * width / img.width))
+        thumb = img.convert('RGB').resize((width, height), Image.LANCZOS).quantize(THUMBNAIL_COLORS)
+    buf = io.BytesIO()
+    thumb.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+# One thumbnail cache per stamp directory, shared by every store in the process
+_thumbnails = {}
+
+
+def _thumbnails_for(path):
+    path = os.path.abspath(path)
+    with _locks_guard:
+        if path not in _thumbnails:
+            _thumbnails[path] = ThumbnailCache()
+        return _thumbnails[path]
+
+
+# Content-addressed stamp images: files are named by the SHA-256 of their PNG
+# bytes, so identical designs share one file. A file is only unlinked when the
+# last stamp record referencing it is released.
+class ImageStore:
+    def __init__(self, stamp_dir):
+        self.stamp_dir = stamp_dir
+        self.index_path = os.path.join(stamp_dir, INDEX_FILE)
+        self.lock = _lock_for(stamp_dir)
+        self.thumbnails = _thumbnails_for(stamp_dir)
+        os.makedirs(stamp_dir, exist_ok=True)
+
+    # Store PNG bytes (or add a reference to the existing copy) and return the path
+    def put(self, png_bytes):
+        name = hashlib.sha256(png_bytes).hexdigest() + ".png"
+        path = os.path.join(self.stamp_dir, name)
+        with self.lock:
+            refs = self._read_index()
+            if not os.path.exists(path):
+                tmp_path = path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(png_bytes)
+                os.replace(tmp_path, path)
+                refs[name] = 0
+            refs[name] = refs.get(name, 0) + 1
+            self._write_index(refs)
+        return path
+
+    # Drop one reference; the file is removed when none are left.
+    # Files written before the store existed have no entry and count as one reference.
+    def release(self, path):
+        name = os.path.basename(path)
+        with self.lock:
+            refs = self._read_index()
+            count = refs.pop(name, 1) - 1
+            if count > 0:
+                refs[name] = count
+            else:
+                self.thumbnails.invalidate(path)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._write_index(refs)
+        return count
+
+    # Downscaled copy of a stamp image for display at `width` pixels, or None
+    # when the file is gone
+    def thumbnail(self, path, width):
+        return self.thumbnails.get(path, width)
+
+    def refcount(self, path):
+        with self.lock:
+            return self._read_index().get(os.path.basename(path), 0)
+
+    # Rebuild reference counts from the stamp records that are still live and
+    # delete the indexed PNGs nobody references. Files the index does not track
+    # (the digital and physical apps save their own images in the same
+    # directory) are left alone. Returns the removed file names.
+    def gc(self, live_paths):
+        counts = Counter(os.path.basename(p) for p in live_paths
+                         if os.path.dirname(os.path.abspath(p)) == os.path.abspath(self.stamp_dir))
+        removed = []
+        with self.lock:
+            for name in self._read_index():
+                path = os.path.join(self.stamp_dir, name)
+                if name not in counts and os.path.exists(path):
+                    os.remove(path)
+                    self.thumbnails.invalidate(path)
+                    removed.append(name)
+            refs = {name: count for name, count in counts.items()
+                    if os.path.exists(os.path.join(self.stamp_dir, name))}
+            self._write_index(refs)
+        return removed
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, 'r') as f:
+            return json.load(f)
+
+    def _write_index(self, refs):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(refs, f)
+        os.replace(tmp_path, self.index_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != "gc":
+        print("Usage: python stamp_images.py gc data.json [stamps]")
+        sys.exit(1)
+    from stamp_store import open_store
+    stamps = open_store(sys.argv[2]).load()['stamps']
+    removed = ImageStore(sys.argv[3] if len(sys.argv) == 4 else "stamps").gc(s['path'] for s in stamps)
+    print(f"Removed {len(removed)} orphaned images")
@@ -0,0 +1,59 @@
+import io
+import uuid
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+# Stamp designs are drawn on a 200x200 canvas; other sizes are scaled from it
+BASE_SIZE = 200
+
+# Number of encoded stamp PNGs kept in memory per process
+RENDER_CACHE_SIZE = 256
+
+
+# Load the stamp font once per process
+@lru_cache(maxsize=None)
+def get_font(size=20):
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+# Function to draw a stamp design onto a new image
+def draw_stamp(design, text, color, value):
+    img = Image.new('RGB', (BASE_SIZE, BASE_SIZE), color='white')
+    draw = ImageDraw.Draw(img)
+
+    if design == "Classic":
+        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
+    elif design == "Wavy":
+        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
+        draw.line((20, 20, 180, 20), fill=color, width=3)
+        draw.line((20, 180, 180, 180), fill=color, width=3)
+    elif design == "Star":
+        draw.polygon([(100, 20), (120, 80), (180, 80), (130, 120), (150, 180),
+                      (100, 140), (50, 180), (70, 120), (20, 80), (80, 80)], outline=color, width=5)
+
+    font = get_font()
+    draw.text((20, 160), f"USPS ${value:.2f}", fill=color, font=font)
+    draw.text((20, 20), text.upper(), fill=color, font=font)
+    return img
+
+
+# Function to render a stamp to PNG bytes, cached by its design parameters
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_stamp_png(design, text, color, value, size=BASE_SIZE):
+    img = draw_stamp(design, text, color, value)
+    if size != BASE_SIZE:
+        img = img.resize((size, size), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+# Function to create a stamp record's image, reusing a cached render when one exists.
+# Identical designs share one file in the content-addressed image store.
+def create_stamp(design, text, color, value, images):
+    stamp_id = str(uuid.uuid4())
+    stamp_path = images.put(render_stamp_png(design, text, color, value))
+    return stamp_id, stamp_path
@@ -0,0 +1,71 @@
+import io
+from functools import lru_cache
+from PIL import Image
+
+from stamp_barcode import imprint
+
+# Default print layout: 4 columns x 5 rows of stamps per sheet
+SHEET_ROWS = 5
+SHEET_COLS = 4
+MARGIN = 40
+GUTTER = 10
+
+
+# Function to split an order into the number of stamps on each sheet
+def sheet_layout(quantity, per_sheet):
+    full_sheets, rest = divmod(quantity, per_sheet)
+    return [per_sheet] * full_sheets + ([rest] if rest else [])
+
+
+# Function to tile one stamp image into a sheet holding `count` stamps.
+# A single row strip is composed once and pasted per row, so a sheet costs
+# cols + rows pastes rather than one draw per stamp.
+def render_sheet(stamp_img, count, rows=SHEET_ROWS, cols=SHEET_COLS, margin=MARGIN, gutter=GUTTER):
+    width, height = stamp_img.size
+    pitch_x, pitch_y = width + gutter, height + gutter
+    page = Image.new('RGB', (2 * margin + cols * pitch_x - gutter, 2 * margin + rows * pitch_y - gutter), 'white')
+
+    strip = Image.new('RGB', (cols * pitch_x - gutter, height), 'white')
+    for col in range(cols):
+        strip.paste(stamp_img, (col * pitch_x, 0))
+
+    full_rows, rest = divmod(count, cols)
+    for row in range(full_rows):
+        page.paste(strip, (margin, margin + row * pitch_y))
+    if rest:
+        page.paste(strip.crop((0, 0, rest * pitch_x - gutter, height)), (margin, margin + full_rows * pitch_y))
+    return page
+
+
+# Function to render print-ready sheets for an order from its stamp image.
+# The stamp is loaded once and each distinct sheet (full, last partial) is
+# composed once, then reused for every page it appears on. With a record code
+# the stamp is imprinted with its barcode once, before tiling, so every stamp
+# on the sheets carries it at no cost per stamp.
+def render_order_sheets(stamp_path, quantity, rows=SHEET_ROWS, cols=SHEET_COLS, fmt='PDF', code=None):
+    with Image.open(stamp_path) as img:
+        stamp_img = img.convert('RGB')
+    if code:
+        stamp_img = imprint(stamp_img, code)
+
+    layout = sheet_layout(quantity, rows * cols)
+    sheets = {count: render_sheet(stamp_img, count, rows, cols) for count in set(layout)}
+
+    if fmt == 'PDF':
+        pages = [sheets[count] for count in layout]
+        buf = io.BytesIO()
+        pages[0].save(buf, format='PDF', save_all=True, append_images=pages[1:])
+        return buf.getvalue()
+
+    encoded = {}
+    for count, sheet in sheets.items():
+        buf = io.BytesIO()
+        sheet.save(buf, format='PNG')
+        encoded[count] = buf.getvalue()
+    return [encoded[count] for count in layout]
+
+
+# Function to get an order's sheets as a PDF, cached for repeated downloads
+@lru_cache(maxsize=32)
+def order_sheets_pdf(stamp_path, quantity, rows=SHEET_ROWS, cols=SHEET_COLS, code=None):
+    return render_order_sheets(stamp_path, quantity, rows, cols, fmt='PDF', code=code)
@@ -0,0 +1,713 @@
+import os
+import sys
+import json
+import bisect
+import sqlite3
+import threading
+
+from stamp_summary import GROUP_ORDER, SUMMARY_ROWS, SUMMARY_TABLES, HistorySummary, summary_changes
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows): writers are only serialized within one process
+    fcntl = None
+
+# Key field for each collection; mail_history entries have no id and are append-only
+TABLE_KEYS = {'stamps': 'id', 'mail_history': None, 'orders': 'order_id'}
+# Id field of each collection; new mail entries carry a mail_id, but the table
+# is not keyed by it (older entries have none)
+RECORD_IDS = {'stamps': 'id', 'mail_history': 'mail_id', 'orders': 'order_id'}
+
+# Compact once the journal holds this many records
+COMPACT_THRESHOLD = 10000
+
+# One write lock and one compaction lock per data file, shared by every store in the process
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+# Re-entrant lock that also holds an exclusive flock() on `lock_path` while it
+# is held, so app processes and CLI tools sharing a data file take turns too.
+# The file lock is taken once, by the outermost acquire in this process.
+class FileLock:
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None and self.lock_path:
+            try:
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# `across_processes` adds the file locks (data.json.lock, data.json.compact.lock);
+# SQLite does its own locking between processes
+def _locks_for(path, across_processes=True):
+    path = os.path.abspath(path)
+    with _locks_guard:
+        if path not in _locks:
+            if across_processes:
+                _locks[path] = (FileLock(path + ".lock"), FileLock(path + ".compact.lock"))
+            else:
+                _locks[path] = (threading.RLock(), threading.Lock())
+        return _locks[path]
+
+
+def empty_data():
+    return {table: [] for table in TABLE_KEYS}
+
+
+# Both stores share one repository API:
+#   load() / save(data)            whole-store read and snapshot write; load() is
+#                                  served from memory while nothing has changed
+#   merge(data)                    upsert keyed records and add new mail entries,
+#                                  keeping records written by other sessions
+#   append(table, record)          add or replace one record
+#   delete(table, key)             remove a keyed record
+#   get_stamp(stamp_id)            indexed lookup of one stamp design
+#   find_record(table, prefix)     first record whose id starts with prefix, for
+#                                  scanned record barcodes (stamp_barcode.py)
+#   history(table)                 (entry, stamp or None) pairs for mail_history or orders
+#   iter_history(table)            the same pairs as a generator, for exports
+#   summary()                      order and mail totals for the History pages,
+#                                  kept up to date by every write (stamp_summary.py)
+#   rebuild_summary()              recompute those totals from the history
+
+
+# Append-only storage: data.json is a snapshot, data.json.log holds JSON Lines
+# records written since the last compaction. Loading replays snapshot plus tail.
+class JournalStore:
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.log_path = path + ".log"
+        self.rotated_path = path + ".log.1"
+        self.compact_threshold = compact_threshold
+        self.lock, self.compact_lock = _locks_for(path)
+        self._log_count = None
+        self._compacting = None
+        # In-memory tables from the last load, keyed by id where the table has one,
+        # and the (mtime, size) of the files they were read from
+        self._tables = None
+        self._signature = None
+        # Sorted ids per table for find_record: table -> (rows, size, ids, rows by id)
+        self._id_index = {}
+        # Bumped on every write through this store
+        self.version = 0
+
+    # Read the snapshot and replay the journal tail on top of it. While the
+    # files are unchanged since the last load (apart from this store's own
+    # writes, which are applied to the tables as they happen) the tables in
+    # memory are returned instead.
+    def load(self):
+        with self.lock:
+            return self._to_data(self._loaded_tables())
+
+    # Append one record to a collection; cost does not depend on history size
+    def append(self, table, record):
+        self._write({'op': 'put', 'table': table, 'record': record})
+
+    # Record the removal of a keyed record (stamps or orders)
+    def delete(self, table, key):
+        self._write({'op': 'delete', 'table': table, 'key': key})
+
+    # Replace all data with a fresh snapshot and discard the journal
+    def save(self, data):
+        tables = self._index(data)
+        with self.compact_lock, self.lock:
+            self._write_snapshot(json.dumps(dict(data, summary=tables['summary'].to_dict()), indent=4))
+            for log_path in (self.rotated_path, self.log_path):
+                if os.path.exists(log_path):
+                    os.remove(log_path)
+            self._log_count = 0
+            self._tables = tables
+            self._signature = self._file_signature()
+            self.version += 1
+
+    # Merge a session's copy of the data into the store: keyed records are
+    # upserted by id/order_id and mail entries not yet stored are added, so
+    # records written by other sessions are never dropped
+    def merge(self, data):
+        with self.lock:
+            tables = self._loaded_tables()
+            entries = []
+            for table, key in TABLE_KEYS.items():
+                if key:
+                    for record in data.get(table, []):
+                        if tables[table].get(record[key]) != record:
+                            entries.append({'op': 'put', 'table': table, 'record': record})
+                else:
+                    stored = {}
+                    for row in tables[table]:
+                        stored.setdefault((row.get('stamp_id'), row.get('date')), []).append(row)
+                    for record in data.get(table, []):
+                        if record not in stored.get((record.get('stamp_id'), record.get('date')), ()):
+                            entries.append({'op': 'put', 'table': table, 'record': record})
+            self._write_many(entries)
+        return len(entries)
+
+    def get_stamp(self, stamp_id):
+        return self._loaded_tables()['stamps'].get(stamp_id)
+
+    # The ids of a table are kept sorted until its row count changes, so a
+    # lookup is a binary search. A hit is checked against the table, and a miss
+    # on an index that may be stale (same count, different ids) rebuilds it once.
+    def find_record(self, table, prefix):
+        id_field = RECORD_IDS[table]
+        with self.lock:
+            rows = self._loaded_tables()[table]
+            index = self._id_index.get(table)
+            fresh = index is None or index[0] is not rows or index[1] != len(rows)
+            while True:
+                if fresh:
+                    records = rows.values() if isinstance(rows, dict) else rows
+                    by_id = {row[id_field]: row for row in records if row.get(id_field)}
+                    index = self._id_index[table] = (rows, len(rows), sorted(by_id), by_id)
+                _, _, ids, by_id = index
+                i = bisect.bisect_left(ids, prefix)
+                if i < len(ids) and ids[i].startswith(prefix):
+                    # Keyed rows are read from the table, which has any replacements
+                    record = rows.get(ids[i]) if isinstance(rows, dict) else by_id[ids[i]]
+                    if record is not None:
+                        return record
+                if fresh:
+                    return None
+                fresh = True
+
+    def history(self, table):
+        return list(self.iter_history(table))
+
+    # The summary is updated in memory as each journal record is applied, and
+    # written into the snapshot at compaction
+    def summary(self, limit=SUMMARY_ROWS):
+        with self.lock:
+            return self._loaded_tables()['summary'].view(limit)
+
+    # Rewrite the snapshot with a summary recomputed from the records
+    def rebuild_summary(self):
+        with self.compact_lock, self.lock:
+            self.save(self.load())
+
+    def iter_history(self, table):
+        tables = self._loaded_tables()
+        stamps = tables['stamps']
+        rows = tables[table]
+        # Snapshot the row references so appends during an export are not a problem
+        rows = list(rows.values()) if isinstance(rows, dict) else rows[:]
+        for row in rows:
+            yield row, stamps.get(row['stamp_id'])
+
+    def _loaded_tables(self):
+        with self.lock:
+            signature = self._file_signature()
+            if self._tables is not None and signature != self._signature and self._log_grew(signature):
+                # Only the journal grew (appends by another store): replay just the new tail
+                self._log_count = (self._log_count or 0) + self._replay(
+                    self.log_path, self._tables, self._signature[2][1] if self._signature[2] else 0)
+                self._signature = signature
+            elif self._tables is None or signature != self._signature:
+                tables = self._read_snapshot()
+                count = 0
+                for log_path in (self.rotated_path, self.log_path):
+                    count += self._replay(log_path, tables)
+                self._log_count = count
+                self._tables = tables
+                self._signature = signature
+            return self._tables
+
+    # Fold the journal into the snapshot. The log is rotated first so appends
+    # keep going to a fresh file while the rotated one is merged.
+    # A background compaction (force=False) is skipped when another store
+    # sharing the file has already folded the journal.
+    def compact(self, force=True):
+        with self.compact_lock:
+            with self.lock:
+                if not force and not os.path.exists(self.rotated_path):
+                    self._log_count = self._count_lines(self.log_path)
+                    if self._log_count < self.compact_threshold:
+                        return
+                in_sync = self._tables is not None and self._file_signature() == self._signature
+                if os.path.exists(self.log_path) and not os.path.exists(self.rotated_path):
+                    os.replace(self.log_path, self.rotated_path)
+                if in_sync:
+                    self._signature = self._file_signature()
+                self._log_count = 0
+            tables = self._read_snapshot()
+            self._replay(self.rotated_path, tables)
+            # Encode outside the write lock; writers only wait for the file write
+            text = json.dumps(dict(self._to_data(tables), summary=tables['summary'].to_dict()), indent=4)
+            with self.lock:
+                in_sync = self._tables is not None and self._file_signature() == self._signature
+                self._write_snapshot(text)
+                if os.path.exists(self.rotated_path):
+                    os.remove(self.rotated_path)
+                # Compaction rewrites the files without changing their contents
+                if in_sync:
+                    self._signature = self._file_signature()
+
+    # Start compaction on a background thread unless one is already running
+    def compact_in_background(self):
+        if self._compacting and self._compacting.is_alive():
+            return self._compacting
+        self._compacting = threading.Thread(target=self.compact, args=(False,), daemon=True)
+        self._compacting.start()
+        return self._compacting
+
+    # Wait for a background compaction started by this store, if any
+    def wait_for_compaction(self):
+        if self._compacting:
+            self._compacting.join()
+
+    def _write(self, entry):
+        self._write_many([entry])
+
+    # Append journal records with a single unbuffered append, so records from
+    # several processes never interleave. A torn line left by a crash is
+    # terminated first, so the records after it still replay.
+    def _write_many(self, entries):
+        if not entries:
+            return
+        lines = "".join(json.dumps(entry, separators=(',', ':')) + "\n" for entry in entries).encode()
+        with self.lock:
+            if self._log_count is None:
+                self._log_count = self._count_lines(self.log_path)
+            if self._tables is not None and self._file_signature() != self._signature:
+                # Catch up with what other stores wrote first (a tail replay, or
+                # a full re-read after a compaction), so the tables hold their
+                # records once and ours are applied on top. The lock keeps
+                # anyone else from writing in between.
+                self._loaded_tables()
+            with open(self.log_path, 'ab+', buffering=0) as f:
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        lines = b"\n" + lines
+                f.write(lines)
+            self._log_count += len(entries)
+            self.version += 1
+            if self._tables is not None:
+                for entry in entries:
+                    self._apply(entry, self._tables)
+                # Our own append keeps the tables current
+                self._signature = self._file_signature()
+            needs_compaction = self._log_count >= self.compact_threshold
+        if needs_compaction:
+            self.compact_in_background()
+
+    def _read_snapshot(self):
+        data = empty_data()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                data.update(json.load(f))
+        return self._index(data, data.get('summary'))
+
+    # Tables keyed by id where the table has one, plus the summary: the one
+    # saved with a snapshot, or else one rebuilt from the rows
+    @staticmethod
+    def _index(data, summary=None):
+        tables = {}
+        for table, key in TABLE_KEYS.items():
+            rows = data.get(table, [])
+            tables[table] = {row[key]: row for row in rows} if key else list(rows)
+        if summary is not None:
+            tables['summary'] = HistorySummary(summary)
+        else:
+            stamps = tables['stamps']
+            tables['summary'] = HistorySummary.rebuild(
+                (table, row, stamps.get(row.get('stamp_id')))
+                for table in SUMMARY_TABLES for row in data.get(table, []))
+        return tables
+
+    def _log_grew(self, signature):
+        previous = self._signature
+        return (signature[:2] == previous[:2] and signature[2] is not None
+                and (previous[2] is None or signature[2][1] > previous[2][1]))
+
+    def _replay(self, log_path, tables, offset=0):
+        if not os.path.exists(log_path):
+            return 0
+        count = 0
+        with open(log_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append is ignored
+                    continue
+                count += 1
+                self._apply(entry, tables)
+        return count
+
+    @staticmethod
+    def _apply(entry, tables):
+        table = entry['table']
+        key = TABLE_KEYS.get(table)
+        if entry['op'] == 'put':
+            record = entry['record']
+            if key:
+                old = tables[table].get(record[key])
+                tables[table][record[key]] = record
+            else:
+                old = None
+                tables[table].append(record)
+            tables['summary'].replace(table, old, record, tables['stamps'])
+        elif entry['op'] == 'delete' and key:
+            tables['summary'].replace(table, tables[table].pop(entry['key'], None), None)
+
+    # Write the snapshot beside the old one and rename it into place, so a
+    # crash leaves either the old or the new snapshot, never a truncated one
+    def _write_snapshot(self, text):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # Fresh lists every time: the store is shared by every session, and a
+    # session appending to its own lists must not touch the store's tables
+    @staticmethod
+    def _to_data(tables):
+        return {table: list(rows.values()) if isinstance(rows, dict) else list(rows)
+                for table, rows in tables.items() if table in TABLE_KEYS}
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.path, self.rotated_path, self.log_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @staticmethod
+    def _count_lines(path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as f:
+            return sum(1 for _ in f)
+
+
+# SQLite storage: one file, no server. Each record is kept as JSON next to the
+# columns it is looked up by, so stamp_id, order_id and date are indexed.
+class SQLiteStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS stamps (
+            id TEXT PRIMARY KEY,
+            record TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS mail_history (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            stamp_id TEXT,
+            date TEXT,
+            record TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            stamp_id TEXT,
+            date TEXT,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_mail_stamp_id ON mail_history (stamp_id);
+        CREATE INDEX IF NOT EXISTS idx_mail_date ON mail_history (date);
+        CREATE INDEX IF NOT EXISTS idx_mail_id ON mail_history (json_extract(record, '$.mail_id'));
+        CREATE INDEX IF NOT EXISTS idx_orders_stamp_id ON orders (stamp_id);
+        CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (date);
+        CREATE INDEX IF NOT EXISTS idx_orders_seq ON orders (seq);
+        CREATE TABLE IF NOT EXISTS summary (
+            grp TEXT NOT NULL,
+            name TEXT NOT NULL,
+            label TEXT,
+            entries INTEGER NOT NULL,
+            stamps INTEGER NOT NULL,
+            cents INTEGER NOT NULL,
+            PRIMARY KEY (grp, name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_summary_entries ON summary (grp, entries, name);
+        CREATE INDEX IF NOT EXISTS idx_summary_cents ON summary (grp, cents, name);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock, _ = _locks_for(path, across_processes=False)
+        # Write transactions take the write lock up front (BEGIN IMMEDIATE), so a
+        # writer in another process makes this one wait rather than fail
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level="IMMEDIATE", check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        # Bumped on every write through this store
+        self.version = 0
+        # Parsed tables from the last load and the (version, data_version) they match
+        self._loaded = None
+        self._loaded_key = None
+        # A file written before the summary table existed gets its summary built once
+        if not self.conn.execute("SELECT EXISTS (SELECT 1 FROM summary)").fetchone()[0] and \
+                self.conn.execute("SELECT EXISTS (SELECT 1 FROM orders) OR EXISTS (SELECT 1 FROM mail_history)").fetchone()[0]:
+            self.rebuild_summary()
+
+    # Whole-store read, served from memory until this store writes or another
+    # connection commits (PRAGMA data_version changes)
+    def load(self):
+        with self.lock:
+            key = (self.version, self.conn.execute("PRAGMA data_version").fetchone()[0])
+            if self._loaded is None or key != self._loaded_key:
+                stamps = self.conn.execute("SELECT record FROM stamps ORDER BY rowid").fetchall()
+                mail = self.conn.execute("SELECT record FROM mail_history ORDER BY seq").fetchall()
+                orders = self.conn.execute("SELECT record FROM orders ORDER BY seq").fetchall()
+                self._loaded = {
+                    'stamps': [json.loads(r) for (r,) in stamps],
+                    'mail_history': [json.loads(r) for (r,) in mail],
+                    'orders': [json.loads(r) for (r,) in orders],
+                }
+                self._loaded_key = key
+            return {table: list(rows) for table, rows in self._loaded.items()}
+
+    def append(self, table, record):
+        with self.lock:
+            with self.conn:
+                self._insert(table, record)
+            self._update_loaded(table, lambda rows: self._put_row(table, rows, record))
+
+    def delete(self, table, key):
+        key_column = TABLE_KEYS[table]
+        with self.lock:
+            with self.conn:
+                if table in SUMMARY_TABLES:
+                    self._summarize(table, self._stored(table, key_column, key), None)
+                self.conn.execute(f"DELETE FROM {table} WHERE {key_column} = ?", (key,))
+            self._update_loaded(table, lambda rows: [row for row in rows if row.get(key_column) != key])
+
+    def save(self, data):
+        with self.lock, self.conn:
+            self.version += 1
+            for table in TABLE_KEYS:
+                self.conn.execute(f"DELETE FROM {table}")
+                for record in data.get(table, []):
+                    self._insert(table, record, summarize=False)
+            self._rebuild_summary()
+
+    # Same merge semantics as JournalStore.merge
+    def merge(self, data):
+        written = 0
+        with self.lock:
+            with self.conn:
+                for table, key in TABLE_KEYS.items():
+                    for record in data.get(table, []):
+                        if not key and self._has_mail(record):
+                            continue
+                        if key and self._stored(table, key, record[key]) == record:
+                            continue
+                        self._insert(table, record)
+                        written += 1
+            if written:
+                self.version += 1
+        return written
+
+    def _stored(self, table, key, value):
+        row = self.conn.execute(f"SELECT record FROM {table} WHERE {key} = ?", (value,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _has_mail(self, record):
+        rows = self.conn.execute("SELECT record FROM mail_history WHERE stamp_id IS ? AND date IS ?",
+                                 (record.get('stamp_id'), record.get('date'))).fetchall()
+        return any(json.loads(row) == record for (row,) in rows)
+
+    # Bump the version after a write, and apply the write to the loaded tables
+    # when they were current before it, so the next load() stays in memory
+    def _update_loaded(self, table, update):
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        was_current = self._loaded is not None and self._loaded_key == (self.version, data_version)
+        self.version += 1
+        if was_current:
+            self._loaded[table] = update(self._loaded[table])
+            self._loaded_key = (self.version, data_version)
+
+    @staticmethod
+    def _put_row(table, rows, record):
+        key = TABLE_KEYS[table]
+        if key:
+            for i, row in enumerate(rows):
+                if row.get(key) == record[key]:
+                    rows = rows[:]
+                    rows[i] = record
+                    return rows
+        return rows + [record]
+
+    def get_stamp(self, stamp_id):
+        with self.lock:
+            row = self.conn.execute("SELECT record FROM stamps WHERE id = ?", (stamp_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # One range read on the id index (an expression index on mail_id for mail)
+    def find_record(self, table, prefix):
+        column = TABLE_KEYS[table] or f"json_extract(record, '$.{RECORD_IDS[table]}')"
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT record FROM {table} WHERE {column} >= ? AND {column} < ? ORDER BY {column} LIMIT 1",
+                (prefix, upper)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # Each group's top rows come from the (grp, entries, name), (grp, cents, name)
+    # or primary key index (ties go to the larger name, as in HistorySummary),
+    # so the summary costs the same however many orders exist
+    def summary(self, limit=SUMMARY_ROWS):
+        view = {}
+        with self.lock:
+            for group, order in GROUP_ORDER.items():
+                view[group] = self.conn.execute(
+                    f"SELECT name, label, entries, stamps, cents FROM summary WHERE grp = ? "
+                    f"ORDER BY {order} DESC, name DESC LIMIT ?", (group, limit)).fetchall()
+        return view
+
+    def rebuild_summary(self):
+        with self.lock, self.conn:
+            self._rebuild_summary()
+
+    # One streaming pass over the orders and mail (joined to their stamps),
+    # counted in memory and written back in the current transaction
+    def _rebuild_summary(self):
+        self.conn.execute("DELETE FROM summary")
+        rows = ((table, json.loads(entry), json.loads(stamp) if stamp else None)
+                for table in SUMMARY_TABLES
+                for entry, stamp in self.conn.execute(
+                    f"SELECT h.record, s.record FROM {table} h LEFT JOIN stamps s ON s.id = h.stamp_id"))
+        groups = HistorySummary.rebuild(rows).to_dict()
+        self.conn.executemany(
+            "INSERT INTO summary (grp, name, label, entries, stamps, cents) VALUES (?, ?, ?, ?, ?, ?)",
+            [(group, name, label, entries, stamps, cents)
+             for group, named in groups.items() for name, (entries, stamps, cents, label) in named.items()])
+
+    # Count a new, replaced or removed order or mail entry in the summary rows
+    def _summarize(self, table, old, new):
+        changes = []
+        if new:
+            row = self.conn.execute("SELECT record FROM stamps WHERE id = ?", (new.get('stamp_id'),)).fetchone()
+            changes += summary_changes(table, new, json.loads(row[0]) if row else None)
+        if old:
+            changes += summary_changes(table, old, sign=-1)
+        self.conn.executemany(
+            "INSERT INTO summary (grp, name, label, entries, stamps, cents) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (grp, name) DO UPDATE SET label = COALESCE(excluded.label, label), "
+            "entries = entries + excluded.entries, stamps = stamps + excluded.stamps, cents = cents + excluded.cents",
+            changes)
+        self.conn.executemany("DELETE FROM summary WHERE grp = ? AND name = ? AND entries <= 0",
+                              [change[:2] for change in changes if change[3] < 0])
+
+    def history(self, table):
+        order_by = "seq" if table in ('mail_history', 'orders') else "rowid"
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT h.record, s.record FROM {table} h "
+                f"LEFT JOIN stamps s ON s.id = h.stamp_id ORDER BY h.{order_by}"
+            ).fetchall()
+        return [(json.loads(entry), json.loads(stamp) if stamp else None) for entry, stamp in rows]
+
+    # Read the history a chunk at a time (keyed on seq), holding the lock only
+    # while a chunk is fetched, so exports of any size use constant memory
+    def iter_history(self, table, chunk_size=1000):
+        last_seq = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT h.seq, h.record, s.record FROM {table} h "
+                    f"LEFT JOIN stamps s ON s.id = h.stamp_id "
+                    f"WHERE h.seq > ? ORDER BY h.seq LIMIT ?", (last_seq, chunk_size)
+                ).fetchall()
+            for last_seq, entry, stamp in rows:
+                yield json.loads(entry), json.loads(stamp) if stamp else None
+            if len(rows) < chunk_size:
+                return
+
+    def close(self):
+        self.conn.close()
+
+    def _insert(self, table, record, summarize=True):
+        if summarize and table == 'orders':
+            self._summarize(table, self._stored('orders', 'order_id', record['order_id']), record)
+        elif summarize and table == 'mail_history':
+            self._summarize(table, None, record)
+        blob = json.dumps(record)
+        if table == 'stamps':
+            self.conn.execute("INSERT OR REPLACE INTO stamps (id, record) VALUES (?, ?)",
+                              (record['id'], blob))
+        elif table == 'mail_history':
+            self.conn.execute("INSERT INTO mail_history (stamp_id, date, record) VALUES (?, ?, ?)",
+                              (record.get('stamp_id'), record.get('date'), blob))
+        elif table == 'orders':
+            # Replacing an order keeps its original position in the history
+            self.conn.execute(
+                "INSERT INTO orders (order_id, seq, stamp_id, date, record) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM orders), ?, ?, ?) "
+                "ON CONFLICT (order_id) DO UPDATE SET "
+                "stamp_id = excluded.stamp_id, date = excluded.date, record = excluded.record",
+                (record['order_id'], record.get('stamp_id'), record.get('date'), blob))
+        else:
+            raise KeyError(f"Unknown table: {table}")
+
+
+# Import an existing data.json (snapshot plus any journal) into a SQLite file
+def migrate_json_to_sqlite(json_path, sqlite_path):
+    data = JournalStore(json_path).load()
+    store = SQLiteStore(sqlite_path)
+    try:
+        store.save(data)
+    finally:
+        store.close()
+    return {table: len(rows) for table, rows in data.items()}
+
+
+def is_sqlite_path(path):
+    return path.endswith(('.db', '.sqlite', '.sqlite3'))
+
+
+# Pick the backend from the file extension: .db/.sqlite use SQLite, anything else the journal
+def open_store(path):
+    if is_sqlite_path(path):
+        return SQLiteStore(path)
+    return JournalStore(path)
+
+
+if __name__ == "__main__":
+    if not (len(sys.argv) == 4 and sys.argv[1] == "migrate") and not (len(sys.argv) == 3 and sys.argv[1] == "rebuild-summary"):
+        print("Usage: python stamp_store.py migrate data.json data.db\n"
+              "       python stamp_store.py rebuild-summary data.(json|db)")
+        sys.exit(1)
+    if sys.argv[1] == "rebuild-summary":
+        store = open_store(sys.argv[2])
+        store.rebuild_summary()
+        totals = store.summary(1)
+        print(f"orders: {totals['orders'][0][2] if totals['orders'] else 0}, "
+              f"mail_history: {totals['mail'][0][2] if totals['mail'] else 0}")
+        sys.exit(0)
+    counts = migrate_json_to_sqlite(sys.argv[2], sys.argv[3])
+    print(", ".join(f"{table}: {count}" for table, count in counts.items()))
@@ -0,0 +1,157 @@
+from bisect import bisect_left, insort
+
+# Running totals for the History pages: orders, stamps and spend overall, per
+# stamp design and per month, and mail sent overall, per recipient and per
+# month. Every order or mail entry written changes a handful of counters (and
+# replacing or deleting an order takes its old counts back out), so the totals
+# never need the history to be re-read. The stores keep a summary next to
+# their records and update it in the same write; rebuild() recomputes one
+# from the history in a single pass.
+
+# Groups kept: (kind, grouped by)
+ORDERS, ORDERS_BY_STAMP, ORDERS_BY_MONTH = "orders", "orders_by_stamp", "orders_by_month"
+MAIL, MAIL_BY_RECIPIENT, MAIL_BY_MONTH = "mail", "mail_by_recipient", "mail_by_month"
+SUMMARY_TABLES = ("orders", "mail_history")
+# How the rows of each group are ranked for display: counter, newest/largest first
+GROUP_ORDER = {
+    ORDERS: "entries", ORDERS_BY_STAMP: "cents", ORDERS_BY_MONTH: "name",
+    MAIL: "entries", MAIL_BY_RECIPIENT: "entries", MAIL_BY_MONTH: "name",
+}
+# Rows shown per group
+SUMMARY_ROWS = 12
+# Position of each counter in a row: [entries, stamps, cents, label]
+COUNTERS = {"entries": 0, "stamps": 1, "cents": 2}
+
+
+def stamp_label(stamp):
+    return f"{stamp['text']} ({stamp['design']})" if stamp else None
+
+
+# Function to list the counter changes one order or mail entry makes, as
+# (group, name, label, entries, stamps, cents). sign=-1 takes an entry back out.
+# Stamps are grouped by id, and their label is only kept for display, so an
+# order can be taken out again after its stamp was deleted.
+def summary_changes(table, entry, stamp=None, sign=1):
+    month = (entry.get('date') or '')[:7]
+    if table == 'orders':
+        quantity = sign * int(entry.get('quantity') or 0)
+        cents = sign * round((entry.get('total_cost') or 0) * 100)
+        return [(ORDERS, "", None, sign, quantity, cents),
+                (ORDERS_BY_STAMP, entry.get('stamp_id') or "", stamp_label(stamp), sign, quantity, cents),
+                (ORDERS_BY_MONTH, month, None, sign, quantity, cents)]
+    if table == 'mail_history':
+        return [(MAIL, "", None, sign, 0, 0),
+                (MAIL_BY_RECIPIENT, (entry.get('recipient') or "").strip(), None, sign, 0, 0),
+                (MAIL_BY_MONTH, month, None, sign, 0, 0)]
+    return []
+
+
+class HistorySummary:
+    def __init__(self, groups=None):
+        # group -> name -> [entries, stamps, cents, label]
+        self.groups = {group: {} for group in GROUP_ORDER}
+        for group, rows in (groups or {}).items():
+            self.groups.setdefault(group, {}).update({name: list(row) for name, row in rows.items()})
+        # group -> (ranking counter, name) of every row, ascending, kept sorted
+        # as rows change so the top rows are read off the end. Counts also go
+        # down (replaced and deleted orders), so a bounded top-k could not
+        # stay exact. A group is only sorted the first time its rows are read,
+        # so stores reloading their tables don't pay for it.
+        self._ranked = {}
+
+    @staticmethod
+    def _rank(group, name, row):
+        order = GROUP_ORDER.get(group, "name")
+        return (name, name) if order == "name" else (row[COUNTERS[order]], name)
+
+    # Function to apply the changes of replacing `old` with `new` (either may be None)
+    def replace(self, table, old, new, stamps=None):
+        if table not in SUMMARY_TABLES:
+            return
+        changes = []
+        # The new entry is counted first, so a replaced order's rows (and the
+        # stamp labels on them) are never emptied and dropped in between
+        if new:
+            stamp = stamps.get(new.get('stamp_id')) if stamps is not None else None
+            changes += summary_changes(table, new, stamp)
+        if old:
+            changes += summary_changes(table, old, sign=-1)
+        self.apply(changes)
+
+    def apply(self, changes):
+        for group, name, label, entries, stamps, cents in changes:
+            rows = self.groups[group]
+            ranked = self._ranked.get(group)
+            row = rows.get(name)
+            if row is None:
+                row = rows[name] = [0, 0, 0, None]
+            elif ranked is not None:
+                del ranked[bisect_left(ranked, self._rank(group, name, row))]
+            row[0] += entries
+            row[1] += stamps
+            row[2] += cents
+            row[3] = label or row[3]
+            if row[0] <= 0:
+                del rows[name]
+            elif ranked is not None:
+                insort(ranked, self._rank(group, name, row))
+
+    def to_dict(self):
+        return self.groups
+
+    # Function to rebuild a summary from (table, entry, stamp) triples in one pass
+    @classmethod
+    def rebuild(cls, entries):
+        summary = cls()
+        for table, entry, stamp in entries:
+            summary.apply(summary_changes(table, entry, stamp))
+        return summary
+
+    # The rows of one group as (name, label, entries, stamps, cents), ranked
+    # for display, ties going to the larger name. Only the rows returned are
+    # read, however many recipients, stamps or orders were counted.
+    def rows(self, group, limit=SUMMARY_ROWS):
+        rows = self.groups[group]
+        if group not in self._ranked:
+            self._ranked[group] = sorted(self._rank(group, name, row) for name, row in rows.items())
+        top = self._ranked[group][:-limit - 1:-1] if limit else []
+        return [(name, rows[name][3], rows[name][0], rows[name][1], rows[name][2]) for _, name in top]
+
+    # Everything the summary panel shows: group -> ranked rows
+    def view(self, limit=SUMMARY_ROWS):
+        return {group: self.rows(group, limit) for group in GROUP_ORDER}
+
+
+# Summary panel for the History pages, from a store's (or a summary's) view()
+def render_history_summary(view, orders=True, mail=True):
+    # Streamlit is only needed to draw the panel; the stores import this module too
+    import streamlit as st
+
+    if orders:
+        total = view[ORDERS][0] if view[ORDERS] else ("", None, 0, 0, 0)
+        count, stamps, spend = st.columns(3)
+        count.metric("Orders", f"{total[2]:,}")
+        stamps.metric("Stamps ordered", f"{total[3]:,}")
+        spend.metric("Total spend", f"${total[4] / 100:,.2f}")
+        if total[2]:
+            by_stamp, by_month = st.columns(2)
+            with by_stamp:
+                st.caption("Spend per stamp design")
+                st.table([{"stamp": label or "Deleted stamp", "orders": entries, "stamps": quantity,
+                           "spend": f"${cents / 100:,.2f}"}
+                          for _, label, entries, quantity, cents in view[ORDERS_BY_STAMP]])
+            with by_month:
+                st.caption("Stamps ordered per month")
+                st.table([{"month": month, "orders": entries, "stamps": quantity, "spend": f"${cents / 100:,.2f}"}
+                          for month, _, entries, quantity, cents in view[ORDERS_BY_MONTH]])
+    if mail:
+        total = view[MAIL][0][2] if view[MAIL] else 0
+        st.metric("Mail sent", f"{total:,}")
+        if total:
+            by_recipient, by_month = st.columns(2)
+            with by_recipient:
+                st.caption("Mail sent per recipient")
+                st.table([{"recipient": name, "mail": entries} for name, _, entries, _, _ in view[MAIL_BY_RECIPIENT]])
+            with by_month:
+                st.caption("Mail sent per month")
+                st.table([{"month": month, "mail": entries} for month, _, entries, _, _ in view[MAIL_BY_MONTH]])
@@ -1,6 +1,8 @@
 import streamlit as st
 import os
-from PIL import Image, ImageDraw, ImageFont
+from stamp_render import create_stamp as render_stamp_file
+from stamp_images import ImageStore
+from stamp_barcode import imprinted_png, record_code
 import uuid
 import datetime
 
@@ -18,49 +20,23 @@ if 'mail_history' not in st.session_state:
 # Directory to save stamps
 STAMP_DIR = "stamps"
 os.makedirs(STAMP_DIR, exist_ok=True)
+images = ImageStore(STAMP_DIR)
 
-# Function to create a digital stamp
+# Function to create a digital stamp (rendered once per design; identical designs share one file)
 def create_stamp(design, text, color, value):
-    # Create a blank image
-    img = Image.new('RGB', (200, 200), color='white')
-    draw = ImageDraw.Draw(img)
-    
-    # Draw border based on design
-    if design == "Classic":
-        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
-    elif design == "Wavy":
-        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
-        draw.line((20, 20, 180, 20), fill=color, width=3)
-        draw.line((20, 180, 180, 180), fill=color, width=3)
-    elif design == "Star":
-        draw.polygon([(100, 20), (120, 80), (180, 80), (130, 120), (150, 180), 
-                      (100, 140), (50, 180), (70, 120), (20, 80), (80, 80)], outline=color, width=5)
-    
-    # Add text (stamp value and custom text)
-    try:
-        font = ImageFont.truetype("arial.ttf", 20)
-    except:
-        font = ImageFont.load_default()
-    
-    draw.text((20, 160), f"USPS ${value:.2f}", fill=color, font=font)
-    draw.text((20, 20), text.upper(), fill=color, font=font)
-    
-    # Save stamp
-    stamp_id = str(uuid.uuid4())
-    stamp_path = os.path.join(STAMP_DIR, f"{stamp_id}.png")
-    img.save(stamp_path)
-    
-    return stamp_id, stamp_path
+    return render_stamp_file(design, text, color, value, images)
 
-# Function to simulate sending mail
+# Function to simulate sending mail. Each mail piece gets a mail_id for its barcode.
 def send_mail(stamp_id, recipient, address):
     mail_entry = {
+        'mail_id': str(uuid.uuid4()),
         'stamp_id': stamp_id,
         'recipient': recipient,
         'address': address,
         'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     st.session_state.mail_history.append(mail_entry)
+    return mail_entry
 
 # Streamlit app
 st.title("📬 USPS Digital Stamp Application")
@@ -95,7 +71,7 @@ if page == "Create Stamp":
                         'value': value
                     })
                     st.success("Stamp created successfully!")
-                    st.image(stamp_path, caption=f"Stamp: {text} (${value:.2f})", width=200)
+                    st.image(imprinted_png(stamp_path, record_code('stamps', stamp_id)), caption=f"Stamp: {text} (${value:.2f})", width=200)
 
 # Page 2: My Collection
 elif page == "My Collection":
@@ -106,9 +82,13 @@ elif page == "My Collection":
         cols = st.columns(3)
         for idx, stamp in enumerate(st.session_state.stamps):
             with cols[idx % 3]:
-                st.image(stamp['path'], caption=f"{stamp['text']} (${stamp['value']:.2f})", width=150)
+                thumbnail = images.thumbnail(stamp['path'], 150)
+                if thumbnail:
+                    st.image(thumbnail, caption=f"{stamp['text']} (${stamp['value']:.2f})", width=150)
+                else:
+                    st.write(f"{stamp['text']} (${stamp['value']:.2f}): Stamp design no longer available.")
                 if st.button("Delete", key=f"delete_{stamp['id']}"):
-                    os.remove(stamp['path'])
+                    images.release(stamp['path'])
                     st.session_state.stamps = [s for s in st.session_state.stamps if s['id'] != stamp['id']]
                     st.experimental_rerun()
 
@@ -130,12 +110,16 @@ elif page == "Send Mail":
                 if not recipient or not address:
                     st.error("Please fill in all fields.")
                 else:
-                    send_mail(stamp[1], recipient, address)
+                    mail_entry = send_mail(stamp[1], recipient, address)
                     st.success("Mail sent successfully!")
+                    stamp_data = next(s for s in st.session_state.stamps if s['id'] == stamp[1])
+                    # The mail is already recorded; a stamp whose image is gone just has no preview
+                    if os.path.exists(stamp_data['path']):
+                        st.image(imprinted_png(stamp_data['path'], record_code('mail_history', mail_entry['mail_id'])),
+                                 caption=f"Mail piece to {recipient}", width=200)
                     # Optionally remove stamp after use
                     if st.checkbox("Remove stamp after sending"):
-                        stamp_data = next(s for s in st.session_state.stamps if s['id'] == stamp[1])
-                        os.remove(stamp_data['path'])
+                        images.release(stamp_data['path'])
                         st.session_state.stamps = [s for s in st.session_state.stamps if s['id'] != stamp[1]]
 
 # Page 4: Mail History
@@ -144,13 +128,18 @@ elif page == "Mail History":
     if not st.session_state.mail_history:
         st.info("No mail sent yet. Go to 'Send Mail' to start!")
     else:
+        # Look each stamp up once, not once per mail
+        stamps_by_id = {s['id']: s for s in st.session_state.stamps}
         for mail in st.session_state.mail_history:
-            stamp_data = next((s for s in st.session_state.stamps if s['id'] == mail['stamp_id']), None)
+            stamp_data = stamps_by_id.get(mail['stamp_id'])
             st.write("---")
             st.write(f"**Sent to**: {mail['recipient']}")
             st.write(f"**Address**: {mail['address']}")
             st.write(f"**Date**: {mail['date']}")
-            if stamp_data:
-                st.image(stamp_data['path'], caption=f"Stamp: {stamp_data['text']}", width=100)
+            if mail.get('mail_id'):
+                st.write(f"**Barcode**: {record_code('mail_history', mail['mail_id'])}")
+            thumbnail = images.thumbnail(stamp_data['path'], 100) if stamp_data else None
+            if thumbnail:
+                st.image(thumbnail, caption=f"Stamp: {stamp_data['text']}", width=100)
             else:
                 st.write("Stamp no longer available.")
@@ -1,37 +1,90 @@
 import streamlit as st
 import os
-import json
 import uuid
 import datetime
-from PIL import Image, ImageDraw, ImageFont
+from stamp_render import render_stamp_png, create_stamp as render_stamp_file
+from stamp_images import ImageStore
+from stamp_sheets import order_sheets_pdf
+from stamp_barcode import imprinted_png, record_code
+from stamp_summary import render_history_summary
+from stamp_store import open_store, empty_data, is_sqlite_path, migrate_json_to_sqlite
+from history_export import FORMATS, MIME_TYPES, TABLE_COLUMNS, history_rows, export_bytes
+from rerun_profiler import get_profiler, render_profiler_panel
 
 # Set page configuration
 st.set_page_config(page_title="USPS Stamp App", page_icon="📬", layout="wide")
 
+# Time each phase of this rerun (RERUN_PROFILER=1 shows the profile in the sidebar)
+profiler = get_profiler("us-stamp-app")
+rerun = profiler.start()
+
 # Directories for stamps and data
 STAMP_DIR = "stamps"
-DATA_FILE = "data.json"
-os.makedirs(STAMP_DIR, exist_ok=True)
+LEGACY_DATA_FILE = "data.json"
+# Set STAMP_DATA_FILE=data.db to use the SQLite backend instead of the JSON journal
+DATA_FILE = os.environ.get("STAMP_DATA_FILE", LEGACY_DATA_FILE)
+
+# One image store per process (it creates the stamp directory)
+@st.cache_resource
+def get_image_store(stamp_dir):
+    return ImageStore(stamp_dir)
+
+# One data store per process, shared by every session, so its parsed tables stay
+# in memory across reruns. data.json holds a snapshot and each action appends one
+# record to data.json.log; a .db file keeps the same records in indexed SQLite tables.
+@st.cache_resource
+def get_store(path):
+    # Import the old data.json the first time the SQLite backend is used
+    if is_sqlite_path(path) and not os.path.exists(path) and os.path.exists(LEGACY_DATA_FILE):
+        migrate_json_to_sqlite(LEGACY_DATA_FILE, path)
+    return open_store(path)
 
-# Function to load data from JSON file
+images = get_image_store(STAMP_DIR)
+store = get_store(DATA_FILE)
+rerun.lap("setup")
+
+# Function to load data from the store
+@profiler.timed("load_data")
 def load_data():
     try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
-        return {'stamps': [], 'mail_history': [], 'orders': []}
+        return store.load()
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return {'stamps': [], 'mail_history': [], 'orders': []}
+        return empty_data()
 
-# Function to save data to JSON file
-def save_data(data):
+# Function to append a single record to the store
+@profiler.timed("save_data")
+def append_record(table, record):
     try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        store.append(table, record)
     except Exception as e:
         st.error(f"Error saving data: {e}")
 
+# Function to record the deletion of a stamp or order
+@profiler.timed("save_data")
+def delete_record(table, key):
+    try:
+        store.delete(table, key)
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+
+# Function to offer a mail_history or orders export as a download. The file is
+# only built when asked for, then kept until the next export.
+def history_download(table, label):
+    col1, col2 = st.columns(2)
+    fmt = col1.selectbox("Format", FORMATS, key=f"{table}_export_format")
+    if col2.button(f"Export {label}", key=f"{table}_export"):
+        st.session_state[f"{table}_export_file"] = (fmt, export_bytes(history_rows(store, table), TABLE_COLUMNS[table], fmt))
+    export = st.session_state.get(f"{table}_export_file")
+    if export:
+        st.download_button(
+            f"Download {label} ({export[0].upper()})",
+            data=export[1],
+            file_name=f"{table}.{export[0]}",
+            mime=MIME_TYPES[export[0]],
+            key=f"{table}_download"
+        )
+
 # Initialize session state and load persisted data
 if 'user_id' not in st.session_state:
     st.session_state.user_id = str(uuid.uuid4())
@@ -40,62 +93,41 @@ if 'stamp_stage' not in st.session_state:
 if 'pending_stamp' not in st.session_state:
     st.session_state.pending_stamp = None
 
-# Load data into session state
-data = load_data()
-if 'stamps' not in st.session_state:
-    st.session_state.stamps = data.get('stamps', [])
-if 'mail_history' not in st.session_state:
-    st.session_state.mail_history = data.get('mail_history', [])
-if 'orders' not in st.session_state:
-    st.session_state.orders = data.get('orders', [])
+# Load data into session state. Only a new session reads the store, and the store
+# serves it from memory unless the data files changed since they were last read.
+if any(key not in st.session_state for key in ('stamps', 'mail_history', 'orders')):
+    data = load_data()
+    if 'stamps' not in st.session_state:
+        st.session_state.stamps = data.get('stamps', [])
+    if 'mail_history' not in st.session_state:
+        st.session_state.mail_history = data.get('mail_history', [])
+    if 'orders' not in st.session_state:
+        st.session_state.orders = data.get('orders', [])
+rerun.lap("state load")
 
-# Function to create a stamp design
+# Function to create a stamp design (rendered once per design; identical designs share one file)
+@profiler.timed("image I/O")
 def create_stamp(design, text, color, value):
-    img = Image.new('RGB', (200, 200), color='white')
-    draw = ImageDraw.Draw(img)
-    
-    if design == "Classic":
-        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
-    elif design == "Wavy":
-        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
-        draw.line((20, 20, 180, 20), fill=color, width=3)
-        draw.line((20, 180, 180, 180), fill=color, width=3)
-    elif design == "Star":
-        draw.polygon([(100, 20), (120, 80), (180, 80), (130, 120), (150, 180), 
-                      (100, 140), (50, 180), (70, 120), (20, 80), (80, 80)], outline=color, width=5)
-    
-    try:
-        font = ImageFont.truetype("arial.ttf", 20)
-    except:
-        font = ImageFont.load_default()
-    
-    draw.text((20, 160), f"USPS ${value:.2f}", fill=color, font=font)
-    draw.text((20, 20), text.upper(), fill=color, font=font)
-    
-    stamp_id = str(uuid.uuid4())
-    stamp_path = os.path.join(STAMP_DIR, f"{stamp_id}.png")
-    img.save(stamp_path)
-    
-    return stamp_id, stamp_path
+    return render_stamp_file(design, text, color, value, images)
 
-# Function to send virtual mail
+# Function to send virtual mail. Each mail piece gets a mail_id for its barcode.
+# The store counts it in the History summary in the same write.
 def send_mail(stamp_id, recipient, address):
     mail_entry = {
+        'mail_id': str(uuid.uuid4()),
         'stamp_id': stamp_id,
         'recipient': recipient,
         'address': address,
         'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     st.session_state.mail_history.append(mail_entry)
-    save_data({
-        'stamps': st.session_state.stamps,
-        'mail_history': st.session_state.mail_history,
-        'orders': st.session_state.orders
-    })
+    append_record('mail_history', mail_entry)
+    return mail_entry
 
-# Function to place an order for physical stamps
+# Function to place an order for physical stamps (counted in the History summary
+# by the store as the order is appended)
 def place_order(stamp_id, quantity, shipping_address):
-    stamp_data = next((s for s in st.session_state.stamps if s['id'] == stamp_id), None)
+    stamp_data = store.get_stamp(stamp_id)
     if stamp_data:
         total_cost = stamp_data['value'] * quantity
         order_entry = {
@@ -107,11 +139,9 @@ def place_order(stamp_id, quantity, shipping_address):
             'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         st.session_state.orders.append(order_entry)
-        save_data({
-            'stamps': st.session_state.stamps,
-            'mail_history': st.session_state.mail_history,
-            'orders': st.session_state.orders
-        })
+        append_record('orders', order_entry)
+        st.session_state.last_order = {'order_id': order_entry['order_id'], 'path': stamp_data['path'], 'quantity': quantity,
+                                       'code': record_code('orders', order_entry['order_id'])}
         return total_cost
     return 0
 
@@ -121,6 +151,9 @@ st.write("Design, use, and order custom stamps for digital and physical mailing!
 
 # Sidebar for navigation
 page = st.sidebar.selectbox("Choose a page", ["Create Stamp", "My Collection", "Send Virtual Mail", "Order Physical Stamps", "History"])
+rerun.page = page
+render_profiler_panel(profiler)
+rerun.lap("page dispatch")
 
 # Page 1: Create Stamp
 if page == "Create Stamp":
@@ -146,9 +179,9 @@ if page == "Create Stamp":
                 }
                 st.session_state.stamp_stage = "preview"
                 st.write("Preview your stamp design below. Submit again to confirm.")
-                temp_stamp_id, temp_stamp_path = create_stamp(design, text, color, value)
-                st.image(temp_stamp_path, caption=f"Preview: {text} (${value:.2f})", width=200)
-                os.remove(temp_stamp_path)
+                # Served from memory; the confirmed stamp reuses these bytes
+                preview_png = render_stamp_png(design, text, color, value)
+                st.image(preview_png, caption=f"Preview: {text} (${value:.2f})", width=200)
             elif st.session_state.stamp_stage == "preview":
                 st.session_state.stamp_stage = "confirmed"
         
@@ -159,20 +192,18 @@ if page == "Create Stamp":
                 st.session_state.pending_stamp['color'],
                 st.session_state.pending_stamp['value']
             )
-            st.session_state.stamps.append({
+            stamp_entry = {
                 'id': stamp_id,
                 'path': stamp_path,
                 'design': st.session_state.pending_stamp['design'],
                 'text': st.session_state.pending_stamp['text'],
                 'value': st.session_state.pending_stamp['value']
-            })
-            save_data({
-                'stamps': st.session_state.stamps,
-                'mail_history': st.session_state.mail_history,
-                'orders': st.session_state.orders
-            })
+            }
+            st.session_state.stamps.append(stamp_entry)
+            append_record('stamps', stamp_entry)
             st.success("Stamp design created successfully!")
-            st.image(stamp_path, caption=f"Stamp: {st.session_state.pending_stamp['text']} (${st.session_state.pending_stamp['value']:.2f})", width=200)
+            # Shown with the barcode the scanner apps resolve back to this stamp
+            st.image(imprinted_png(stamp_path, record_code('stamps', stamp_id)), caption=f"Stamp: {st.session_state.pending_stamp['text']} (${st.session_state.pending_stamp['value']:.2f})", width=200)
             st.session_state.stamp_stage = "input"
             st.session_state.pending_stamp = None
 
@@ -183,18 +214,19 @@ elif page == "My Collection":
         st.info("You haven't created any stamp designs yet. Go to 'Create Stamp' to start!")
     else:
         cols = st.columns(3)
-        for idx, stamp in enumerate(st.session_state.stamps):
-            with cols[idx % 3]:
-                st.image(stamp['path'], caption=f"{stamp['text']} (${stamp['value']:.2f})", width=150)
-                if st.button("Delete", key=f"delete_{stamp['id']}"):
-                    os.remove(stamp['path'])
-                    st.session_state.stamps = [s for s in st.session_state.stamps if s['id'] != stamp['id']]
-                    save_data({
-                        'stamps': st.session_state.stamps,
-                        'mail_history': st.session_state.mail_history,
-                        'orders': st.session_state.orders
-                    })
-                    st.experimental_rerun()
+        with profiler.phase("collection loop"):
+            for idx, stamp in enumerate(st.session_state.stamps):
+                with cols[idx % 3]:
+                    thumbnail = images.thumbnail(stamp['path'], 150)
+                    if thumbnail:
+                        st.image(thumbnail, caption=f"{stamp['text']} (${stamp['value']:.2f})", width=150)
+                    else:
+                        st.write(f"{stamp['text']} (${stamp['value']:.2f}): Stamp design no longer available.")
+                    if st.button("Delete", key=f"delete_{stamp['id']}"):
+                        images.release(stamp['path'])
+                        st.session_state.stamps = [s for s in st.session_state.stamps if s['id'] != stamp['id']]
+                        delete_record('stamps', stamp['id'])
+                        st.experimental_rerun()
 
 # Page 3: Send Virtual Mail
 elif page == "Send Virtual Mail":
@@ -214,17 +246,17 @@ elif page == "Send Virtual Mail":
                 if not recipient or not address:
                     st.error("Please fill in all fields.")
                 else:
-                    send_mail(stamp[1], recipient, address)
+                    mail_entry = send_mail(stamp[1], recipient, address)
                     st.success("Virtual mail sent successfully!")
+                    stamp_data = store.get_stamp(stamp[1])
+                    # The mail is already recorded; a stamp whose image is gone just has no preview
+                    if stamp_data and os.path.exists(stamp_data['path']):
+                        st.image(imprinted_png(stamp_data['path'], record_code('mail_history', mail_entry['mail_id'])),
+                                 caption=f"Mail piece to {recipient}", width=200)
                     if st.checkbox("Remove stamp after sending"):
-                        stamp_data = next(s for s in st.session_state.stamps if s['id'] == stamp[1])
-                        os.remove(stamp_data['path'])
+                        images.release(stamp_data['path'])
                         st.session_state.stamps = [s for s in st.session_state.stamps if s['id'] != stamp[1]]
-                        save_data({
-                            'stamps': st.session_state.stamps,
-                            'mail_history': st.session_state.mail_history,
-                            'orders': st.session_state.orders
-                        })
+                        delete_record('stamps', stamp[1])
 
 # Page 4: Order Physical Stamps
 elif page == "Order Physical Stamps":
@@ -246,45 +278,70 @@ elif page == "Order Physical Stamps":
                 else:
                     total_cost = place_order(stamp[1], quantity, shipping_address)
                     if total_cost > 0:
-                        stamp_data = next(s for s in st.session_state.stamps if s['id'] == stamp[1])
                         st.write(f"Total Cost: ${total_cost:.2f} for {quantity} stamps")
                         if st.button("Confirm Payment", key=f"confirm_payment_{stamp[1]}"):
                             st.success(f"Order placed for {quantity} stamps! Check 'History' for details.")
                     else:
                         st.error("Error processing order. Try again.")
 
+        # Print-ready sheets for the most recent order (download buttons cannot live inside a form)
+        last_order = st.session_state.get('last_order')
+        if last_order and os.path.exists(last_order['path']):
+            with profiler.phase("image I/O"):
+                sheets_pdf = order_sheets_pdf(last_order['path'], last_order['quantity'], code=last_order.get('code'))
+            st.download_button(
+                f"Download Print Sheets ({last_order['quantity']} stamps, PDF)",
+                data=sheets_pdf,
+                file_name=f"stamp-sheets-{last_order['order_id']}.pdf",
+                mime="application/pdf"
+            )
+
 # Page 5: History (Combined Mail and Order History)
 elif page == "History":
     st.header("History")
+
+    st.subheader("Summary")
+    with profiler.phase("history summary"):
+        # Running totals kept by the store, read without walking the history
+        render_history_summary(store.summary())
     
     st.subheader("Virtual Mail History")
     if not st.session_state.mail_history:
         st.info("No virtual mail sent yet. Go to 'Send Virtual Mail' to start!")
     else:
-        for mail in st.session_state.mail_history:
-            stamp_data = next((s for s in st.session_state.stamps if s['id'] == mail['stamp_id']), None)
-            st.write("---")
-            st.write(f"**Sent to**: {mail['recipient']}")
-            st.write(f"**Address**: {mail['address']}")
-            st.write(f"**Date**: {mail['date']}")
-            if stamp_data:
-                st.image(stamp_data['path'], caption=f"Stamp: {stamp_data['text']}", width=100)
-            else:
-                st.write("Stamp design no longer available.")
+        history_download('mail_history', "Mail History")
+        with profiler.phase("mail history loop"):
+            for mail, stamp_data in store.history('mail_history'):
+                st.write("---")
+                st.write(f"**Sent to**: {mail['recipient']}")
+                st.write(f"**Address**: {mail['address']}")
+                st.write(f"**Date**: {mail['date']}")
+                if mail.get('mail_id'):
+                    st.write(f"**Barcode**: {record_code('mail_history', mail['mail_id'])}")
+                thumbnail = images.thumbnail(stamp_data['path'], 100) if stamp_data else None
+                if thumbnail:
+                    st.image(thumbnail, caption=f"Stamp: {stamp_data['text']}", width=100)
+                else:
+                    st.write("Stamp design no longer available.")
     
     st.subheader("Physical Stamp Order History")
     if not st.session_state.orders:
         st.info("No orders placed yet. Go to 'Order Physical Stamps' to start!")
     else:
-        for order in st.session_state.orders:
-            stamp_data = next((s for s in st.session_state.stamps if s['id'] == order['stamp_id']), None)
-            st.write("---")
-            st.write(f"**Order ID**: {order['order_id']}")
-            st.write(f"**Quantity**: {order['quantity']} stamps")
-            st.write(f"**Total Cost**: ${order['total_cost']:.2f}")
-            st.write(f"**Shipping Address**: {order['shipping_address']}")
-            st.write(f"**Date**: {order['date']}")
-            if stamp_data:
-                st.image(stamp_data['path'], caption=f"Stamp: {stamp_data['text']}", width=100)
-            else:
-                st.write("Stamp design no longer available.")
+        history_download('orders', "Orders")
+        with profiler.phase("order history loop"):
+            for order, stamp_data in store.history('orders'):
+                st.write("---")
+                st.write(f"**Order ID**: {order['order_id']}")
+                st.write(f"**Quantity**: {order['quantity']} stamps")
+                st.write(f"**Total Cost**: ${order['total_cost']:.2f}")
+                st.write(f"**Shipping Address**: {order['shipping_address']}")
+                st.write(f"**Date**: {order['date']}")
+                st.write(f"**Barcode**: {record_code('orders', order['order_id'])}")
+                thumbnail = images.thumbnail(stamp_data['path'], 100) if stamp_data else None
+                if thumbnail:
+                    st.image(thumbnail, caption=f"Stamp: {stamp_data['text']}", width=100)
+                else:
+                    st.write("Stamp design no longer available.")
+
+rerun.finish()
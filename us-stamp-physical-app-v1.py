@@ -1,6 +1,10 @@
 import streamlit as st
 import os
-from PIL import Image, ImageDraw, ImageFont
+from stamp_render import create_stamp as render_stamp_file
+from stamp_images import ImageStore
+from stamp_sheets import order_sheets_pdf
+from stamp_barcode import imprinted_png, record_code
+from stamp_summary import HistorySummary, render_history_summary
 import uuid
 import datetime
 
@@ -14,43 +18,18 @@ if 'stamps' not in st.session_state:
     st.session_state.stamps = []
 if 'orders' not in st.session_state:
     st.session_state.orders = []
+# Running order totals for the Order History page, updated as orders are placed
+if 'order_summary' not in st.session_state:
+    st.session_state.order_summary = HistorySummary()
 
 # Directory to save stamp designs
 STAMP_DIR = "stamps"
 os.makedirs(STAMP_DIR, exist_ok=True)
+images = ImageStore(STAMP_DIR)
 
-# Function to create a stamp design
+# Function to create a stamp design (rendered once per design; identical designs share one file)
 def create_stamp(design, text, color, value):
-    # Create a blank image
-    img = Image.new('RGB', (200, 200), color='white')
-    draw = ImageDraw.Draw(img)
-    
-    # Draw border based on design
-    if design == "Classic":
-        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
-    elif design == "Wavy":
-        draw.rectangle((10, 10, 190, 190), outline=color, width=5)
-        draw.line((20, 20, 180, 20), fill=color, width=3)
-        draw.line((20, 180, 180, 180), fill=color, width=3)
-    elif design == "Star":
-        draw.polygon([(100, 20), (120, 80), (180, 80), (130, 120), (150, 180), 
-                      (100, 140), (50, 180), (70, 120), (20, 80), (80, 80)], outline=color, width=5)
-    
-    # Add text (stamp value and custom text)
-    try:
-        font = ImageFont.truetype("arial.ttf", 20)
-    except:
-        font = ImageFont.load_default()
-    
-    draw.text((20, 160), f"USPS ${value:.2f}", fill=color, font=font)
-    draw.text((20, 20), text.upper(), fill=color, font=font)
-    
-    # Save stamp design
-    stamp_id = str(uuid.uuid4())
-    stamp_path = os.path.join(STAMP_DIR, f"{stamp_id}.png")
-    img.save(stamp_path)
-    
-    return stamp_id, stamp_path
+    return render_stamp_file(design, text, color, value, images)
 
 # Function to place an order
 def place_order(stamp_id, quantity, shipping_address):
@@ -66,6 +45,9 @@ def place_order(stamp_id, quantity, shipping_address):
             'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         st.session_state.orders.append(order_entry)
+        st.session_state.order_summary.replace('orders', None, order_entry, {stamp_id: stamp_data})
+        st.session_state.last_order = {'order_id': order_entry['order_id'], 'path': stamp_data['path'], 'quantity': quantity,
+                                       'code': record_code('orders', order_entry['order_id'])}
         return total_cost
     return 0
 
@@ -102,7 +84,7 @@ if page == "Create Stamp":
                         'value': value
                     })
                     st.success("Stamp design created successfully!")
-                    st.image(stamp_path, caption=f"Stamp: {text} (${value:.2f})", width=200)
+                    st.image(imprinted_png(stamp_path, record_code('stamps', stamp_id)), caption=f"Stamp: {text} (${value:.2f})", width=200)
 
 # Page 2: My Collection
 elif page == "My Collection":
@@ -113,9 +95,13 @@ elif page == "My Collection":
         cols = st.columns(3)
         for idx, stamp in enumerate(st.session_state.stamps):
             with cols[idx % 3]:
-                st.image(stamp['path'], caption=f"{stamp['text']} (${stamp['value']:.2f})", width=150)
+                thumbnail = images.thumbnail(stamp['path'], 150)
+                if thumbnail:
+                    st.image(thumbnail, caption=f"{stamp['text']} (${stamp['value']:.2f})", width=150)
+                else:
+                    st.write(f"{stamp['text']} (${stamp['value']:.2f}): Stamp design no longer available.")
                 if st.button("Delete", key=f"delete_{stamp['id']}"):
-                    os.remove(stamp['path'])
+                    images.release(stamp['path'])
                     st.session_state.stamps = [s for s in st.session_state.stamps if s['id'] != stamp['id']]
                     st.experimental_rerun()
 
@@ -147,21 +133,36 @@ elif page == "Order Stamps":
                     else:
                         st.error("Error processing order. Try again.")
 
+        # Print-ready sheets for the most recent order (download buttons cannot live inside a form)
+        last_order = st.session_state.get('last_order')
+        if last_order and os.path.exists(last_order['path']):
+            st.download_button(
+                f"Download Print Sheets ({last_order['quantity']} stamps, PDF)",
+                data=order_sheets_pdf(last_order['path'], last_order['quantity'], code=last_order.get('code')),
+                file_name=f"stamp-sheets-{last_order['order_id']}.pdf",
+                mime="application/pdf"
+            )
+
 # Page 4: Order History
 elif page == "Order History":
     st.header("Order History")
     if not st.session_state.orders:
         st.info("No orders placed yet. Go to 'Order Stamps' to start!")
     else:
+        render_history_summary(st.session_state.order_summary.view(), mail=False)
+        # Look each stamp up once, not once per order
+        stamps_by_id = {s['id']: s for s in st.session_state.stamps}
         for order in st.session_state.orders:
-            stamp_data = next((s for s in st.session_state.stamps if s['id'] == order['stamp_id']), None)
+            stamp_data = stamps_by_id.get(order['stamp_id'])
             st.write("---")
             st.write(f"**Order ID**: {order['order_id']}")
             st.write(f"**Quantity**: {order['quantity']} stamps")
             st.write(f"**Total Cost**: ${order['total_cost']:.2f}")
             st.write(f"**Shipping Address**: {order['shipping_address']}")
             st.write(f"**Date**: {order['date']}")
-            if stamp_data:
-                st.image(stamp_data['path'], caption=f"Stamp: {stamp_data['text']}", width=100)
+            st.write(f"**Barcode**: {record_code('orders', order['order_id'])}")
+            thumbnail = images.thumbnail(stamp_data['path'], 100) if stamp_data else None
+            if thumbnail:
+                st.image(thumbnail, caption=f"Stamp: {stamp_data['text']}", width=100)
             else:
                 st.write("Stamp design no longer available.")
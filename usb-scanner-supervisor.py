@@ -0,0 +1,63 @@
+import os
+import streamlit as st
+from collections import deque, Counter
+from scan_aggregator import ScanSubscriber, DEFAULT_HOST, DEFAULT_PORT
+from scan_log import format_timestamp
+from scan_analytics import ScanAnalytics, render_analytics_panel
+
+# Page configuration
+st.set_page_config(page_title="Scan Supervisor", layout="wide")
+
+# App title
+st.title("Scan Supervisor")
+st.write("Live, time-ordered scans from every station publishing to the aggregation server.")
+
+# Address of the aggregation server (python scan_aggregator.py serve)
+SCAN_AGGREGATOR = os.environ.get("SCAN_AGGREGATOR", f"{DEFAULT_HOST}:{DEFAULT_PORT}")
+# Merged scans kept for display
+RECENT_SCANS = 200
+
+
+# One subscription per process, shared by every dashboard session
+@st.cache_resource
+def get_feed(address):
+    host, _, port = address.partition(":")
+    feed = {"recent": deque(maxlen=RECENT_SCANS), "per_station": Counter(), "total": 0,
+            "analytics": ScanAnalytics()}
+
+    def on_scan(message):
+        feed["recent"].append(message)
+        feed["per_station"][message["station"]] += 1
+        feed["total"] += 1
+        feed["analytics"].observe(message["station"], message["barcode"], message["t"])
+
+    feed["subscriber"] = ScanSubscriber(on_scan, host, int(port or DEFAULT_PORT), replay=RECENT_SCANS)
+    return feed
+
+
+@st.fragment(run_every=1.0)
+def dashboard():
+    feed = get_feed(SCAN_AGGREGATOR)
+    if not feed["subscriber"].connected:
+        st.warning(f"Not connected to the aggregation server at {SCAN_AGGREGATOR}. Retrying...")
+
+    st.metric("Scans received", feed["total"])
+    if feed["per_station"]:
+        st.subheader("Scans per Station")
+        st.bar_chart(dict(feed["per_station"]))
+
+    st.subheader("Scan Analytics")
+    render_analytics_panel(feed["analytics"])
+
+    st.subheader("Latest Scans")
+    recent = list(feed["recent"])[::-1]
+    if not recent:
+        st.info("No scans yet.")
+    else:
+        st.markdown("\n\n".join(
+            f"**{m['gseq']}. {m['station']}:** {m['barcode']} (Scanned at: {format_timestamp(m['t'])})"
+            for m in recent
+        ))
+
+
+dashboard()
@@ -1,45 +1,56 @@
 import streamlit as st
-from datetime import datetime
+from rerun_profiler import render_profiler_panel
+from scan_session import profiler, init_scan_state, clear_scans, poll_device_scans, render_scan_analytics, render_scan_history, render_scan_images, render_scan_import, show_scan_result, submit_scan_input
 
 # Page configuration
 st.set_page_config(page_title="USB Barcode Scanner App", layout="centered")
 
+# Time each phase of this rerun (RERUN_PROFILER=1 shows the profile in the sidebar)
+rerun = profiler.start()
+rerun.page = "usb-scannerv1"
+
 # App title
 st.title("USB Barcode Scanner Application")
 st.write("Scan a barcode using your USB scanner and see the results below.")
 
 # Initialize session state
-if "scanned_barcodes" not in st.session_state:
-    st.session_state.scanned_barcodes = []
-
-# Input field to capture barcode data
-barcode = st.text_input("Scan your barcode here:", "", key="barcode_input")
-
-if barcode:
-    # Record the scanned barcode with a timestamp
-    scanned_data = {
-        "barcode": barcode,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    st.session_state.scanned_barcodes.append(scanned_data)
-    
-    # Display a success message
-    st.success(f"Scanned barcode: {barcode}")
-
-    # Clear the input field after scanning
-    st.experimental_set_query_params(barcode_input="")
-
-# Display the scanned barcodes
-if st.session_state.scanned_barcodes:
-    st.subheader("Scanned Barcodes")
-    for i, data in enumerate(st.session_state.scanned_barcodes, start=1):
-        st.write(f"**{i}. Barcode:** {data['barcode']} (Scanned at: {data['timestamp']})")
+init_scan_state()
+
+# Input field to capture barcode data. The scan is recorded once, when the field
+# changes, and the field is emptied so reruns do not submit it again.
+st.text_input("Scan your barcode here:", "", key="barcode_input",
+              on_change=submit_scan_input, args=("barcode_input",))
+
+if st.session_state.get("last_scan_result"):
+    # Display a success message (or why the scan was not recorded)
+    show_scan_result(*st.session_state.last_scan_result)
+
+# Pick up scans read directly from the input device (when SCANNER_DEVICE is set)
+poll_device_scans()
+
+# Import a barcode file, or replay one with its original timing
+render_scan_import()
+
+# Decode barcodes from photos, for stations without a working scanner
+render_scan_images()
+
+# Display the scanned barcodes, one page at a time
+render_scan_history()
+
+# Scans per minute, most scanned codes and idle gaps
+render_scan_analytics()
 
 # Provide an option to clear the scanned data
 if st.button("Clear Scanned Barcodes"):
-    st.session_state.scanned_barcodes = []
+    clear_scans()
+    st.session_state.last_scan_result = None
     st.success("Scanned barcodes cleared!")
 
+# Rerun profile (when RERUN_PROFILER is set)
+render_profiler_panel(profiler)
+
 # Footer
 st.markdown("---")
 st.write("Developed using Streamlit. Ensure your USB barcode scanner is working as a keyboard input device.")
+
+rerun.finish()
@@ -1,50 +1,87 @@
 import streamlit as st
-from datetime import datetime
+from streamlit.errors import StreamlitAPIException
+from rerun_profiler import render_profiler_panel
+from scan_session import profiler, init_scan_state, capture_scan, drain_scans, clear_scans, poll_device_scans, render_scan_analytics, render_scan_history, render_scan_images, render_scan_import, UI_REFRESH_SECONDS
 
 # Page configuration
 st.set_page_config(page_title="USB Barcode Scanner App", layout="centered")
 
+# Time each phase of this rerun (RERUN_PROFILER=1 shows the profile in the sidebar)
+rerun = profiler.start()
+rerun.page = "usb-scannerv2"
+
 # App title
 st.title("USB Barcode Scanner Application")
 st.write("Scan a barcode using your USB scanner and see the results below.")
 
 # Initialize session state
-if "scanned_barcodes" not in st.session_state:
-    st.session_state.scanned_barcodes = []
+init_scan_state()
 
 if "input_key" not in st.session_state:
     st.session_state.input_key = 0  # Unique key for text input to reset it
 
-# Temporary variable to store barcode input
-barcode = st.text_input("Scan your barcode here:", key=f"barcode_input_{st.session_state.input_key}")
+# Scan capture runs in its own fragment: a scan only reruns the input field,
+# not the whole page, so the next scan is accepted straight away
+@st.fragment
+def scan_input():
+    # Temporary variable to store barcode input
+    barcode = st.text_input("Scan your barcode here:", key=f"barcode_input_{st.session_state.input_key}")
+
+    if barcode:
+        # Queue the scanned barcode, timestamped on arrival (bounces and repeats are
+        # checked when the queue is drained)
+        st.session_state.last_scan = capture_scan(barcode).barcode
+
+        # Increment the input key to reset the text input field
+        st.session_state.input_key += 1
+        try:
+            st.rerun(scope="fragment")  # Rerun only the input to reset it
+        except StreamlitAPIException:
+            # The field still held text when another widget reran the whole page
+            st.rerun()
+
+    if st.session_state.get("last_scan"):
+        # Display a success message
+        st.success(f"Scanned barcode: {st.session_state.last_scan}")
+
+
+# The history drains queued scans in batches on its own refresh cadence
+@st.fragment(run_every=UI_REFRESH_SECONDS)
+def scan_history():
+    drain_scans()
 
-if barcode:
-    # Record the scanned barcode with a timestamp (no duplicate check)
-    scanned_data = {
-        "barcode": barcode.strip(),
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    }
-    st.session_state.scanned_barcodes.append(scanned_data)
+    # Display the scanned barcodes, one page at a time
+    render_scan_history()
 
-    # Display a success message
-    st.success(f"Scanned barcode: {barcode}")
+    # Scans per minute, most scanned codes and idle gaps
+    render_scan_analytics()
 
-    # Increment the input key to reset the text input field
-    st.session_state.input_key += 1
-    st.experimental_rerun()  # Trigger rerun to reset input field
 
-# Display the scanned barcodes
-if st.session_state.scanned_barcodes:
-    st.subheader("Scanned Barcodes")
-    for i, data in enumerate(st.session_state.scanned_barcodes, start=1):
-        st.write(f"**{i}. Barcode:** {data['barcode']} (Scanned at: {data['timestamp']})")
+scan_input()
+
+# Pick up scans read directly from the input device (when SCANNER_DEVICE is set)
+poll_device_scans()
+
+# Import a barcode file, or replay one with its original timing
+render_scan_import()
+
+# Decode barcodes from photos, for stations without a working scanner
+render_scan_images()
+
+scan_history()
 
 # Provide an option to clear the scanned data
 if st.button("Clear Scanned Barcodes"):
-    st.session_state.scanned_barcodes = []
+    clear_scans()
+    st.session_state.last_scan = None
     st.session_state.input_key += 1  # Reset the input field key
     st.experimental_rerun()  # Trigger rerun to reset the state
 
+# Rerun profile (when RERUN_PROFILER is set)
+render_profiler_panel(profiler)
+
 # Footer
 st.markdown("---")
 st.write("Developed using Streamlit. Ensure your USB barcode scanner is working as a keyboard input device.")
+
+rerun.finish()
@@ -1,16 +1,20 @@
 import streamlit as st
-from datetime import datetime
+from rerun_profiler import render_profiler_panel
+from scan_session import profiler, init_scan_state, clear_scans, poll_device_scans, render_scan_analytics, render_scan_history, render_scan_images, render_scan_import, show_scan_result, submit_scan_input
 
 # Page configuration
 st.set_page_config(page_title="USB Barcode Scanner App", layout="centered")
 
+# Time each phase of this rerun (RERUN_PROFILER=1 shows the profile in the sidebar)
+rerun = profiler.start()
+rerun.page = "usb-scannerv3"
+
 # App title
 st.title("USB Barcode Scanner Application")
 st.write("Scan a barcode using your USB scanner and see the results below.")
 
 # Initialize session state variables
-if "scanned_barcodes" not in st.session_state:
-    st.session_state.scanned_barcodes = []
+init_scan_state()
 
 # JavaScript to maintain focus and clear the input field dynamically
 focus_script = """
@@ -43,45 +47,50 @@ focus_script = """
 </script>
 """
 
-# Barcode input field
-barcode = st.text_input(
+# Barcode input field. The scan is recorded once, when the field changes, and the
+# field is emptied so reruns do not submit it again.
+st.text_input(
     "Scan your barcode here:",
     key="barcode_input",
     placeholder="Scan your barcode here...",
     label_visibility="hidden",  # Optional: hide label to reduce redundancy
+    on_change=submit_scan_input,
+    args=("barcode_input",),
 )
 
 # Inject JavaScript for focus management and input clearing
 st.markdown(focus_script, unsafe_allow_html=True)
 
-if barcode:
-    # Record the scanned barcode with a timestamp
-    scanned_data = {
-        "barcode": barcode.strip(),
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    }
-    st.session_state.scanned_barcodes.append(scanned_data)
+if st.session_state.get("last_scan_result"):
+    # Display a success message (or why the scan was not recorded)
+    show_scan_result(*st.session_state.last_scan_result)
+
+# Pick up scans read directly from the input device (when SCANNER_DEVICE is set)
+poll_device_scans()
 
-    # Display a success message
-    st.success(f"Scanned barcode: {barcode}")
+# Import a barcode file, or replay one with its original timing
+render_scan_import()
 
-    # Clear the input field via JavaScript
-    st.markdown(
-        """<script>clearInput();</script>""",
-        unsafe_allow_html=True,
-    )
+# Decode barcodes from photos, for stations without a working scanner
+render_scan_images()
 
-# Display the scanned barcodes
-if st.session_state.scanned_barcodes:
-    st.subheader("Scanned Barcodes")
-    for i, data in enumerate(st.session_state.scanned_barcodes, start=1):
-        st.write(f"**{i}. Barcode:** {data['barcode']} (Scanned at: {data['timestamp']})")
+# Display the scanned barcodes, one page at a time
+render_scan_history()
+
+# Scans per minute, most scanned codes and idle gaps
+render_scan_analytics()
 
 # Button to clear scanned data
 if st.button("Clear Scanned Barcodes"):
-    st.session_state.scanned_barcodes = []
+    clear_scans()
+    st.session_state.last_scan_result = None
     st.experimental_rerun()  # Trigger rerun to reset the state
 
+# Rerun profile (when RERUN_PROFILER is set)
+render_profiler_panel(profiler)
+
 # Footer
 st.markdown("---")
 st.write("Developed using Streamlit. Ensure your USB barcode scanner is working as a keyboard input device.")
+
+rerun.finish()